@@ -32,6 +32,12 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture
+def local_cache(settings):
+    """Use an in-process cache for tests of code that caches between calls."""
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
 @pytest.fixture()
 def api_rf() -> APIRequestFactory:
     """APIRequestFactory instance"""
@@ -1,3 +1,8 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
 from rest_framework import serializers
 from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
@@ -94,3 +99,118 @@ class IdKeysetPagination(BasePagination):
                 "results": data,
             }
         )
+
+
+class _ModifiedPaginationParamsSerializer(serializers.Serializer):
+    modified_since = serializers.DateTimeField(required=False)
+    modified_until = serializers.DateTimeField(required=False)
+    last_modified = serializers.DateTimeField(required=False)
+    last_id = serializers.IntegerField(min_value=1, required=False)
+    page_size = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        if ("last_modified" in data) != ("last_id" in data):
+            raise serializers.ValidationError("last_modified and last_id must be given together.")
+        return data
+
+
+class ModifiedKeysetPagination(BasePagination):
+    """Keyset (cursor) pagination over the rows changed in a time window, for incremental syncs.
+
+    Rows are ordered by ``(modified_field, id)`` and the cursor is that pair for the last item on
+    the previous page. The window ends ``DATA_EXPORT_SYNC_LAG`` seconds in the past so rows written by
+    transactions that are still open when the request is made are not skipped. The end of the window
+    is returned as the ``high_water_mark``, to be passed as ``modified_since`` on the next sync.
+
+    Query parameters:
+        modified_since - only rows changed after this time
+        modified_until - end of the window, set by the ``next`` link (capped at now minus the lag)
+        last_modified  - cursor: modified time of the last item on the previous page
+        last_id        - cursor: id of the last item on the previous page
+        page_size      - items per page (default 1000, max 5000)
+
+    All other query parameters are preserved in the ``next`` link.
+    """
+
+    default_page_size = 1000
+    max_page_size = 5000
+    window_query_params = ("modified_since", "modified_until")
+
+    def __init__(self, modified_field: str):
+        self.modified_field = modified_field
+        self.modified_until = None
+
+    @classmethod
+    def is_requested(cls, request) -> bool:
+        return any(param in request.query_params for param in cls.window_query_params)
+
+    def init_window(self, request):
+        """Validate the query parameters and fix the time window of the sync."""
+        self.request = request
+        params = _ModifiedPaginationParamsSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+
+        self.modified_since = params.validated_data.get("modified_since")
+        latest = now() - datetime.timedelta(seconds=settings.DATA_EXPORT_SYNC_LAG)
+        self.modified_until = min(params.validated_data.get("modified_until") or latest, latest)
+        self.last_modified = params.validated_data.get("last_modified")
+        self.last_id = params.validated_data.get("last_id")
+        raw_page_size = params.validated_data.get("page_size")
+        self.page_size = (
+            min(raw_page_size, self.max_page_size) if raw_page_size is not None else self.default_page_size
+        )
+
+    def filter_queryset(self, queryset):
+        """Rows changed in the window, ordered by the cursor."""
+        queryset = queryset.filter(**{f"{self.modified_field}__lte": self.modified_until})
+        if self.modified_since is not None:
+            queryset = queryset.filter(**{f"{self.modified_field}__gt": self.modified_since})
+        return queryset.order_by(self.modified_field, "id")
+
+    def get_high_water_mark(self) -> str:
+        high_water_mark = self.modified_until
+        if self.modified_since is not None:
+            high_water_mark = max(high_water_mark, self.modified_since)
+        return _format_datetime(high_water_mark)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.init_window(request)
+        queryset = self.filter_queryset(queryset)
+        if self.last_modified is not None:
+            queryset = queryset.filter(
+                Q(**{f"{self.modified_field}__gt": self.last_modified})
+                | Q(**{self.modified_field: self.last_modified, "id__gt": self.last_id})
+            )
+
+        # Fetch one extra to detect next page
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        last_item = self.page[-1]
+        query = self.request.query_params.copy()
+        query["modified_until"] = _format_datetime(self.modified_until)
+        query["last_modified"] = _format_datetime(getattr(last_item, self.modified_field))
+        query["last_id"] = last_item.id
+        query["page_size"] = self.page_size
+
+        return self.request.build_absolute_uri(f"{self.request.path}?{query.urlencode()}")
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "high_water_mark": self.get_high_water_mark(),
+                "results": data,
+            }
+        )
+
+
+def _format_datetime(value: datetime.datetime) -> str:
+    return serializers.DateTimeField().to_representation(value)
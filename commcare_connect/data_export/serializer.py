@@ -119,6 +119,7 @@ class UserVisitDataSerializer(serializers.ModelSerializer):
             "date_created",
             "completed_work_id",
             "deliver_unit_id",
+            "date_modified",
         ]
 
     def get_username(self, obj) -> str:
@@ -162,6 +163,7 @@ class CompletedWorkDataSerializer(serializers.ModelSerializer):
             "saved_payment_accrued_usd",
             "saved_org_payment_accrued",
             "saved_org_payment_accrued_usd",
+            "id",
         ]
 
     def get_username(self, obj) -> str:
@@ -192,6 +194,8 @@ class PaymentDataSerializer(serializers.ModelSerializer):
             "invoice_id",
             "payment_method",
             "payment_operator",
+            "id",
+            "date_modified",
         ]
 
     def get_username(self, obj) -> str:
@@ -212,6 +216,9 @@ class InvoiceDataSerializer(serializers.ModelSerializer):
             "invoice_number",
             "service_delivery",
             "exchange_rate",
+            "id",
+            "status",
+            "date_modified",
         ]
 
 
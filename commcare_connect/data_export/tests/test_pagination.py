@@ -1,3 +1,4 @@
+import datetime
 from urllib.parse import parse_qs, urlparse
 
 import pytest
@@ -5,8 +6,8 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory
 
-from commcare_connect.data_export.pagination import IdKeysetPagination
-from commcare_connect.opportunity.models import UserVisit
+from commcare_connect.data_export.pagination import IdKeysetPagination, ModifiedKeysetPagination
+from commcare_connect.opportunity.models import UserVisit, VisitValidationStatus
 from commcare_connect.opportunity.tests.factories import UserVisitFactory
 
 
@@ -192,3 +193,89 @@ class TestIdKeysetPaginationEdgeCases:
 
         with pytest.raises(ValidationError):
             paginator.paginate_queryset(UserVisit.objects.none(), request)
+
+
+@pytest.mark.django_db
+class TestModifiedKeysetPagination:
+    @pytest.fixture(autouse=True)
+    def no_sync_lag(self, settings):
+        settings.DATA_EXPORT_SYNC_LAG = 0
+
+    def _create_visits(self, opportunity, user, *dates_modified):
+        return [
+            UserVisitFactory(opportunity=opportunity, user=user, date_modified=date_modified)
+            for date_modified in dates_modified
+        ]
+
+    def _collect_all_ids(self, api_rf, queryset, **params):
+        all_ids = []
+        while True:
+            paginator = ModifiedKeysetPagination("date_modified")
+            page = paginator.paginate_queryset(queryset, _make_request(api_rf, **params))
+            all_ids.extend(obj.id for obj in page)
+
+            next_link = paginator.get_next_link()
+            if next_link is None:
+                return all_ids, paginator.get_high_water_mark()
+            params = {k: v[0] for k, v in parse_qs(urlparse(next_link).query).items()}
+
+    def test_pages_in_modified_order_with_ties(self, api_rf, opportunity, org_user_member):
+        t0 = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+        t1 = t0 + datetime.timedelta(hours=1)
+        visits = self._create_visits(opportunity, org_user_member, t1, t0, t1, t0)
+        queryset = UserVisit.objects.filter(opportunity=opportunity)
+
+        ids, _ = self._collect_all_ids(api_rf, queryset, modified_since="2024-12-31T00:00:00Z", page_size=1)
+
+        expected = sorted(visits, key=lambda v: (v.date_modified, v.id))
+        assert ids == [visit.id for visit in expected]
+
+    def test_modified_since_returns_changed_rows_and_high_water_mark(self, api_rf, opportunity, org_user_member):
+        t0 = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+        old, changed = self._create_visits(opportunity, org_user_member, t0, t0)
+        queryset = UserVisit.objects.filter(opportunity=opportunity)
+
+        ids, high_water_mark = self._collect_all_ids(api_rf, queryset, modified_since="2024-12-31T00:00:00Z")
+        assert sorted(ids) == sorted([old.id, changed.id])
+
+        UserVisit.objects.filter(id=changed.id).update(status=VisitValidationStatus.rejected)
+        ids, _ = self._collect_all_ids(api_rf, queryset, modified_since=high_water_mark)
+        assert ids == [changed.id]
+
+    def test_window_trails_current_time(self, settings, api_rf, opportunity, org_user_member):
+        settings.DATA_EXPORT_SYNC_LAG = 60 * 60
+        self._create_visits(opportunity, org_user_member, datetime.datetime.now(datetime.UTC))
+        queryset = UserVisit.objects.filter(opportunity=opportunity)
+
+        ids, _ = self._collect_all_ids(api_rf, queryset, modified_since="2024-12-31T00:00:00Z")
+        assert ids == []
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"modified_since": "yesterday"},
+            {"modified_since": "2025-01-01T00:00:00Z", "last_id": 5},
+            {"modified_since": "2025-01-01T00:00:00Z", "last_modified": "2025-01-01T00:00:00Z"},
+        ],
+    )
+    def test_invalid_query_params_raise_validation_error(self, api_rf, params):
+        with pytest.raises(ValidationError):
+            ModifiedKeysetPagination("date_modified").paginate_queryset(
+                UserVisit.objects.none(), _make_request(api_rf, **params)
+            )
+
+
+@pytest.mark.django_db
+def test_date_modified_updated_by_queryset_updates(opportunity, org_user_member):
+    old_date = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    visit = UserVisitFactory(
+        opportunity=opportunity, user=org_user_member, status=VisitValidationStatus.pending, date_modified=old_date
+    )
+
+    UserVisit.objects.filter(id=visit.id).update(status=VisitValidationStatus.pending)
+    visit.refresh_from_db()
+    assert visit.date_modified == old_date
+
+    UserVisit.objects.filter(id=visit.id).update(status=VisitValidationStatus.approved)
+    visit.refresh_from_db()
+    assert visit.date_modified > old_date
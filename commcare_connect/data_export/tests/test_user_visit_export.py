@@ -1,7 +1,10 @@
 import csv
 import datetime
 import io
+import json
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from django.db import connection
 from django.test.utils import CaptureQueriesContext
@@ -113,6 +116,39 @@ class TestUserVisitDataViewV1:
         assert "photo.jpg" in rows[0]["images"]
         assert "doc.pdf" not in rows[0]["images"]
 
+    def test_parquet_export(self, api_client, opportunity, org_user_member):
+        visit = UserVisitFactory(opportunity=opportunity, user=org_user_member, form_json={"form": {"q": "a"}})
+        _add_export_credentials(api_client, org_user_member)
+
+        response = api_client.get(_get_url(opportunity.id, file_format="parquet"))
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/vnd.apache.parquet"
+
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        assert table.schema.field("id").type == pa.int64()
+        assert table.schema.field("visit_date").type == pa.timestamp("us", tz="UTC")
+        assert pa.types.is_dictionary(table.schema.field("status").type)
+        [row] = table.to_pylist()
+        assert row["id"] == visit.id
+        assert row["username"] == org_user_member.username
+        assert row["visit_date"] == visit.visit_date
+        assert row["status"] == visit.status
+        assert json.loads(row["form_json"]) == {"form": {"q": "a"}}
+
+    def test_modified_since_sets_high_water_mark_header(self, settings, api_client, opportunity, org_user_member):
+        settings.DATA_EXPORT_SYNC_LAG = 0
+        old_date = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+        UserVisitFactory(opportunity=opportunity, user=org_user_member, date_modified=old_date)
+        changed = UserVisitFactory(opportunity=opportunity, user=org_user_member)
+        _add_export_credentials(api_client, org_user_member)
+
+        response = api_client.get(_get_url(opportunity.id, modified_since="2025-01-02T00:00:00Z"))
+        assert response.status_code == 200
+
+        rows, _ = _parse_csv_response(response)
+        assert [int(row["id"]) for row in rows] == [changed.id]
+        assert response["X-High-Water-Mark"]
+
 
 @pytest.mark.django_db
 class TestUserVisitDataViewV2:
@@ -197,6 +233,24 @@ class TestUserVisitDataViewV2:
             }
         ]
 
+    def test_modified_since_returns_high_water_mark(self, settings, api_client_v2, opportunity, org_user_member):
+        settings.DATA_EXPORT_SYNC_LAG = 0
+        old_date = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+        UserVisitFactory(opportunity=opportunity, user=org_user_member, date_modified=old_date)
+        changed = UserVisitFactory(opportunity=opportunity, user=org_user_member)
+        _add_export_credentials(api_client_v2, org_user_member)
+
+        response = api_client_v2.get(_get_url(opportunity.id, modified_since="2025-01-02T00:00:00Z"))
+        assert response.status_code == 200
+
+        data = response.json()
+        assert [row["id"] for row in data["results"]] == [changed.id]
+        assert data["next"] is None
+        assert data["high_water_mark"]
+
+        response = api_client_v2.get(_get_url(opportunity.id, modified_since=data["high_water_mark"]))
+        assert response.json()["results"] == []
+
     def test_pagination_traversal(self, api_client_v2, opportunity, org_user_member):
         UserVisitFactory.create_batch(5, opportunity=opportunity, user=org_user_member)
         _add_export_credentials(api_client_v2, org_user_member)
@@ -24,7 +24,7 @@ from commcare_connect.data_export.const import (
     LEARN_APP_KEY,
     VALID_APP_TYPES,
 )
-from commcare_connect.data_export.pagination import IdKeysetPagination
+from commcare_connect.data_export.pagination import IdKeysetPagination, ModifiedKeysetPagination
 from commcare_connect.data_export.serializer import (
     AssessmentDataSerializer,
     AssignedTaskDataSerializer,
@@ -67,9 +67,11 @@ from commcare_connect.program.models import Program
 from commcare_connect.users.models import User
 from commcare_connect.utils.commcarehq_api import CommCareHQAPIException, get_app_structure
 from commcare_connect.utils.file import EchoWriter
+from commcare_connect.utils.parquet import PARQUET_CONTENT_TYPE, get_serializer_parquet_schema, iter_parquet
 from commcare_connect.utils.permission_const import WORKSPACE_ENTITY_MANAGEMENT_ACCESS
 
 STREAM_CHUNK_SIZE = 2000
+HIGH_WATER_MARK_HEADER = "X-High-Water-Mark"
 
 
 class BaseDataExportView(APIView):
@@ -89,6 +91,11 @@ class OpportunityDataExportView(BaseDataExportView):
 class BaseDataExportListView(BaseDataExportView):
     serializer_class = None
     pagination_class = IdKeysetPagination
+    # field holding the time a row last changed, which enables incremental syncs with ``modified_since``
+    modified_field = None
+    sync_paginator = None
+    # text fields with few distinct values that are dictionary encoded in Parquet exports
+    parquet_category_fields = ()
 
     def get_serializer_class(self, *args, **kwargs):
         return self.serializer_class
@@ -96,19 +103,35 @@ class BaseDataExportListView(BaseDataExportView):
     def get_queryset(self, *args, **kwargs):
         raise NotImplementedError
 
+    def filter_queryset(self, queryset):
+        """Restrict the rows to those changed in the window of an incremental sync."""
+        if self.sync_paginator is not None:
+            return self.sync_paginator.filter_queryset(queryset)
+        return queryset
+
+    def get_rows(self, *args, **kwargs):
+        """Serialized objects for the streaming responses of v1.0 requests."""
+        serializer_class = self.get_serializer_class()
+        queryset = self.filter_queryset(self.get_queryset(*args, **kwargs))
+        for obj in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            yield serializer_class(obj).data
+
     def get_data_generator(self, *args, **kwargs):
         serializer_class = self.get_serializer_class()
         fieldnames = serializer_class().get_fields().keys()
         writer = csv.DictWriter(EchoWriter(), fieldnames=fieldnames)
-        objects = self.get_queryset(*args, **kwargs).iterator(chunk_size=STREAM_CHUNK_SIZE)
         yield writer.writeheader()
 
-        for obj in objects:
-            serialized_data = serializer_class(obj).data
-            yield writer.writerow(serialized_data)
+        for row in self.get_rows(*args, **kwargs):
+            yield writer.writerow(row)
+
+    def get_parquet_generator(self, *args, **kwargs):
+        schema = get_serializer_parquet_schema(self.get_serializer_class()(), self.parquet_category_fields)
+        rows = ([row[name] for name in schema.names] for row in self.get_rows(*args, **kwargs))
+        return iter_parquet(rows, schema)
 
     def paginate_queryset(self, queryset):
-        self._paginator = self.pagination_class()
+        self._paginator = self.sync_paginator or self.pagination_class()
         return self._paginator.paginate_queryset(queryset, self.request)
 
     def get_paginated_response(self, data):
@@ -118,23 +141,46 @@ class BaseDataExportListView(BaseDataExportView):
         """Hook called after pagination, before serialization. Override to modify the page list in-place.
 
         Note: this hook is only called for v2.0 requests (paginated JSON). It is not invoked
-        for v1.0 requests, which use streaming CSV via ``get_data_generator``.
+        for v1.0 requests, which stream CSV or Parquet from ``get_rows``.
         """
         pass
 
+    def init_sync(self):
+        if not ModifiedKeysetPagination.is_requested(self.request):
+            return
+        if self.modified_field is None:
+            raise serializers.ValidationError({"modified_since": "Incremental sync is not supported for this data."})
+        self.sync_paginator = ModifiedKeysetPagination(self.modified_field)
+        self.sync_paginator.init_window(self.request)
+
     @extend_schema(
         description=(
-            "v1.0: Returns CSV text StreamingHttpResponse. v2.0: Returns paginated JSON with 'next' and 'results'."
+            "v1.0: Returns CSV text StreamingHttpResponse, or a Parquet file with '?file_format=parquet'. "
+            "v2.0: Returns paginated JSON with 'next' and 'results'. "
+            "With 'modified_since' only the rows changed since then are returned, ordered by modification time, "
+            "along with a 'high_water_mark' (the X-High-Water-Mark header for v1.0) to use for the next sync."
         )
     )
     def get(self, *args, **kwargs):
+        self.init_sync()
+        response = self.get_response(*args, **kwargs)
+        if self.sync_paginator is not None and self.request.version != "2.0":
+            response[HIGH_WATER_MARK_HEADER] = self.sync_paginator.get_high_water_mark()
+        return response
+
+    def get_response(self, *args, **kwargs):
         if self.request.version == "2.0":
+            # the sync paginator applies the window of an incremental sync itself
             queryset = self.get_queryset(*args, **kwargs)
             page = self.paginate_queryset(queryset)
             self.post_paginate(page)
             serializer_class = self.get_serializer_class()
             serializer = serializer_class(page, many=True)
             return self.get_paginated_response(serializer.data)
+        if self.request.query_params.get("file_format") == "parquet":
+            return StreamingHttpResponse(
+                self.get_parquet_generator(*args, **kwargs), content_type=PARQUET_CONTENT_TYPE
+            )
         return StreamingHttpResponse(self.get_data_generator(*args, **kwargs), content_type="text/csv")
 
 
@@ -233,6 +279,7 @@ class OpportunityScopedDataView(OpportunityDataExportView, BaseDataExportListVie
 
 class OpportunityUserDataView(OpportunityScopedDataView):
     serializer_class = OpportunityUserDataSerializer
+    parquet_category_fields = ("user_invite_status",)
 
     def get_queryset(self, request, opp_id):
         return OpportunityAccess.objects.filter(opportunity=self.opportunity).annotate(
@@ -246,6 +293,7 @@ class OpportunityUserDataView(OpportunityScopedDataView):
 
 class UserVisitDataView(OpportunityScopedDataView):
     serializer_class = UserVisitDataSerializer
+    modified_field = "date_modified"
 
     def _include_images(self):
         return self.request.query_params.get("images", "").lower() == "true"
@@ -266,18 +314,14 @@ class UserVisitDataView(OpportunityScopedDataView):
         if self._include_images():
             self._prefetch_images(page)
 
-    def get_data_generator(self, *args, **kwargs):
+    def get_rows(self, *args, **kwargs):
         serializer_class = self.get_serializer_class()
-        fieldnames = serializer_class().get_fields().keys()
-        writer = csv.DictWriter(EchoWriter(), fieldnames=fieldnames)
-        yield writer.writeheader()
-
-        queryset = self.get_queryset(*args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset(*args, **kwargs))
         include_images = self._include_images()
 
         if not include_images:
             for obj in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
-                yield writer.writerow(serializer_class(obj).data)
+                yield serializer_class(obj).data
         else:
             batch = []
             for obj in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
@@ -285,12 +329,12 @@ class UserVisitDataView(OpportunityScopedDataView):
                 if len(batch) >= STREAM_CHUNK_SIZE:
                     self._prefetch_images(batch)
                     for visit in batch:
-                        yield writer.writerow(serializer_class(visit).data)
+                        yield serializer_class(visit).data
                     batch = []
             if batch:
                 self._prefetch_images(batch)
                 for visit in batch:
-                    yield writer.writerow(serializer_class(visit).data)
+                    yield serializer_class(visit).data
 
     def _prefetch_images(self, visits):
         xform_ids = [v.xform_id for v in visits]
@@ -303,6 +347,7 @@ class UserVisitDataView(OpportunityScopedDataView):
 
 class CompletedWorkDataView(OpportunityScopedDataView):
     serializer_class = CompletedWorkDataSerializer
+    modified_field = "last_modified"
 
     def get_queryset(self, request, opp_id):
         return (
@@ -317,6 +362,7 @@ class CompletedWorkDataView(OpportunityScopedDataView):
 
 class PaymentDataView(OpportunityScopedDataView):
     serializer_class = PaymentDataSerializer
+    modified_field = "date_modified"
 
     def get_queryset(self, request, opp_id):
         return Payment.objects.filter(
@@ -329,6 +375,7 @@ class PaymentDataView(OpportunityScopedDataView):
 
 class InvoiceDataView(OpportunityScopedDataView):
     serializer_class = InvoiceDataSerializer
+    modified_field = "date_modified"
 
     def get_queryset(self, request, opp_id):
         opportunity = _get_opportunity_or_404(request.user, opp_id)
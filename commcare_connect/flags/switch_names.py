@@ -2,3 +2,7 @@ AUTOMATIC_VISIT_VERIFICATION = "automatic_visit_verification"
 OPPORTUNITY_CREDENTIALS = "opportunity_credentials"
 API_UUID = "api_uuid"
 WORKER_VISITS_TASKS = "worker_visits_tasks"
+ASYNC_FORM_INGESTION = "async_form_ingestion"
+VISIT_LIMIT_COUNTERS = "visit_limit_counters"
+DEFERRED_PAYMENT_ACCRUAL = "deferred_payment_accrual"
+XFORM_IDEMPOTENCY = "xform_idempotency"
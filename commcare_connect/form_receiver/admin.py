@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from commcare_connect.form_receiver.inbox import requeue_inbox_entries
+from commcare_connect.form_receiver.models import ProcessedXForm, XFormInboxEntry
+
+
+@admin.register(XFormInboxEntry)
+class XFormInboxEntryAdmin(admin.ModelAdmin):
+    list_display = ["xform_id", "username", "status", "attempts", "received_on", "next_attempt_on", "processed_on"]
+    list_filter = ["status", "hq_server"]
+    search_fields = ["xform_id", "username"]
+    readonly_fields = ["xform_id", "hq_server", "username", "user_bucket", "payload", "received_on", "processed_on"]
+    ordering = ["id"]
+    actions = ["requeue_entries"]
+
+    @admin.action(description="Requeue selected entries")
+    def requeue_entries(self, request, queryset):
+        count = requeue_inbox_entries(queryset)
+        self.message_user(request, f"{count} entries requeued.")
+
+
+@admin.register(ProcessedXForm)
+class ProcessedXFormAdmin(admin.ModelAdmin):
+    list_display = ["xform_id", "processed_on"]
+    search_fields = ["xform_id"]
+    ordering = ["-id"]
@@ -0,0 +1,123 @@
+import dataclasses
+import logging
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import APIException
+
+from commcare_connect.commcarehq.models import HQServer
+from commcare_connect.form_receiver.metrics import track_form_ingestion
+from commcare_connect.form_receiver.processor import (
+    _get_commcare_username,
+    check_duplicate_xform,
+    get_duplicate_submission_message,
+    get_opportunity,
+    get_user,
+    process_xform_for_opportunities,
+)
+from commcare_connect.form_receiver.serializers import XForm, XFormSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class BatchFormStatus:
+    PROCESSED = "processed"
+    DUPLICATE = "duplicate"
+    ERROR = "error"
+
+
+@dataclasses.dataclass
+class BatchFormResult:
+    id: str | None
+    status: str
+    detail: str | None = None
+
+    def to_dict(self):
+        return dataclasses.asdict(self)
+
+
+class _LookupCache:
+    """Memoizes user and opportunity lookups for the duration of a single batch."""
+
+    def __init__(self, hq_server: HQServer):
+        self.hq_server = hq_server
+        self._users = {}
+        self._opportunities = {}
+
+    def get_user(self, xform: XForm):
+        username = _get_commcare_username(xform)
+        if username not in self._users:
+            self._users[username] = _call_or_error(get_user, xform)
+        return _unwrap(self._users[username])
+
+    def get_opportunities(self, xform: XForm):
+        key = (xform.domain, xform.app_id)
+        if key not in self._opportunities:
+            self._opportunities[key] = _call_or_error(self._resolve_opportunities, xform)
+        return _unwrap(self._opportunities[key])
+
+    def _resolve_opportunities(self, xform: XForm):
+        deliver_opportunity = get_opportunity(xform.domain, self.hq_server, deliver_app_id=xform.app_id)
+        learn_opportunity = get_opportunity(xform.domain, self.hq_server, learn_app_id=xform.app_id)
+        return deliver_opportunity, learn_opportunity
+
+
+def _call_or_error(func, *args):
+    try:
+        return func(*args), None
+    except APIException as e:
+        return None, e
+
+
+def _unwrap(cached):
+    value, error = cached
+    if error is not None:
+        raise error
+    return value
+
+
+def process_xform_batch(form_data: list[dict], hq_server: HQServer) -> list[dict]:
+    """Process a list of forms received from CommCare HQ in a single request.
+
+    Forms are processed in the order they were submitted, so that the learn and deliver forms of
+    a user are applied in the same order as when they are submitted one at a time. The user and
+    opportunity lookups are only done once per batch. Each form is processed in its own transaction
+    so that a failure on one form does not affect the others."""
+    results = []
+    lookups = _LookupCache(hq_server)
+
+    for data in form_data:
+        form_id = data.get("id") if isinstance(data, dict) else None
+        serializer = XFormSerializer(data=data)
+        if not serializer.is_valid():
+            results.append(BatchFormResult(form_id, BatchFormStatus.ERROR, str(serializer.errors)))
+            continue
+        xform = serializer.save()
+        try:
+            user = lookups.get_user(xform)
+            deliver_opportunity, learn_opportunity = lookups.get_opportunities(xform)
+        except APIException as e:
+            results.append(BatchFormResult(xform.id, BatchFormStatus.ERROR, str(e.detail)))
+            continue
+        results.append(_process_batch_form(xform, user, deliver_opportunity, learn_opportunity))
+    return [result.to_dict() for result in results]
+
+
+def _process_batch_form(xform: XForm, user, deliver_opportunity, learn_opportunity) -> BatchFormResult:
+    try:
+        with track_form_ingestion(xform.id), transaction.atomic():
+            check_duplicate_xform(xform)
+            process_xform_for_opportunities(user, xform, deliver_opportunity, learn_opportunity)
+    except APIException as e:
+        return BatchFormResult(xform.id, BatchFormStatus.ERROR, str(e.detail))
+    except IntegrityError as e:
+        message = get_duplicate_submission_message(e, xform)
+        if message is not None:
+            logger.info(message)
+            return BatchFormResult(xform.id, BatchFormStatus.DUPLICATE, message)
+        logger.exception(f"Unexpected error processing form with ID: {xform.id}")
+        return BatchFormResult(xform.id, BatchFormStatus.ERROR, "A server error occurred.")
+    except Exception:
+        # unexpected errors should not prevent the rest of the batch from being processed
+        logger.exception(f"Unexpected error processing form with ID: {xform.id}")
+        return BatchFormResult(xform.id, BatchFormStatus.ERROR, "A server error occurred.")
+    return BatchFormResult(xform.id, BatchFormStatus.PROCESSED)
@@ -0,0 +1,254 @@
+"""Record and replay load benchmark for form ingestion.
+
+A corpus is a JSON lines file with one CommCare HQ form submission per line. It can be captured
+from the forms already processed by an instance or generated for the users and deliver units of
+an existing opportunity. Replaying the corpus runs every form through ``process_xform`` in the
+same way as the ``FormReceiver`` view, using a pool of threads that each hold their own database
+connection.
+"""
+
+import copy
+import dataclasses
+import datetime
+import json
+import logging
+import math
+import queue
+import random
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from uuid import uuid4
+
+from django.db import IntegrityError, connection, transaction
+from django.utils.timezone import now
+from rest_framework.exceptions import APIException
+
+from commcare_connect.commcarehq.models import HQServer
+from commcare_connect.form_receiver import metrics
+from commcare_connect.form_receiver.const import CCC_LEARN_XMLNS
+from commcare_connect.form_receiver.metrics import track_form_ingestion
+from commcare_connect.form_receiver.models import XFormInboxEntry
+from commcare_connect.form_receiver.processor import get_duplicate_submission_message, process_xform
+from commcare_connect.form_receiver.serializers import XFormSerializer
+from commcare_connect.opportunity.models import DeliverUnit, Opportunity, OpportunityAccess, UserVisit
+from commcare_connect.users.models import ConnectIDUserLink
+
+logger = logging.getLogger(__name__)
+
+LOCK_STAGES = (metrics.CLAIM_LIMIT_LOCK, metrics.WORK_AREA_LOCK)
+
+
+def read_corpus(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_corpus(path: str, forms: Iterable[dict]) -> int:
+    count = 0
+    with open(path, "w") as f:
+        for form in forms:
+            f.write(json.dumps(form, default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def capture_visit_forms(opportunity_id: int | None = None, limit: int = 1000) -> Iterator[dict]:
+    """Forms that were processed into user visits, most recent first."""
+    visits = UserVisit.objects.order_by("-id")
+    if opportunity_id:
+        visits = visits.filter(opportunity_id=opportunity_id)
+    yield from visits.values_list("form_json", flat=True)[:limit].iterator()
+
+
+def capture_inbox_forms(limit: int = 1000) -> Iterator[dict]:
+    """Forms received by the asynchronous ingestion inbox, most recent first."""
+    yield from XFormInboxEntry.objects.order_by("-id").values_list("payload", flat=True)[:limit].iterator()
+
+
+def generate_deliver_forms(opportunity: Opportunity, count: int) -> Iterator[dict]:
+    """Deliver forms for the users and paid deliver units of an opportunity, spread across
+    the users of the opportunity in the same way as the data from ``generate_sample_data``."""
+    app = opportunity.deliver_app
+    deliver_units = list(DeliverUnit.objects.filter(app=app, payment_unit__isnull=False))
+    user_ids = OpportunityAccess.objects.filter(opportunity=opportunity).values("user_id")
+    usernames = list(
+        ConnectIDUserLink.objects.filter(user_id__in=user_ids).values_list("commcare_username", flat=True).distinct()
+    )
+    if not deliver_units or not usernames:
+        raise ValueError("The opportunity needs deliver units with payment units and users linked to CommCare")
+
+    start = now() - datetime.timedelta(days=1)
+    for i in range(count):
+        time_start = start + datetime.timedelta(seconds=i)
+        deliver_unit = random.choice(deliver_units)
+        form_id = str(uuid4())
+        meta = {
+            "@xmlns": "http://openrosa.org/jr/xforms",
+            "app_build_version": 1,
+            "instanceID": form_id,
+            "timeStart": time_start.isoformat(),
+            "timeEnd": (time_start + datetime.timedelta(minutes=random.randint(2, 20))).isoformat(),
+            "username": random.choice(usernames),
+            "location": f"{random.uniform(-1, 1):.6f} {random.uniform(30, 32):.6f} 0 10",
+        }
+        yield {
+            "domain": app.cc_domain,
+            "id": form_id,
+            "app_id": app.cc_app_id,
+            "build_id": uuid4().hex,
+            "received_on": time_start.isoformat(),
+            "metadata": meta,
+            "form": {
+                "@xmlns": "http://openrosa.org/formdesigner/benchmark",
+                "@name": "Benchmark Visit",
+                "meta": meta,
+                "deliver": {
+                    "@xmlns": CCC_LEARN_XMLNS,
+                    "@id": deliver_unit.slug,
+                    "name": deliver_unit.name,
+                    "entity_id": str(uuid4()),
+                    "entity_name": f"Entity {i}",
+                },
+            },
+            "attachments": {},
+        }
+
+
+def with_new_form_id(form: dict) -> dict:
+    """Copy of a form with a new ID so that replaying a corpus more than once does not
+    only exercise the duplicate submission path."""
+    form = copy.deepcopy(form)
+    form_id = str(uuid4())
+    form["id"] = form_id
+    for meta in (form.get("metadata"), form.get("form", {}).get("meta")):
+        if isinstance(meta, dict):
+            meta["instanceID"] = form_id
+    return form
+
+
+@dataclasses.dataclass
+class FormResult:
+    status: str
+    latency: float
+    queries: int
+    # None when the ingestion stages are not timed (FORM_INGESTION_METRICS off)
+    lock_wait: float | None
+
+
+@dataclasses.dataclass
+class BenchmarkReport:
+    results: list[FormResult]
+    elapsed: float
+    concurrency: int
+
+    def count(self, status=None):
+        return sum(1 for result in self.results if status is None or result.status == status)
+
+    @property
+    def forms_per_second(self):
+        return len(self.results) / self.elapsed if self.elapsed else 0
+
+    def latency_percentile(self, percent):
+        return percentile([result.latency for result in self.results], percent)
+
+    @property
+    def lock_wait_available(self):
+        return bool(self.results) and all(result.lock_wait is not None for result in self.results)
+
+    def lock_wait_percentile(self, percent):
+        if not self.lock_wait_available:
+            return None
+        return percentile([result.lock_wait for result in self.results], percent)
+
+    @property
+    def queries_per_form(self):
+        return sum(result.queries for result in self.results) / len(self.results) if self.results else 0
+
+    @property
+    def total_lock_wait(self):
+        if not self.lock_wait_available:
+            return None
+        return sum(result.lock_wait for result in self.results)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest rank percentile."""
+    if not values:
+        return 0
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class FormResultStatus:
+    PROCESSED = "processed"
+    DUPLICATE = "duplicate"
+    ERROR = "error"
+
+
+def replay_form(form: dict, hq_server: HQServer) -> FormResult:
+    """Process a single form in its own transaction, as the form receiver does per request."""
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    status = FormResultStatus.PROCESSED
+    xform = None
+    start = time.perf_counter()
+    with connection.execute_wrapper(count_queries), track_form_ingestion(form.get("id")) as timer:
+        try:
+            serializer = XFormSerializer(data=form)
+            serializer.is_valid(raise_exception=True)
+            xform = serializer.save()
+            with transaction.atomic():
+                process_xform(xform, hq_server)
+        except IntegrityError as e:
+            status = (
+                FormResultStatus.DUPLICATE if get_duplicate_submission_message(e, xform) else FormResultStatus.ERROR
+            )
+        except APIException:
+            status = FormResultStatus.ERROR
+        except Exception:
+            # a bad form in the corpus or a database error must not stop the rest of the replay
+            logger.exception(f"Unexpected error replaying form with ID: {form.get('id')}")
+            status = FormResultStatus.ERROR
+    latency = time.perf_counter() - start
+    lock_wait = None
+    if timer is not None:
+        lock_wait = sum(timer.stages[stage][0] for stage in LOCK_STAGES if stage in timer.stages)
+    return FormResult(status=status, latency=latency, queries=queries, lock_wait=lock_wait)
+
+
+def replay_corpus(forms: list[dict], hq_server: HQServer, concurrency: int = 1) -> BenchmarkReport:
+    """Replay the forms with ``concurrency`` threads, each using its own database connection."""
+    pending = queue.SimpleQueue()
+    for index, form in enumerate(forms):
+        pending.put((index, form))
+    results: list[FormResult | None] = [None] * len(forms)
+
+    def worker():
+        try:
+            while True:
+                try:
+                    index, form = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results[index] = replay_form(form, hq_server)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return BenchmarkReport(
+        results=[result for result in results if result is not None], elapsed=elapsed, concurrency=concurrency
+    )
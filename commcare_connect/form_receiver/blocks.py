@@ -0,0 +1,64 @@
+import dataclasses
+
+from commcare_connect.form_receiver.const import CCC_LEARN_XMLNS
+
+LEARN_MODULE_BLOCK = "module"
+TASK_MODULE_BLOCK = "task"
+ASSESSMENT_BLOCK = "assessment"
+DELIVER_UNIT_BLOCK = "deliver"
+WORK_AREA_UPDATE_BLOCK = "work_area_update"
+
+CONNECT_BLOCK_NAMES = (
+    LEARN_MODULE_BLOCK,
+    TASK_MODULE_BLOCK,
+    ASSESSMENT_BLOCK,
+    DELIVER_UNIT_BLOCK,
+    WORK_AREA_UPDATE_BLOCK,
+)
+
+
+@dataclasses.dataclass
+class ConnectBlocks:
+    """Connect blocks found in a form, in the order they appear in the form."""
+
+    module: list[dict] = dataclasses.field(default_factory=list)
+    task: list[dict] = dataclasses.field(default_factory=list)
+    assessment: list[dict] = dataclasses.field(default_factory=list)
+    deliver: list[dict] = dataclasses.field(default_factory=list)
+    work_area_update: list[dict] = dataclasses.field(default_factory=list)
+
+    def get(self, block_name: str) -> list[dict]:
+        return getattr(self, block_name)
+
+
+def extract_connect_blocks(form: dict, xmlns: str = CCC_LEARN_XMLNS) -> ConnectBlocks:
+    """Collect all Connect blocks in the form with a single walk of the form tree.
+
+    This is equivalent to running a ``$..<block_name>`` jsonpath search for each block type
+    and keeping the matches in the Connect namespace, including the order of the matches:
+    blocks directly under a node come before blocks nested deeper in any of its children."""
+    blocks = ConnectBlocks()
+    stack = [form]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for block_name in CONNECT_BLOCK_NAMES:
+                value = node.get(block_name)
+                if value is not None:
+                    _collect_block(blocks.get(block_name), value, xmlns)
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            continue
+        stack.extend(child for child in reversed(list(children)) if isinstance(child, dict | list))
+    return blocks
+
+
+def _collect_block(matches: list[dict], value, xmlns: str):
+    if isinstance(value, dict):
+        if value.get("@xmlns") == xmlns:
+            matches.append(value)
+    elif isinstance(value, list):
+        # a block inside a repeat group
+        matches.extend(item for item in value if isinstance(item, dict) and item.get("@xmlns") == xmlns)
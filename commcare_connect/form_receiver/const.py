@@ -1 +1,4 @@
 CCC_LEARN_XMLNS = """http://commcareconnect.com/data/v1/learn"""
+
+# Maximum number of forms accepted by the batch receiver in a single request
+BATCH_RECEIVER_MAX_FORMS = 500
@@ -1,6 +1,12 @@
+from django.db import IntegrityError
 from rest_framework import status
 from rest_framework.exceptions import APIException
 
 
 class ProcessingError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
+
+
+class DuplicateXFormError(IntegrityError):
+    """Raised for a form that is known to be processed already, without running the query that would
+    fail on the ``unique_processed_xform`` constraint."""
@@ -0,0 +1,43 @@
+"""Early detection of forms that have already been processed.
+
+CommCare HQ retries form forwarding, so the same form is often received more than once. When the
+xform_idempotency switch is enabled, the ID of every processed form is stored in the
+``ProcessedXForm`` table and in the cache. A repeated form is rejected with a single cache lookup
+or, once the cache entry has expired, by the unique constraint on the first insert of the form
+transaction, before the user, opportunity and claim limits are resolved.
+"""
+
+import datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from commcare_connect.form_receiver.exceptions import DuplicateXFormError
+from commcare_connect.form_receiver.models import ProcessedXForm
+
+PROCESSED_XFORM_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _cache_key(xform_id: str) -> str:
+    return f"processed_xform:{xform_id}"
+
+
+def record_processed_xform(xform_id: str):
+    """Record the form as processed in the current transaction.
+
+    Raises an ``IntegrityError`` on the ``unique_processed_xform`` constraint when the form was
+    already processed. Must be called inside the transaction that processes the form so that the
+    record is rolled back when processing fails."""
+    if cache.get(_cache_key(xform_id)):
+        raise DuplicateXFormError(f"unique_processed_xform: form {xform_id} has already been processed")
+    ProcessedXForm.objects.create(xform_id=xform_id)
+    transaction.on_commit(partial(cache.set, _cache_key(xform_id), True, PROCESSED_XFORM_CACHE_TIMEOUT))
+
+
+def delete_old_processed_xforms() -> int:
+    cutoff = now() - datetime.timedelta(days=settings.PROCESSED_XFORM_RETENTION_DAYS)
+    deleted, _ = ProcessedXForm.objects.filter(processed_on__lt=cutoff).delete()
+    return deleted
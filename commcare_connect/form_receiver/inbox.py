@@ -0,0 +1,155 @@
+import datetime
+import logging
+import time
+import zlib
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils.timezone import now
+
+from commcare_connect.commcarehq.models import HQServer
+from commcare_connect.form_receiver.models import XFormInboxEntry, XFormInboxStatus
+from commcare_connect.form_receiver.processor import (
+    _get_commcare_username,
+    get_duplicate_submission_message,
+    process_xform,
+)
+from commcare_connect.form_receiver.serializers import XForm, XFormSerializer
+
+logger = logging.getLogger(__name__)
+
+USER_BUCKETS = 1024
+INBOX_DRAIN_BATCH_SIZE = 100
+# seconds a single drain task may spend before handing off to a new task
+INBOX_DRAIN_TIME_BUDGET = 240
+INBOX_RETRY_BASE_DELAY = 30
+INBOX_RETRY_MAX_DELAY = 60 * 60
+ACTIVE_INBOX_STATUSES = [XFormInboxStatus.PENDING, XFormInboxStatus.RETRYING]
+
+
+def get_user_bucket(username: str) -> int:
+    return zlib.crc32(username.encode()) % USER_BUCKETS
+
+
+def get_inbox_slot(user_bucket: int) -> int:
+    return user_bucket % settings.FORM_INBOX_CONCURRENCY
+
+
+def enqueue_xform(xform: XForm, hq_server: HQServer) -> tuple[XFormInboxEntry, bool]:
+    """Persist a form to the inbox, ignoring forms that have already been received."""
+    from commcare_connect.form_receiver.tasks import process_form_inbox_slot
+
+    username = _get_commcare_username(xform)
+    user_bucket = get_user_bucket(username)
+    entry, created = XFormInboxEntry.objects.get_or_create(
+        xform_id=xform.id,
+        defaults={
+            "hq_server": hq_server,
+            "username": username,
+            "user_bucket": user_bucket,
+            "payload": xform.raw_form,
+        },
+    )
+    if created:
+        transaction.on_commit(partial(process_form_inbox_slot.delay, get_inbox_slot(user_bucket)))
+    return entry, created
+
+
+def get_active_inbox_slots() -> set[int]:
+    buckets = (
+        XFormInboxEntry.objects.filter(status__in=ACTIVE_INBOX_STATUSES)
+        .values_list("user_bucket", flat=True)
+        .distinct()
+    )
+    return {get_inbox_slot(bucket) for bucket in buckets}
+
+
+def drain_inbox_slot(slot: int) -> bool:
+    """Process inbox entries for a slot in the order they were received.
+
+    Entries for a user whose earlier form is waiting to be retried are held back so
+    that forms from the same user are always processed in order.
+    Returns True if the time budget ran out before the slot was drained."""
+    deadline = time.monotonic() + INBOX_DRAIN_TIME_BUDGET
+    slot_entries = XFormInboxEntry.objects.alias(slot=Mod(F("user_bucket"), settings.FORM_INBOX_CONCURRENCY)).filter(
+        slot=slot, status__in=ACTIVE_INBOX_STATUSES
+    )
+
+    while time.monotonic() < deadline:
+        blocked_users = set(
+            slot_entries.filter(status=XFormInboxStatus.RETRYING, next_attempt_on__gt=now()).values_list(
+                "username", flat=True
+            )
+        )
+        entries = list(
+            slot_entries.exclude(username__in=blocked_users)
+            .select_related("hq_server")
+            .order_by("id")[:INBOX_DRAIN_BATCH_SIZE]
+        )
+        if not entries:
+            return False
+
+        for entry in entries:
+            if entry.username in blocked_users:
+                continue
+            if not process_inbox_entry(entry) and entry.status == XFormInboxStatus.RETRYING:
+                blocked_users.add(entry.username)
+            if time.monotonic() >= deadline:
+                break
+    return True
+
+
+def process_inbox_entry(entry: XFormInboxEntry) -> bool:
+    """Process a single inbox entry. Returns True if the form was processed."""
+    serializer = XFormSerializer(data=entry.payload)
+    serializer.is_valid(raise_exception=True)
+    xform = serializer.save()
+    try:
+        with transaction.atomic():
+            process_xform(xform, entry.hq_server)
+    except IntegrityError as e:
+        message = get_duplicate_submission_message(e, xform)
+        if message is None:
+            _record_failure(entry, e)
+            return False
+        logger.info(message)
+    except Exception as e:
+        _record_failure(entry, e)
+        return False
+
+    entry.status = XFormInboxStatus.PROCESSED
+    entry.processed_on = now()
+    entry.next_attempt_on = None
+    entry.save(update_fields=["status", "processed_on", "next_attempt_on"])
+    return True
+
+
+def _record_failure(entry: XFormInboxEntry, error: Exception):
+    logger.warning(f"Failed to process inbox form with ID: {entry.xform_id}", exc_info=error)
+    entry.attempts += 1
+    entry.last_error = f"{error.__class__.__name__}: {error}"
+    if entry.attempts >= settings.FORM_INBOX_MAX_ATTEMPTS:
+        entry.status = XFormInboxStatus.DEAD_LETTER
+        entry.next_attempt_on = None
+    else:
+        entry.status = XFormInboxStatus.RETRYING
+        delay = min(INBOX_RETRY_BASE_DELAY * 2 ** (entry.attempts - 1), INBOX_RETRY_MAX_DELAY)
+        entry.next_attempt_on = now() + datetime.timedelta(seconds=delay)
+    entry.save(update_fields=["attempts", "last_error", "status", "next_attempt_on"])
+
+
+def delete_old_inbox_entries() -> int:
+    """Delete processed entries, and with them their form payloads, once the retention period has passed."""
+    cutoff = now() - datetime.timedelta(days=settings.FORM_INBOX_RETENTION_DAYS)
+    deleted, _ = XFormInboxEntry.objects.filter(status=XFormInboxStatus.PROCESSED, processed_on__lt=cutoff).delete()
+    return deleted
+
+
+def requeue_inbox_entries(queryset):
+    """Move entries back to the pending state so that they are picked up again by the workers."""
+    return queryset.exclude(status=XFormInboxStatus.PROCESSED).update(
+        status=XFormInboxStatus.PENDING, attempts=0, next_attempt_on=None
+    )
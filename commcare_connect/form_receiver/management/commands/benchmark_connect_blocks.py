@@ -0,0 +1,80 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from jsonpath_ng.ext import parse
+
+from commcare_connect.form_receiver.blocks import CONNECT_BLOCK_NAMES, extract_connect_blocks
+from commcare_connect.form_receiver.const import CCC_LEARN_XMLNS
+
+QUESTION_TYPES = ["text", "int", "select", "date", "geopoint"]
+
+
+def build_benchmark_form(repeats: int, questions: int) -> dict:
+    """Build a form shaped like a large household survey: a few top level groups and a repeat
+    group with one deliver block per household member."""
+    form = {
+        "@xmlns": "http://openrosa.org/formdesigner/benchmark",
+        "@name": "Household Visit",
+        "meta": {"instanceID": "benchmark", "timeStart": "2024-01-01T10:00:00Z", "timeEnd": "2024-01-01T10:30:00Z"},
+        "household": {f"q_{i}_{QUESTION_TYPES[i % len(QUESTION_TYPES)]}": str(i) for i in range(questions)},
+        "task": {"@xmlns": CCC_LEARN_XMLNS, "@id": "household_task", "name": "Household task"},
+        "work_area_update": {"@xmlns": CCC_LEARN_XMLNS, "work_area_id": "1", "status": "visited"},
+    }
+    form["members"] = [
+        {
+            "member_details": {f"m_{i}": {"value": str(i), "label": f"Question {i}"} for i in range(questions)},
+            "deliver": {
+                "@xmlns": CCC_LEARN_XMLNS,
+                "@id": "member_visit",
+                "name": "Member visit",
+                "entity_id": f"member-{n}",
+                "entity_name": f"Member {n}",
+            },
+        }
+        for n in range(repeats)
+    ]
+    return form
+
+
+def _extract_with_jsonpath(form, jsonpaths):
+    return {
+        block_name: [match.value for match in jsonpath.find(form) if match.value["@xmlns"] == CCC_LEARN_XMLNS]
+        for block_name, jsonpath in jsonpaths.items()
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare Connect block extraction with a single tree walk against the per block jsonpath searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--form-file", help="Path to a JSON file containing a form submission to benchmark")
+        parser.add_argument("--repeats", type=int, default=50, help="Repeat group size of the generated form")
+        parser.add_argument("--questions", type=int, default=100, help="Questions per group of the generated form")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["form_file"]:
+            with open(options["form_file"]) as f:
+                form = json.load(f)
+            # accept both the full submission and only the form body
+            form = form.get("form", form)
+        else:
+            form = build_benchmark_form(options["repeats"], options["questions"])
+
+        jsonpaths = {block_name: parse(f"$..{block_name}") for block_name in CONNECT_BLOCK_NAMES}
+        blocks = extract_connect_blocks(form)
+        expected = _extract_with_jsonpath(form, jsonpaths)
+        for block_name in CONNECT_BLOCK_NAMES:
+            if blocks.get(block_name) != expected[block_name]:
+                raise CommandError(f"Extracted '{block_name}' blocks do not match the jsonpath results")
+
+        iterations = options["iterations"]
+        jsonpath_time = timeit.timeit(lambda: _extract_with_jsonpath(form, jsonpaths), number=iterations)
+        tree_walk_time = timeit.timeit(lambda: extract_connect_blocks(form), number=iterations)
+
+        block_counts = ", ".join(f"{name}={len(blocks.get(name))}" for name in CONNECT_BLOCK_NAMES)
+        self.stdout.write(f"Blocks found: {block_counts}")
+        self.stdout.write(f"jsonpath:  {jsonpath_time / iterations * 1000:.2f}ms per form")
+        self.stdout.write(f"tree walk: {tree_walk_time / iterations * 1000:.2f}ms per form")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {jsonpath_time / tree_walk_time:.1f}x"))
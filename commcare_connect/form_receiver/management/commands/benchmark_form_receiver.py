@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from commcare_connect.commcarehq.models import HQServer
+from commcare_connect.form_receiver.benchmark import (
+    FormResultStatus,
+    read_corpus,
+    replay_corpus,
+    with_new_form_id,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a corpus of form submissions against process_xform and report throughput, latency, "
+        "queries per form and lock wait time. Processed forms are saved, only run this against a local database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", help="JSON lines file written by capture_xform_corpus")
+        parser.add_argument("--hq-server", type=int, help="HQ server the forms are received from")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--limit", type=int, help="Only replay the first forms of the corpus")
+        parser.add_argument(
+            "--keep-ids",
+            action="store_true",
+            help="Replay the forms with their original IDs instead of new ones, forms that were already "
+            "processed are then reported as duplicates",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("The benchmark writes the replayed forms to the database and only runs with DEBUG on")
+
+        forms = read_corpus(options["corpus"])[: options["limit"]]
+        if not options["keep_ids"]:
+            forms = [with_new_form_id(form) for form in forms]
+        if not forms:
+            raise CommandError("The corpus is empty")
+
+        if options["hq_server"]:
+            hq_server = HQServer.objects.filter(pk=options["hq_server"]).first()
+        else:
+            hq_server = HQServer.objects.order_by("pk").first()
+        if hq_server is None:
+            raise CommandError("HQ server not found")
+
+        self.stdout.write(f"Replaying {len(forms)} forms with {options['concurrency']} threads...")
+        report = replay_corpus(forms, hq_server, options["concurrency"])
+
+        self.stdout.write(
+            f"Forms: {report.count()} "
+            f"(processed={report.count(FormResultStatus.PROCESSED)}, "
+            f"duplicate={report.count(FormResultStatus.DUPLICATE)}, "
+            f"error={report.count(FormResultStatus.ERROR)})"
+        )
+        self.stdout.write(f"Elapsed: {report.elapsed:.2f}s")
+        self.stdout.write(
+            "Latency: " + ", ".join(f"p{p}={report.latency_percentile(p) * 1000:.1f}ms" for p in (50, 95, 99))
+        )
+        self.stdout.write(f"Queries per form: {report.queries_per_form:.1f}")
+        if report.lock_wait_available:
+            self.stdout.write(
+                f"Lock wait: total={report.total_lock_wait:.2f}s, "
+                + ", ".join(f"p{p}={report.lock_wait_percentile(p) * 1000:.1f}ms" for p in (50, 95, 99))
+            )
+        else:
+            self.stdout.write("Lock wait: unavailable, enable FORM_INGESTION_METRICS to time the lock stages")
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {report.forms_per_second:.1f} forms/sec"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commcare_connect.form_receiver.benchmark import (
+    capture_inbox_forms,
+    capture_visit_forms,
+    generate_deliver_forms,
+    write_corpus,
+)
+from commcare_connect.opportunity.models import Opportunity
+
+
+class Command(BaseCommand):
+    help = "Write a corpus of form submissions to replay with benchmark_form_receiver"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the JSON lines file to write")
+        parser.add_argument(
+            "--source",
+            choices=["visits", "inbox", "generate"],
+            default="visits",
+            help="Capture the forms of existing user visits or inbox entries, or generate new deliver forms",
+        )
+        parser.add_argument("--opp", type=int, help="Opportunity to capture or generate forms for")
+        parser.add_argument("--count", type=int, default=1000, help="Number of forms to capture or generate")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        count = options["count"]
+        if source == "visits":
+            forms = capture_visit_forms(options["opp"], count)
+        elif source == "inbox":
+            forms = capture_inbox_forms(count)
+        else:
+            if not options["opp"]:
+                raise CommandError("--opp is required to generate forms")
+            try:
+                opportunity = Opportunity.objects.select_related("deliver_app").get(pk=options["opp"])
+            except Opportunity.DoesNotExist:
+                raise CommandError(f"Opportunity {options['opp']} does not exist")
+            try:
+                forms = list(generate_deliver_forms(opportunity, count))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        written = write_corpus(options["output"], forms)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} forms to {options['output']}"))
@@ -0,0 +1,209 @@
+"""Per stage timing of form ingestion.
+
+Each stage of ``process_xform`` is timed and the number of database queries it runs is counted.
+The measurements of a form are recorded as one observation per stage in two histograms, tagged
+with the stage and the opportunity the form was routed to. Observations are buffered in the
+process and periodically added to a Redis hash shared by all processes, which is rendered in the
+Prometheus text format by the metrics endpoint.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_CHECK = "duplicate_check"
+USER_LOOKUP = "user_lookup"
+OPPORTUNITY_LOOKUP = "opportunity_lookup"
+DELIVER_UNIT_LOOKUP = "deliver_unit_lookup"
+CLAIM_LIMIT_LOCK = "claim_limit_lock"
+VISIT_COUNTS = "visit_counts"
+VERIFICATION_FLAGS = "verification_flags"
+WORK_AREA_LOCK = "work_area_lock"
+WORK_AREA_STATUS = "work_area_status"
+VISIT_SAVE = "visit_save"
+COMPLETED_WORK = "completed_work"
+PAYMENT_ACCRUED = "payment_accrued"
+ATTACHMENTS = "attachments"
+
+DURATION_METRIC = "form_ingestion_stage_seconds"
+QUERIES_METRIC = "form_ingestion_stage_queries"
+METRICS = {
+    DURATION_METRIC: ("Time spent in each stage of form processing", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)),
+    QUERIES_METRIC: ("Database queries run by each stage of form processing", (1, 2, 5, 10, 25, 50, 100)),
+}
+# durations are stored as integer microseconds so they can be summed with HINCRBY
+DURATION_SCALE = 1_000_000
+
+METRICS_REDIS_KEY = "form_ingestion_metrics"
+
+_current_timer = contextvars.ContextVar("form_ingestion_timer", default=None)
+_buffer = defaultdict(int)
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class IngestionTimer:
+    def __init__(self, xform_id: str | None = None):
+        self.xform_id = xform_id
+        self.opportunity_id = None
+        self.stages = defaultdict(lambda: [0.0, 0])
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                yield
+        finally:
+            totals = self.stages[name]
+            totals[0] += time.perf_counter() - start
+            totals[1] += queries
+
+
+@contextlib.contextmanager
+def track_form_ingestion(xform_id: str | None = None):
+    """Time the stages of processing a single form and record them when the form is done."""
+    if _current_timer.get() is not None or not settings.FORM_INGESTION_METRICS:
+        # nested calls are timed by the outer tracker
+        yield _current_timer.get()
+        return
+
+    timer = IngestionTimer(xform_id)
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+        record_timings(timer)
+
+
+def ingestion_stage(name: str):
+    """Time a stage of the form currently being processed. Does nothing outside of ``track_form_ingestion``."""
+    timer = _current_timer.get()
+    if timer is None:
+        return contextlib.nullcontext()
+    return timer.stage(name)
+
+
+def set_ingestion_opportunity(opportunity_id: int):
+    """Tag the form currently being processed with its opportunity. The first opportunity set is kept."""
+    timer = _current_timer.get()
+    if timer is not None and timer.opportunity_id is None:
+        timer.opportunity_id = opportunity_id
+
+
+def record_timings(timer: IngestionTimer):
+    if not timer.stages:
+        return
+    opportunity = str(timer.opportunity_id) if timer.opportunity_id is not None else "none"
+    with _buffer_lock:
+        for stage, (duration, queries) in timer.stages.items():
+            _observe(DURATION_METRIC, stage, opportunity, duration)
+            _observe(QUERIES_METRIC, stage, opportunity, queries)
+
+    if settings.FORM_INGESTION_METRICS_LOG:
+        timings = {
+            stage: {"seconds": round(duration, 6), "queries": queries}
+            for stage, (duration, queries) in timer.stages.items()
+        }
+        logger.info(
+            "form_ingestion %s",
+            json.dumps({"xform_id": timer.xform_id, "opportunity_id": timer.opportunity_id, "stages": timings}),
+        )
+
+    if time.monotonic() - _last_flush >= settings.FORM_INGESTION_METRICS_FLUSH_INTERVAL:
+        flush_metrics()
+
+
+def _observe(metric, stage, opportunity, value):
+    _, buckets = METRICS[metric]
+    bucket = next((str(le) for le in buckets if value <= le), "+Inf")
+    _buffer[_field(metric, stage, opportunity, bucket)] += 1
+    _buffer[_field(metric, stage, opportunity, "sum")] += (
+        round(value * DURATION_SCALE) if metric == DURATION_METRIC else value
+    )
+
+
+def _field(metric, stage, opportunity, suffix):
+    return f"{metric}|{stage}|{opportunity}|{suffix}"
+
+
+def flush_metrics():
+    """Add the observations buffered in this process to the shared Redis hash."""
+    global _last_flush
+    with _buffer_lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for field, value in pending.items():
+            pipeline.hincrby(METRICS_REDIS_KEY, field, value)
+        pipeline.execute()
+    except Exception:
+        # metrics must never break form processing, the observations are dropped
+        logger.warning("Unable to flush form ingestion metrics", exc_info=True)
+
+
+def collect_metrics() -> dict[str, int]:
+    """Return the shared observations together with the ones not yet flushed by this process."""
+    try:
+        stored = get_redis_connection("default").hgetall(METRICS_REDIS_KEY)
+    except Exception:
+        logger.warning("Unable to read form ingestion metrics", exc_info=True)
+        stored = {}
+    values = defaultdict(int, {_decode(field): int(value) for field, value in stored.items()})
+    with _buffer_lock:
+        for field, value in _buffer.items():
+            values[field] += value
+    return values
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def render_metrics(values: dict[str, int]) -> str:
+    """Render the observations as histograms in the Prometheus text exposition format."""
+    series = defaultdict(dict)
+    for field, value in values.items():
+        metric, stage, opportunity, suffix = field.split("|")
+        series[(metric, stage, opportunity)][suffix] = value
+
+    lines = []
+    for metric, (help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (series_metric, stage, opportunity), counts in sorted(series.items()):
+            if series_metric != metric:
+                continue
+            labels = f'stage="{stage}",opportunity="{opportunity}"'
+            cumulative = 0
+            for le in [str(le) for le in buckets] + ["+Inf"]:
+                cumulative += counts.get(le, 0)
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+            total = counts.get("sum", 0)
+            if metric == DURATION_METRIC:
+                total = total / DURATION_SCALE
+            lines.append(f"{metric}_sum{{{labels}}} {total}")
+            lines.append(f"{metric}_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-16 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("commcarehq", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="XFormInboxEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("xform_id", models.CharField(max_length=50, unique=True)),
+                (
+                    "username",
+                    models.CharField(help_text="CommCare username of the form submitter", max_length=255),
+                ),
+                ("user_bucket", models.PositiveSmallIntegerField()),
+                ("payload", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("retrying", "Retrying"),
+                            ("processed", "Processed"),
+                            ("dead_letter", "Dead Letter"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, null=True)),
+                ("received_on", models.DateTimeField(auto_now_add=True)),
+                ("next_attempt_on", models.DateTimeField(blank=True, null=True)),
+                ("processed_on", models.DateTimeField(blank=True, null=True)),
+                (
+                    "hq_server",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="commcarehq.hqserver"),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "XForm inbox entries",
+                "indexes": [
+                    models.Index(fields=["status", "user_bucket", "id"], name="form_receiv_status_1149b6_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def create_periodic_task(apps, schema_editor):
+    CrontabSchedule = apps.get_model("django_celery_beat", "CrontabSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    schedule, _ = CrontabSchedule.objects.get_or_create(
+        minute="*",
+        hour="*",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+    )
+    PeriodicTask.objects.get_or_create(
+        name="drain_form_inbox",
+        defaults={
+            "task": "commcare_connect.form_receiver.tasks.drain_form_inbox",
+            "crontab": schedule,
+            "enabled": True,
+        },
+    )
+
+
+def remove_periodic_task(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="drain_form_inbox").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("form_receiver", "0001_initial"),
+        ("django_celery_beat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_periodic_task,
+            remove_periodic_task,
+            hints={"run_on_secondary": False},
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+def create_periodic_task(apps, schema_editor):
+    CrontabSchedule = apps.get_model("django_celery_beat", "CrontabSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    schedule, _ = CrontabSchedule.objects.get_or_create(
+        minute="30",
+        hour="2",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+    )
+    PeriodicTask.objects.get_or_create(
+        name="cleanup_processed_xforms",
+        defaults={
+            "task": "commcare_connect.form_receiver.tasks.cleanup_processed_xforms",
+            "crontab": schedule,
+            "enabled": True,
+        },
+    )
+
+
+def remove_periodic_task(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="cleanup_processed_xforms").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("form_receiver", "0002_drain_form_inbox_periodic_task"),
+        ("django_celery_beat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProcessedXForm",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("xform_id", models.CharField(max_length=50)),
+                ("processed_on", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="processedxform",
+            constraint=models.UniqueConstraint(fields=("xform_id",), name="unique_processed_xform"),
+        ),
+        migrations.RunPython(
+            create_periodic_task,
+            remove_periodic_task,
+            hints={"run_on_secondary": False},
+        ),
+    ]
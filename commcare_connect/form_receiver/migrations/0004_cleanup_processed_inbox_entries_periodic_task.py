@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def create_periodic_task(apps, schema_editor):
+    CrontabSchedule = apps.get_model("django_celery_beat", "CrontabSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    schedule, _ = CrontabSchedule.objects.get_or_create(
+        minute="45",
+        hour="2",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+    )
+    PeriodicTask.objects.get_or_create(
+        name="cleanup_processed_inbox_entries",
+        defaults={
+            "task": "commcare_connect.form_receiver.tasks.cleanup_processed_inbox_entries",
+            "crontab": schedule,
+            "enabled": True,
+        },
+    )
+
+
+def remove_periodic_task(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="cleanup_processed_inbox_entries").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("form_receiver", "0003_processedxform"),
+        ("django_celery_beat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_periodic_task,
+            remove_periodic_task,
+            hints={"run_on_secondary": False},
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import models
+from django.utils.translation import gettext
+
+from commcare_connect.commcarehq.models import HQServer
+
+
+class XFormInboxStatus(models.TextChoices):
+    PENDING = "pending", gettext("Pending")
+    RETRYING = "retrying", gettext("Retrying")
+    PROCESSED = "processed", gettext("Processed")
+    DEAD_LETTER = "dead_letter", gettext("Dead Letter")
+
+
+class XFormInboxEntry(models.Model):
+    """A raw form received from CommCare HQ that is waiting to be processed asynchronously."""
+
+    xform_id = models.CharField(max_length=50, unique=True)
+    hq_server = models.ForeignKey(HQServer, on_delete=models.CASCADE)
+    username = models.CharField(max_length=255, help_text="CommCare username of the form submitter")
+    # stable hash of the username, used to route all forms of a user to the same worker slot
+    user_bucket = models.PositiveSmallIntegerField()
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=XFormInboxStatus.choices, default=XFormInboxStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    received_on = models.DateTimeField(auto_now_add=True)
+    next_attempt_on = models.DateTimeField(null=True, blank=True)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "XForm inbox entries"
+        indexes = [
+            models.Index(fields=["status", "user_bucket", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.xform_id} ({self.status})"
+
+
+class ProcessedXForm(models.Model):
+    """The ID of a form that has been processed, used to reject repeated submissions of the same form
+    before any processing is done."""
+
+    xform_id = models.CharField(max_length=50)
+    processed_on = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["xform_id"], name="unique_processed_xform")]
+
+    def __str__(self):
+        return self.xform_id
@@ -1,22 +1,29 @@
+import copy
 import datetime
 import logging
 from functools import partial
 from uuid import UUID
 
 import pghistory
+from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
-from django.db import transaction
-from django.db.models import Count, Min, Q
+from django.contrib.gis.measure import D
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
 from django.utils.timezone import now
-from geopy.distance import distance
-from jsonpath_ng.exceptions import JSONPathError
-from jsonpath_ng.ext import parse
+from waffle import switch_is_active
 
 from commcare_connect.commcarehq.models import HQServer
-from commcare_connect.form_receiver.const import CCC_LEARN_XMLNS
+from commcare_connect.flags.switch_names import DEFERRED_PAYMENT_ACCRUAL, VISIT_LIMIT_COUNTERS, XFORM_IDEMPOTENCY
+from commcare_connect.form_receiver import metrics
+from commcare_connect.form_receiver.blocks import ASSESSMENT_BLOCK, LEARN_MODULE_BLOCK
 from commcare_connect.form_receiver.exceptions import ProcessingError
+from commcare_connect.form_receiver.idempotency import record_processed_xform
+from commcare_connect.form_receiver.metrics import ingestion_stage, set_ingestion_opportunity, track_form_ingestion
+from commcare_connect.form_receiver.routing import RouteRole, get_routes
 from commcare_connect.form_receiver.serializers import XForm
 from commcare_connect.microplanning.models import SRID, WorkArea, WorkAreaInaccessibilityRequest, WorkAreaStatus
+from commcare_connect.opportunity.app_units import get_deliver_unit_id, get_learn_module_id
 from commcare_connect.opportunity.models import (
     Assessment,
     AssignedTask,
@@ -26,14 +33,11 @@ from commcare_connect.opportunity.models import (
     CompletedWork,
     CompletedWorkStatus,
     DeliverUnit,
-    DeliverUnitFlagRules,
-    FormJsonValidationRules,
     LearnModule,
     Opportunity,
     OpportunityAccess,
     OpportunityClaim,
     OpportunityClaimLimit,
-    OpportunityVerificationFlags,
     UserVisit,
     VisitReviewStatus,
     VisitValidationStatus,
@@ -43,17 +47,18 @@ from commcare_connect.opportunity.tasks import (
     download_user_visit_attachments,
     notify_user_for_scored_assessment,
 )
-from commcare_connect.opportunity.visit_import import update_payment_accrued_for_user
+from commcare_connect.opportunity.utils.learn_progress import record_completed_modules
+from commcare_connect.opportunity.utils.visit_counters import (
+    UNCOUNTED_VISIT_STATUSES,
+    get_visit_counts,
+    increment_visit_counters,
+)
+from commcare_connect.opportunity.verification_rules import get_verification_rules
+from commcare_connect.opportunity.visit_import import schedule_payment_accrued_update, update_payment_accrued_for_user
 from commcare_connect.users.models import User
 
 logger = logging.getLogger(__name__)
 
-LEARN_MODULE_JSONPATH = parse("$..module")
-TASK_MODULE_JSONPATH = parse("$..task")
-ASSESSMENT_JSONPATH = parse("$..assessment")
-DELIVER_UNIT_JSONPATH = parse("$..deliver")
-WORK_AREA_UPDATE_JSONPATH = parse("$..work_area_update")
-
 
 def is_a_uuid(value):
     try:
@@ -65,38 +70,68 @@ def is_a_uuid(value):
 
 def process_xform(xform: XForm, hq_server: HQServer):
     """Process a form received from CommCare HQ."""
-    user = get_user(xform)
+    with track_form_ingestion(xform.id):
+        check_duplicate_xform(xform)
+        with ingestion_stage(metrics.USER_LOOKUP):
+            user = get_user(xform)
+        with ingestion_stage(metrics.OPPORTUNITY_LOOKUP):
+            deliver_opportunity = get_opportunity(xform.domain, hq_server, deliver_app_id=xform.app_id)
+            learn_opportunity = get_opportunity(xform.domain, hq_server, learn_app_id=xform.app_id)
+        process_xform_for_opportunities(user, xform, deliver_opportunity, learn_opportunity)
+
+
+def process_xform_for_opportunities(
+    user: User, xform: XForm, deliver_opportunity: Opportunity | None, learn_opportunity: Opportunity | None
+):
+    """Process a form whose user and opportunities have already been resolved.
+
+    Split out from ``process_xform`` so that callers processing many forms at once
+    can resolve the user and opportunity lookups a single time per group of forms."""
+    if deliver_opportunity or learn_opportunity:
+        set_ingestion_opportunity((deliver_opportunity or learn_opportunity).id)
 
-    opportunity = get_opportunity(xform.domain, hq_server, deliver_app_id=xform.app_id)
-    if opportunity:
-        app = opportunity.deliver_app
-        process_deliver_form(user, xform, app, opportunity)
+    if deliver_opportunity:
+        process_deliver_form(user, xform, deliver_opportunity.deliver_app, deliver_opportunity)
 
-    opportunity = get_opportunity(xform.domain, hq_server, learn_app_id=xform.app_id)
-    if opportunity:
-        app = opportunity.learn_app
-        process_learn_form(user, xform, app, opportunity)
+    if learn_opportunity:
+        process_learn_form(user, xform, learn_opportunity.learn_app, learn_opportunity)
+
+
+def check_duplicate_xform(xform: XForm):
+    """Reject a form that has already been processed before doing any other work for it."""
+    if switch_is_active(XFORM_IDEMPOTENCY):
+        with ingestion_stage(metrics.DUPLICATE_CHECK):
+            record_processed_xform(xform.id)
+
+
+def get_duplicate_submission_message(error: IntegrityError, xform: XForm) -> str | None:
+    """Return a log message if the error was caused by a form that has already been processed."""
+    if "unique_processed_xform" in str(error):
+        return f"Form with ID: {xform.id} has already been processed."
+    elif "unique_xform_entity_deliver_unit" in str(error):
+        return f"Duplicate form with ID: {xform.id} received."
+    elif "unique_xform_completed_module" in str(error):
+        return f"Learn Module is already completed with form ID: {xform.id}."
+    elif "unique_xform_work_area_inaccessibility" in str(error):
+        return f"Duplicate inaccessibility request for form ID: {xform.id}."
+    return None
 
 
 def process_learn_form(user, xform: XForm, app: CommCareApp, opportunity: Opportunity):
     processors = [
-        (LEARN_MODULE_JSONPATH, process_learn_modules),
-        (ASSESSMENT_JSONPATH, process_assessments),
+        (LEARN_MODULE_BLOCK, process_learn_modules),
+        (ASSESSMENT_BLOCK, process_assessments),
     ]
-    for jsonpath, processor in processors:
-        try:
-            matches = _get_matching_blocks(jsonpath, xform)
-            if matches:
-                processor(user, xform, app, opportunity, matches)
-        except JSONPathError as e:
-            raise ProcessingError from e
+    for block_name, processor in processors:
+        matches = xform.connect_blocks.get(block_name)
+        if matches:
+            processor(user, xform, app, opportunity, matches)
 
 
-def _get_matching_blocks(jsonpath, xform):
-    return [match.value for match in jsonpath.find(xform.form) if match.value["@xmlns"] == CCC_LEARN_XMLNS]
-
-
-def get_or_create_learn_module(app, module_data):
+def get_or_create_learn_module_id(app, module_data):
+    module_id = get_learn_module_id(app.id, module_data["@id"])
+    if module_id is not None:
+        return module_id
     module, _ = LearnModule.objects.get_or_create(
         app=app,
         slug=module_data["@id"],
@@ -106,7 +141,7 @@ def get_or_create_learn_module(app, module_data):
             time_estimate=module_data["time_estimate"],
         ),
     )
-    return module
+    return module.id
 
 
 def process_learn_modules(user: User, xform: XForm, app: CommCareApp, opportunity: Opportunity, blocks: list[dict]):
@@ -118,14 +153,17 @@ def process_learn_modules(user: User, xform: XForm, app: CommCareApp, opportunit
     :param opportunity: The opportunity the app belongs to.
     :param blocks: A list of learn module form blocks."""
     with transaction.atomic():
-        access = OpportunityAccess.objects.get(user=user, opportunity=opportunity)
+        # modules that have not been synced yet are created before the access is loaded,
+        # so that it has the updated module total
+        module_ids = [get_or_create_learn_module_id(app, module_data) for module_data in blocks]
+        # locked so that concurrent learn forms from the user count each completed module once
+        access = OpportunityAccess.objects.select_for_update().get(user=user, opportunity=opportunity)
         completed_modules = []
         save_access = False
-        for module_data in blocks:
-            module = get_or_create_learn_module(app, module_data)
+        for module_id in module_ids:
             completed_module = CompletedModule(
                 user=user,
-                module=module,
+                module_id=module_id,
                 opportunity=opportunity,
                 opportunity_access=access,
                 xform_id=xform.id,
@@ -140,6 +178,7 @@ def process_learn_modules(user: User, xform: XForm, app: CommCareApp, opportunit
                 save_access = True
 
         if completed_modules:
+            record_completed_modules(access, module_ids)
             CompletedModule.objects.bulk_create(completed_modules)
             update_completed_learn_date(access, save_access)
 
@@ -202,6 +241,8 @@ def process_task_modules(user: User, xform: XForm, app: CommCareApp, opportunity
 
 
 def update_completed_learn_date(access, save_access=False):
+    # only the changed fields are saved, so the learn module counts updated by form processing are kept
+    update_fields = ["last_active"] if save_access else []
     if not access.completed_learn_date and access.learn_progress == 100.0:
         # Get the earliest completion date for each unique module
         earliest_dates = (
@@ -211,10 +252,10 @@ def update_completed_learn_date(access, save_access=False):
         )
         completed_learn_date = max(entry["earliest_date"] for entry in earliest_dates)
         access.completed_learn_date = completed_learn_date
-        save_access = True
+        update_fields.append("completed_learn_date")
 
-    if save_access:
-        access.save()
+    if update_fields:
+        access.save(update_fields=update_fields)
 
 
 def process_assessments(user, xform: XForm, app: CommCareApp, opportunity: Opportunity, blocks: list[dict]):
@@ -256,16 +297,15 @@ def process_assessments(user, xform: XForm, app: CommCareApp, opportunity: Oppor
 
 
 def process_deliver_form(user, xform: XForm, app: CommCareApp, opportunity: Opportunity):
-    for deliver_unit_block in _get_matching_blocks(DELIVER_UNIT_JSONPATH, xform):
+    blocks = xform.connect_blocks
+    for deliver_unit_block in blocks.deliver:
         process_deliver_unit(user, xform, app, opportunity, deliver_unit_block)
 
-    task_matches = _get_matching_blocks(TASK_MODULE_JSONPATH, xform)
-    if task_matches:
-        process_task_modules(user, xform, app, opportunity, task_matches)
+    if blocks.task:
+        process_task_modules(user, xform, app, opportunity, blocks.task)
 
-    work_area_blocks = _get_matching_blocks(WORK_AREA_UPDATE_JSONPATH, xform)
-    if work_area_blocks:
-        process_work_area_update(user, opportunity, xform, work_area_blocks)
+    if blocks.work_area_update:
+        process_work_area_update(user, opportunity, xform, blocks.work_area_update)
 
 
 def _parse_xform_location(location_str):
@@ -353,7 +393,8 @@ def clean_form_submission(access: OpportunityAccess, user_visit: UserVisit, xfor
     side effect (e.g., resetting duplicate status when the duplicate flag is disabled).
     """
     flags = []
-    opportunity_flags, _ = OpportunityVerificationFlags.objects.get_or_create(opportunity=user_visit.opportunity)
+    verification_rules = get_verification_rules(user_visit.opportunity_id)
+    opportunity_flags = verification_rules.flags
     if user_visit.status == VisitValidationStatus.duplicate:
         if opportunity_flags.duplicate:
             flags.append(["duplicate", "A beneficiary with the same identifier already exists"])
@@ -361,32 +402,27 @@ def clean_form_submission(access: OpportunityAccess, user_visit: UserVisit, xfor
             user_visit.status = VisitValidationStatus.pending
     if opportunity_flags.gps and user_visit.location is None:
         flags.append(["gps", "GPS data is missing"])
-    if opportunity_flags.location > 0 and user_visit.location:
-        user_visits = (
-            UserVisit.objects.filter(opportunity=user_visit.opportunity, deliver_unit=user_visit.deliver_unit)
+    if opportunity_flags.location > 0 and user_visit.location_point:
+        nearby_visit = (
+            UserVisit.objects.filter(
+                opportunity=user_visit.opportunity,
+                deliver_unit=user_visit.deliver_unit,
+                location_point__dwithin=(user_visit.location_point, D(m=opportunity_flags.location)),
+            )
             .exclude(Q(status=VisitValidationStatus.trial) | Q(entity_id=user_visit.entity_id))
-            .values("location")
+            .annotate(dist=Distance("location_point", user_visit.location_point))
+            .order_by("dist")
+            .values("dist")
+            .first()
         )
-        cur_lat, cur_lon, *_ = user_visit.location.split(" ")
-        for visit in user_visits:
-            if visit.get("location") is None:
-                continue
-            lat, lon, *_ = visit["location"].split(" ")
-            dist = distance((lat, lon), (cur_lat, cur_lon))
-            if dist.m <= opportunity_flags.location:
-                flags.append(["location", f"Visit location is {dist.m}m from another visit"])
-                break
+        if nearby_visit is not None:
+            flags.append(["location", f"Visit location is {nearby_visit['dist'].m}m from another visit"])
     if opportunity_flags.catchment_areas:
         areas = access.catchmentarea_set.filter(active=True)
-        if areas:
-            within_catchment = False
-            if xform.metadata.location is not None:
-                cur_lat, cur_lon, *_ = xform.metadata.location.split(" ")
-                for area in areas:
-                    dist = distance((area.latitude, area.longitude), (cur_lat, cur_lon))
-                    if dist.meters < area.radius:
-                        within_catchment = True
-                        break
+        if areas.exists():
+            within_catchment = user_visit.location_point is not None and (
+                areas.filter(point__dwithin=(user_visit.location_point, F("radius"))).exists()
+            )
             if not within_catchment:
                 flags.append(["catchment", "Visit outside worker catchment areas"])
     if (
@@ -400,9 +436,7 @@ def clean_form_submission(access: OpportunityAccess, user_visit: UserVisit, xfor
     ):
         flags.append(["form_submission_period", "Form was submitted after the end time"])
 
-    deliver_unit_flags = DeliverUnitFlagRules.objects.filter(
-        opportunity=user_visit.opportunity, deliver_unit=user_visit.deliver_unit
-    ).first()
+    deliver_unit_flags = verification_rules.get_deliver_unit_rule(user_visit.deliver_unit_id)
     if deliver_unit_flags is not None:
         if deliver_unit_flags.check_attachments:
             attachments = user_visit.form_json.get("attachments", {})
@@ -415,17 +449,8 @@ def clean_form_submission(access: OpportunityAccess, user_visit: UserVisit, xfor
         ):
             flags.append(["duration", "The form was completed too quickly."])
 
-    form_json_rules = FormJsonValidationRules.objects.filter(
-        opportunity=user_visit.opportunity, deliver_unit=user_visit.deliver_unit
-    )
-    for form_json_rule in form_json_rules:
-        json_path = parse(f"$.{form_json_rule.question_path}")
-        matches = [
-            match.value
-            for match in json_path.find(user_visit.form_json)
-            if match.value == form_json_rule.question_value
-        ]
-        if not matches:
+    for form_json_rule in verification_rules.get_form_json_rules(user_visit.deliver_unit_id):
+        if not form_json_rule.matches(user_visit.form_json):
             flags.append(["form_value_not_found", f"Form does not satisfy {form_json_rule.name} validation rule."])
     return flags
 
@@ -442,11 +467,12 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
     5. Updates or creates the associated CompletedWork record
     6. Triggers incremental payment recalculation
     """
-    deliver_unit = get_or_create_deliver_unit(app, deliver_unit_block)
-    try:
-        access = OpportunityAccess.objects.get(opportunity=opportunity, user=user)
-    except OpportunityAccess.DoesNotExist:
-        raise ProcessingError(f"User does not have access to opportunity {opportunity.name}")
+    with ingestion_stage(metrics.DELIVER_UNIT_LOOKUP):
+        deliver_unit = get_or_create_deliver_unit(app, deliver_unit_block)
+        try:
+            access = OpportunityAccess.objects.get(opportunity=opportunity, user=user)
+        except OpportunityAccess.DoesNotExist:
+            raise ProcessingError(f"User does not have access to opportunity {opportunity.name}")
     payment_unit = deliver_unit.payment_unit
     if not payment_unit:
         raise ProcessingError(
@@ -454,28 +480,33 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
             f"{deliver_unit.name} in opportunity: {opportunity.name}"
         )
 
-    claim = OpportunityClaim.objects.get(opportunity_access=access)
     entity_id = deliver_unit_block.get("entity_id")
     entity_name = deliver_unit_block.get("entity_name")
 
     with transaction.atomic():
-        # Lock the claim limit row to serialize concurrent submissions for the same
-        # user + payment unit. Without it, simultaneous submissions read the same
-        # daily/total counts before either commits and both pass the limit check,
-        # letting visits slip past the daily limit. The lock also serializes the
-        # duplicate-entity check below.
-        claim_limit = OpportunityClaimLimit.objects.select_for_update().get(
-            opportunity_claim=claim, payment_unit=payment_unit
-        )
-        counts = (
-            UserVisit.objects.filter(opportunity_access=access, deliver_unit=deliver_unit)
-            .exclude(status__in=[VisitValidationStatus.over_limit, VisitValidationStatus.trial])
-            .aggregate(
-                daily=Count("pk", filter=Q(visit_date__date=xform.metadata.timeStart)),
-                total=Count("*"),
-                entity=Count("pk", filter=Q(entity_id=deliver_unit_block.get("entity_id"), deliver_unit=deliver_unit)),
+        with ingestion_stage(metrics.CLAIM_LIMIT_LOCK):
+            claim = OpportunityClaim.objects.get(opportunity_access=access)
+            # Lock the claim limit row to serialize concurrent submissions for the same
+            # user + payment unit. Without it, simultaneous submissions read the same
+            # daily/total counts before either commits and both pass the limit check,
+            # letting visits slip past the daily limit. The lock also serializes the
+            # duplicate-entity check below.
+            claim_limit = OpportunityClaimLimit.objects.select_for_update().get(
+                opportunity_claim=claim, payment_unit=payment_unit
             )
-        )
+        with ingestion_stage(metrics.VISIT_COUNTS):
+            if switch_is_active(VISIT_LIMIT_COUNTERS):
+                counts = get_visit_counts(access, deliver_unit, xform.metadata.timeStart, entity_id)
+            else:
+                counts = (
+                    UserVisit.objects.filter(opportunity_access=access, deliver_unit=deliver_unit)
+                    .exclude(status__in=UNCOUNTED_VISIT_STATUSES)
+                    .aggregate(
+                        daily=Count("pk", filter=Q(visit_date__date=xform.metadata.timeStart)),
+                        total=Count("*"),
+                        entity=Count("pk", filter=Q(entity_id=entity_id, deliver_unit=deliver_unit)),
+                    )
+                )
         user_visit = UserVisit(
             opportunity=opportunity,
             user=user,
@@ -489,6 +520,7 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
             app_build_version=xform.metadata.app_build_version,
             form_json=xform.raw_form,
             location=xform.metadata.location,
+            location_point=_parse_xform_location(xform.metadata.location),
         )
         completed_work_needs_save = False
         today = datetime.date.today()
@@ -497,12 +529,13 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
             completed_work = None
             user_visit.status = VisitValidationStatus.trial
         else:
-            completed_work, _ = CompletedWork.objects.get_or_create(
-                opportunity_access=access,
-                entity_id=entity_id,
-                payment_unit=payment_unit,
-                defaults={"entity_name": entity_name},
-            )
+            with ingestion_stage(metrics.COMPLETED_WORK):
+                completed_work, _ = CompletedWork.objects.get_or_create(
+                    opportunity_access=access,
+                    entity_id=entity_id,
+                    payment_unit=payment_unit,
+                    defaults={"entity_name": entity_name},
+                )
             user_visit.completed_work = completed_work
             if (
                 counts["daily"] >= payment_unit.max_daily
@@ -516,7 +549,8 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
             elif counts["entity"] > 0:
                 user_visit.status = VisitValidationStatus.duplicate
 
-        flags = clean_form_submission(access, user_visit, xform)
+        with ingestion_stage(metrics.VERIFICATION_FLAGS):
+            flags = clean_form_submission(access, user_visit, xform)
         if access.suspended:
             flags.append(["user_suspended", "This user is suspended from the opportunity."])
             user_visit.status = VisitValidationStatus.rejected
@@ -544,17 +578,22 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
             if not is_a_uuid(work_area_case_id):
                 raise ProcessingError(f"Invalid work area case id specified: {work_area_case_id}")
             try:
-                work_area = WorkArea.objects.select_for_update().get(
-                    case_id=work_area_case_id, opportunity=access.opportunity
-                )
+                with ingestion_stage(metrics.WORK_AREA_LOCK):
+                    work_area = WorkArea.objects.select_for_update().get(
+                        case_id=work_area_case_id, opportunity=access.opportunity
+                    )
                 user_visit.work_area = work_area
             except WorkArea.DoesNotExist:
                 raise ProcessingError("Work area not found")
 
-        user_visit.save()
+        with ingestion_stage(metrics.VISIT_SAVE):
+            user_visit.save()
+            if user_visit.status not in UNCOUNTED_VISIT_STATUSES:
+                increment_visit_counters(access, deliver_unit, user_visit.visit_date, entity_id)
 
         if work_area:
-            work_area.update_status()
+            with ingestion_stage(metrics.WORK_AREA_STATUS):
+                work_area.update_status()
 
         if not access.last_active or access.last_active < user_visit.visit_date:
             access.last_active = user_visit.visit_date
@@ -564,14 +603,27 @@ def process_deliver_unit(user, xform: XForm, app: CommCareApp, opportunity: Oppo
                 completed_work.status = CompletedWorkStatus.pending
                 completed_work_needs_save = True
             if completed_work_needs_save:
-                completed_work.save()
+                with ingestion_stage(metrics.COMPLETED_WORK):
+                    completed_work.save()
 
-    update_payment_accrued_for_user(access, incremental=True)
-    transaction.on_commit(partial(download_user_visit_attachments.delay, user_visit.id))
+    with ingestion_stage(metrics.PAYMENT_ACCRUED):
+        access.save(update_fields=["last_active"])
+        if switch_is_active(DEFERRED_PAYMENT_ACCRUAL):
+            schedule_payment_accrued_update(access)
+        else:
+            update_payment_accrued_for_user(access, incremental=True)
+    with ingestion_stage(metrics.ATTACHMENTS):
+        transaction.on_commit(partial(download_user_visit_attachments.delay, user_visit.id))
 
 
 def get_or_create_deliver_unit(app, unit_data):
-    unit, _ = DeliverUnit.objects.get_or_create(
+    units = DeliverUnit.objects.select_related("payment_unit")
+    unit_id = get_deliver_unit_id(app.id, unit_data["@id"])
+    if unit_id is not None:
+        unit = units.filter(pk=unit_id).first()
+        if unit is not None:
+            return unit
+    unit, _ = units.get_or_create(
         app=app,
         slug=unit_data["@id"],
         defaults={
@@ -585,30 +637,23 @@ def get_opportunity(domain, hq_server, deliver_app_id=None, learn_app_id=None):
     if not (learn_app_id or deliver_app_id):
         raise ValueError("One of learn_app_id or deliver_app_id along with domain must be provided")
     if learn_app_id:
-        kwargs = {
-            "learn_app__cc_domain": domain,
-            "learn_app__cc_app_id": learn_app_id,
-        }
+        app_id, role = learn_app_id, RouteRole.LEARN
     if deliver_app_id:
-        kwargs = {
-            "deliver_app__cc_domain": domain,
-            "deliver_app__cc_app_id": deliver_app_id,
-        }
+        app_id, role = deliver_app_id, RouteRole.DELIVER
 
-    try:
-        opportunity = Opportunity.objects.get(active=True, end_date__gte=now().date(), **kwargs)
-        if learn_app_id:
-            app = opportunity.learn_app
-        elif deliver_app_id:
-            app = opportunity.deliver_app
-        if app.hq_server != hq_server:
-            raise ProcessingError(f"CommCare App {app.id} not found on {hq_server}")
-        return opportunity
-    except Opportunity.DoesNotExist:
-        pass
-    except Opportunity.MultipleObjectsReturned:
-        app_id = learn_app_id or deliver_app_id
+    today = now().date()
+    routes = [
+        route for route in get_routes(domain, app_id, role) if route.end_date is not None and route.end_date >= today
+    ]
+    if not routes:
+        return None
+    if len(routes) > 1:
         raise ProcessingError(f"Multiple active opportunities found for CommCare app {app_id}.")
+    route = routes[0]
+    if route.hq_server_id != hq_server.id:
+        raise ProcessingError(f"CommCare App {route.app_id} not found on {hq_server}")
+    # the cached opportunity is shared by the process, processing may change the copy
+    return copy.deepcopy(route.opportunity)
 
 
 def get_user(xform: XForm):
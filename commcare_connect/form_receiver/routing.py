@@ -0,0 +1,106 @@
+"""Routing table used to find the opportunity a form belongs to.
+
+Forms are routed by their domain and app id to the opportunity using that app as its deliver
+or learn app. The table of active opportunities, together with the opportunities and their apps,
+is loaded once per process and reloaded when the routing version stored in the cache changes,
+which happens whenever an ``Opportunity`` or ``CommCareApp`` is saved or deleted and when
+opportunities are deactivated in bulk.
+"""
+
+import dataclasses
+import datetime
+import threading
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from commcare_connect.opportunity.models import Opportunity
+
+ROUTING_VERSION_KEY = "form_routing_version"
+
+
+class RouteRole:
+    DELIVER = "deliver"
+    LEARN = "learn"
+
+
+@dataclasses.dataclass(frozen=True)
+class Route:
+    opportunity_id: int
+    role: str
+    end_date: datetime.date | None
+    hq_server_id: int | None
+    app_id: int
+    # shared by all forms routed in the process, callers get a copy from ``get_opportunity``
+    opportunity: Opportunity = dataclasses.field(compare=False, repr=False)
+
+
+@dataclasses.dataclass(frozen=True)
+class _RoutingTable:
+    version: str
+    routes: dict[tuple[str, str, str], list[Route]]
+
+
+_routing_table = None
+_routing_table_lock = threading.Lock()
+
+
+def get_routes(domain: str, app_id: str, role: str) -> list[Route]:
+    return _get_routing_table().routes.get((domain, app_id, role), [])
+
+
+def preload_routing_table():
+    """Load the routing table ahead of the first form, e.g. when a worker process starts."""
+    _get_routing_table()
+
+
+def invalidate_routing_table():
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def _bump_version():
+    cache.set(ROUTING_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def _get_version():
+    version = cache.get(ROUTING_VERSION_KEY)
+    if version is None:
+        cache.add(ROUTING_VERSION_KEY, uuid4().hex, timeout=None)
+        # when the cache is unavailable this is None and the table is always reloaded
+        version = cache.get(ROUTING_VERSION_KEY) or uuid4().hex
+    return version
+
+
+def _get_routing_table() -> _RoutingTable:
+    global _routing_table
+    version = _get_version()
+    table = _routing_table
+    if table is not None and table.version == version:
+        return table
+    with _routing_table_lock:
+        if _routing_table is None or _routing_table.version != version:
+            _routing_table = _RoutingTable(version=version, routes=_load_routes())
+        return _routing_table
+
+
+def _load_routes():
+    routes = defaultdict(list)
+    opportunities = Opportunity.objects.filter(active=True).select_related("deliver_app", "learn_app")
+    for opportunity in opportunities:
+        for role, app in [(RouteRole.DELIVER, opportunity.deliver_app), (RouteRole.LEARN, opportunity.learn_app)]:
+            if app is None:
+                continue
+            routes[(app.cc_domain, app.cc_app_id, role)].append(
+                Route(
+                    opportunity_id=opportunity.id,
+                    role=role,
+                    end_date=opportunity.end_date,
+                    hq_server_id=app.hq_server_id,
+                    app_id=app.id,
+                    opportunity=opportunity,
+                )
+            )
+    return dict(routes)
@@ -1,8 +1,11 @@
 import dataclasses
 from datetime import datetime
+from functools import cached_property
 
 from rest_framework import serializers
 
+from commcare_connect.form_receiver.blocks import ConnectBlocks, extract_connect_blocks
+
 
 @dataclasses.dataclass
 class XFormMetadata:
@@ -32,6 +35,10 @@ class XForm:
     def xmlns(self):
         return self.form.get("@xmlns")
 
+    @cached_property
+    def connect_blocks(self) -> ConnectBlocks:
+        return extract_connect_blocks(self.form)
+
 
 class XFormMetadataSerializer(serializers.Serializer):
     timeStart = serializers.DateTimeField(required=True)
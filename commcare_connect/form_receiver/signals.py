@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from commcare_connect.form_receiver.routing import invalidate_routing_table
+from commcare_connect.opportunity.models import CommCareApp, Opportunity
+
+
+@receiver(post_save, sender=Opportunity)
+@receiver(post_delete, sender=Opportunity)
+@receiver(post_save, sender=CommCareApp)
+@receiver(post_delete, sender=CommCareApp)
+def invalidate_routing_table_on_change(sender, instance, **kwargs):
+    invalidate_routing_table()
@@ -0,0 +1,37 @@
+from commcare_connect.form_receiver.idempotency import delete_old_processed_xforms
+from commcare_connect.form_receiver.inbox import (
+    INBOX_DRAIN_TIME_BUDGET,
+    delete_old_inbox_entries,
+    drain_inbox_slot,
+    get_active_inbox_slots,
+)
+from commcare_connect.utils.lock import try_redis_lock
+from config import celery_app
+
+
+@celery_app.task()
+def drain_form_inbox():
+    """Schedule a worker for every inbox slot that has forms waiting to be processed."""
+    for slot in get_active_inbox_slots():
+        process_form_inbox_slot.delay(slot)
+
+
+@celery_app.task()
+def process_form_inbox_slot(slot: int):
+    # Only one worker may drain a slot at a time so that forms from the same user are processed in order.
+    with try_redis_lock(f"form_inbox_slot_{slot}", timeout=INBOX_DRAIN_TIME_BUDGET * 2) as acquired:
+        if not acquired:
+            return
+        has_more = drain_inbox_slot(slot)
+    if has_more:
+        process_form_inbox_slot.delay(slot)
+
+
+@celery_app.task()
+def cleanup_processed_xforms():
+    delete_old_processed_xforms()
+
+
+@celery_app.task()
+def cleanup_processed_inbox_entries():
+    delete_old_inbox_entries()
@@ -0,0 +1,111 @@
+from copy import deepcopy
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from rest_framework.test import APIClient
+
+from commcare_connect.form_receiver.batch import BatchFormStatus
+from commcare_connect.form_receiver.const import BATCH_RECEIVER_MAX_FORMS
+from commcare_connect.form_receiver.processor import process_xform_for_opportunities
+from commcare_connect.form_receiver.tests.test_receiver_endpoint import add_credentials
+from commcare_connect.form_receiver.tests.test_receiver_integration import (
+    _get_form_json,
+    get_form_json_for_payment_unit,
+)
+from commcare_connect.form_receiver.tests.xforms import get_form_json
+from commcare_connect.opportunity.models import Opportunity, UserVisit
+from commcare_connect.users.models import User
+
+
+def make_batch_request(api_client, forms, user, oauth_application=None, expected_status_code=200):
+    add_credentials(api_client, user, oauth_application)
+    response = api_client.post("/api/receiver/batch/", data=forms, format="json")
+    assert response.status_code == expected_status_code, response.data
+    return response.data
+
+
+def test_batch_receiver_requires_list(user: User, api_client: APIClient):
+    data = make_batch_request(api_client, {"foo": "bar"}, user, expected_status_code=400)
+    assert data == ["Expected a list of forms."]
+
+
+def test_batch_receiver_max_forms(user: User, api_client: APIClient):
+    forms = [get_form_json()] * (BATCH_RECEIVER_MAX_FORMS + 1)
+    make_batch_request(api_client, forms, user, expected_status_code=400)
+
+
+@pytest.mark.django_db
+def test_batch_receiver_deliver_forms(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    payment_unit = opportunity.paymentunit_set.first()
+    form_json = get_form_json_for_payment_unit(payment_unit)
+    second_form_json = deepcopy(form_json)
+    second_form_json["id"] = str(uuid4())
+    duplicate_form_json = deepcopy(form_json)
+
+    results = make_batch_request(
+        api_client,
+        [form_json, second_form_json, duplicate_form_json],
+        mobile_user_with_connect_link,
+        oauth_application=opportunity.hq_server.oauth_application,
+    )
+
+    assert [result["id"] for result in results] == [form_json["id"], second_form_json["id"], form_json["id"]]
+    assert [result["status"] for result in results] == [
+        BatchFormStatus.PROCESSED,
+        BatchFormStatus.PROCESSED,
+        BatchFormStatus.DUPLICATE,
+    ]
+    assert UserVisit.objects.filter(user=mobile_user_with_connect_link).count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_receiver_errors_are_per_form(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    payment_unit = opportunity.paymentunit_set.first()
+    form_json = get_form_json_for_payment_unit(payment_unit)
+    unknown_user_form_json = deepcopy(form_json)
+    unknown_user_form_json["id"] = str(uuid4())
+    unknown_user_form_json["metadata"]["username"] = "unknown"
+    invalid_form_json = {"id": str(uuid4())}
+
+    results = make_batch_request(
+        api_client,
+        [invalid_form_json, unknown_user_form_json, form_json],
+        mobile_user_with_connect_link,
+        oauth_application=opportunity.hq_server.oauth_application,
+    )
+
+    assert [result["status"] for result in results] == [
+        BatchFormStatus.ERROR,
+        BatchFormStatus.ERROR,
+        BatchFormStatus.PROCESSED,
+    ]
+    assert results[0]["id"] == invalid_form_json["id"]
+    assert "not found" in results[1]["detail"]
+    assert UserVisit.objects.filter(xform_id=form_json["id"]).count() == 1
+
+
+@pytest.mark.django_db
+def test_batch_receiver_keeps_submission_order(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    deliver_form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    learn_form_json = _get_form_json(opportunity.learn_app, "learn_module_1")
+    second_deliver_form_json = deepcopy(deliver_form_json)
+    second_deliver_form_json["id"] = str(uuid4())
+    forms = [deliver_form_json, learn_form_json, second_deliver_form_json]
+
+    with mock.patch(
+        "commcare_connect.form_receiver.batch.process_xform_for_opportunities",
+        wraps=process_xform_for_opportunities,
+    ) as process:
+        make_batch_request(
+            api_client, forms, mobile_user_with_connect_link, oauth_application=opportunity.hq_server.oauth_application
+        )
+
+    # learn and deliver forms are processed in the order they were submitted
+    assert [call.args[1].id for call in process.call_args_list] == [form["id"] for form in forms]
@@ -0,0 +1,80 @@
+from unittest import mock
+
+import pytest
+
+from commcare_connect.form_receiver.benchmark import (
+    FormResultStatus,
+    generate_deliver_forms,
+    percentile,
+    read_corpus,
+    replay_corpus,
+    replay_form,
+    with_new_form_id,
+    write_corpus,
+)
+from commcare_connect.form_receiver.exceptions import ProcessingError
+from commcare_connect.form_receiver.tests.xforms import get_form_json
+from commcare_connect.opportunity.models import DeliverUnit, Opportunity, UserVisit
+from commcare_connect.opportunity.tests.factories import DeliverUnitFactory
+from commcare_connect.users.models import User
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 99) == 5
+    assert percentile([], 50) == 0
+
+
+def test_corpus_round_trip(tmp_path):
+    forms = [{"id": "1", "form": {"meta": {"instanceID": "1"}}}, {"id": "2"}]
+    path = str(tmp_path / "corpus.jsonl")
+    assert write_corpus(path, forms) == 2
+    assert read_corpus(path) == forms
+
+    form = with_new_form_id(forms[0])
+    assert form["id"] != "1"
+    assert form["form"]["meta"]["instanceID"] == form["id"]
+    assert forms[0]["id"] == "1"
+
+
+@pytest.mark.django_db
+def test_replay_generated_forms(mobile_user_with_connect_link: User, opportunity: Opportunity):
+    for payment_unit in opportunity.paymentunit_set.all():
+        DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=payment_unit)
+    forms = list(generate_deliver_forms(opportunity, 3))
+    assert len(forms) == 3
+
+    results = [replay_form(form, opportunity.hq_server) for form in forms]
+    assert [result.status for result in results] == [FormResultStatus.PROCESSED] * 3
+    assert all(result.queries > 0 for result in results)
+    assert UserVisit.objects.filter(user=mobile_user_with_connect_link).count() == 3
+
+    assert replay_form(forms[0], opportunity.hq_server).status == FormResultStatus.DUPLICATE
+
+
+@pytest.mark.django_db
+def test_generate_deliver_forms_requires_deliver_units(opportunity: Opportunity):
+    DeliverUnit.objects.filter(app=opportunity.deliver_app).delete()
+    with pytest.raises(ValueError):
+        next(generate_deliver_forms(opportunity, 1))
+
+
+@pytest.mark.django_db
+def test_replay_corpus_records_unexpected_errors(opportunity: Opportunity, settings):
+    settings.FORM_INGESTION_METRICS = False
+    forms = [get_form_json(), get_form_json(), get_form_json()]
+    with mock.patch(
+        "commcare_connect.form_receiver.benchmark.process_xform",
+        side_effect=[RuntimeError("database error"), ProcessingError("bad form"), None],
+    ):
+        report = replay_corpus(forms, opportunity.hq_server)
+
+    # errors are recorded and the remaining forms are still replayed
+    assert [result.status for result in report.results] == [
+        FormResultStatus.ERROR,
+        FormResultStatus.ERROR,
+        FormResultStatus.PROCESSED,
+    ]
+    assert not report.lock_wait_available
+    assert report.total_lock_wait is None
@@ -0,0 +1,51 @@
+from jsonpath_ng.ext import parse
+
+from commcare_connect.form_receiver.blocks import CONNECT_BLOCK_NAMES, extract_connect_blocks
+from commcare_connect.form_receiver.const import CCC_LEARN_XMLNS
+from commcare_connect.form_receiver.tests.xforms import DeliverUnitStubFactory, get_form_model
+
+
+def _block(block_id, **extra):
+    return {"@xmlns": CCC_LEARN_XMLNS, "@id": block_id, **extra}
+
+
+def _jsonpath_blocks(form, block_name):
+    return [match.value for match in parse(f"$..{block_name}").find(form) if match.value["@xmlns"] == CCC_LEARN_XMLNS]
+
+
+def test_extract_connect_blocks_matches_jsonpath():
+    form = {
+        "@xmlns": "http://openrosa.org/formdesigner/form",
+        "deliver": _block("deliver_1", task=_block("nested_task")),
+        "group": {
+            "question": "value",
+            "module": _block("module_1"),
+            "other_ns": {"deliver": {"@xmlns": "http://example.com/other", "@id": "ignored"}},
+        },
+        "repeat": [
+            {"item": {"deliver": _block(f"deliver_repeat_{i}"), "answer": str(i)}, "assessment": _block(f"a_{i}")}
+            for i in range(5)
+        ],
+        "work_area_update": _block("work_area"),
+        "task": _block("task_1"),
+    }
+
+    blocks = extract_connect_blocks(form)
+    for block_name in CONNECT_BLOCK_NAMES:
+        assert blocks.get(block_name) == _jsonpath_blocks(form, block_name)
+    assert [block["@id"] for block in blocks.deliver] == ["deliver_1"] + [f"deliver_repeat_{i}" for i in range(5)]
+    assert [block["@id"] for block in blocks.task] == ["task_1", "nested_task"]
+
+
+def test_extract_connect_blocks_repeated_block():
+    form = {"deliver": [_block("deliver_1"), _block("deliver_2"), "not a block"]}
+    blocks = extract_connect_blocks(form)
+    assert [block["@id"] for block in blocks.deliver] == ["deliver_1", "deliver_2"]
+
+
+def test_xform_connect_blocks():
+    deliver_block = DeliverUnitStubFactory().json
+    xform = get_form_model(form_block=deliver_block)
+    assert xform.connect_blocks.deliver == _jsonpath_blocks(xform.form, "deliver")
+    assert xform.connect_blocks.deliver
+    assert xform.connect_blocks.module == []
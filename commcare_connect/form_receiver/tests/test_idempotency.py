@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from waffle.testutils import override_switch
+
+from commcare_connect.flags.switch_names import XFORM_IDEMPOTENCY
+from commcare_connect.form_receiver.exceptions import DuplicateXFormError, ProcessingError
+from commcare_connect.form_receiver.idempotency import delete_old_processed_xforms, record_processed_xform
+from commcare_connect.form_receiver.models import ProcessedXForm
+from commcare_connect.form_receiver.processor import get_duplicate_submission_message, process_xform
+from commcare_connect.form_receiver.tests.test_receiver_integration import get_form_json_for_payment_unit
+from commcare_connect.form_receiver.tests.xforms import get_form_model
+from commcare_connect.opportunity.models import Opportunity, UserVisit
+from commcare_connect.users.models import User
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+def _process(xform, hq_server):
+    with transaction.atomic():
+        process_xform(xform, hq_server)
+
+
+@pytest.mark.django_db
+def test_duplicate_xform_rejected_from_cache(django_capture_on_commit_callbacks, django_assert_num_queries):
+    with django_capture_on_commit_callbacks(execute=True):
+        record_processed_xform("form-1")
+
+    with django_assert_num_queries(0), pytest.raises(DuplicateXFormError) as error:
+        record_processed_xform("form-1")
+    assert get_duplicate_submission_message(error.value, get_form_model(id="form-1")) is not None
+
+
+@pytest.mark.django_db
+@override_switch(XFORM_IDEMPOTENCY, active=True)
+def test_process_xform_duplicate(
+    mobile_user_with_connect_link: User, opportunity: Opportunity, django_capture_on_commit_callbacks
+):
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    xform = get_form_model(**form_json)
+    with django_capture_on_commit_callbacks(execute=True):
+        _process(xform, opportunity.hq_server)
+    assert UserVisit.objects.filter(user=mobile_user_with_connect_link).count() == 1
+    assert ProcessedXForm.objects.filter(xform_id=xform.id).exists()
+
+    with pytest.raises(DuplicateXFormError):
+        _process(xform, opportunity.hq_server)
+
+    # the processed form table catches duplicates once the cache entry is gone
+    cache.clear()
+    with pytest.raises(IntegrityError, match="unique_processed_xform"):
+        _process(xform, opportunity.hq_server)
+    assert UserVisit.objects.filter(user=mobile_user_with_connect_link).count() == 1
+
+
+@pytest.mark.django_db
+@override_switch(XFORM_IDEMPOTENCY, active=True)
+def test_failed_xform_not_recorded(opportunity: Opportunity):
+    xform = get_form_model(domain=opportunity.deliver_app.cc_domain, app_id=opportunity.deliver_app.cc_app_id)
+    with pytest.raises(ProcessingError):
+        _process(xform, opportunity.hq_server)
+    assert not ProcessedXForm.objects.filter(xform_id=xform.id).exists()
+
+
+@pytest.mark.django_db
+def test_delete_old_processed_xforms(settings):
+    settings.PROCESSED_XFORM_RETENTION_DAYS = 30
+    old = ProcessedXForm.objects.create(xform_id="old")
+    ProcessedXForm.objects.filter(pk=old.pk).update(processed_on=now() - datetime.timedelta(days=31))
+    ProcessedXForm.objects.create(xform_id="new")
+
+    assert delete_old_processed_xforms() == 1
+    assert list(ProcessedXForm.objects.values_list("xform_id", flat=True)) == ["new"]
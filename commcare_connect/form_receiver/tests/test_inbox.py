@@ -0,0 +1,132 @@
+import datetime
+from copy import deepcopy
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from waffle.testutils import override_switch
+
+from commcare_connect.flags.switch_names import ASYNC_FORM_INGESTION
+from commcare_connect.form_receiver.exceptions import ProcessingError
+from commcare_connect.form_receiver.inbox import (
+    delete_old_inbox_entries,
+    drain_inbox_slot,
+    get_inbox_slot,
+    process_inbox_entry,
+)
+from commcare_connect.form_receiver.models import XFormInboxEntry, XFormInboxStatus
+from commcare_connect.form_receiver.tests.test_receiver_endpoint import add_credentials
+from commcare_connect.form_receiver.tests.test_receiver_integration import get_form_json_for_payment_unit
+from commcare_connect.opportunity.models import Opportunity, UserVisit
+from commcare_connect.users.models import User
+
+
+def _post_form(api_client, form_json, user, oauth_application):
+    add_credentials(api_client, user, oauth_application)
+    with override_switch(ASYNC_FORM_INGESTION, active=True):
+        return api_client.post("/api/receiver/", data=form_json, format="json")
+
+
+@pytest.mark.django_db
+def test_async_receiver_stores_form_in_inbox(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    oauth_application = opportunity.hq_server.oauth_application
+
+    response = _post_form(api_client, form_json, mobile_user_with_connect_link, oauth_application)
+    assert response.status_code == 202
+    response = _post_form(api_client, deepcopy(form_json), mobile_user_with_connect_link, oauth_application)
+    assert response.status_code == 202
+
+    entry = XFormInboxEntry.objects.get()
+    assert entry.xform_id == form_json["id"]
+    assert entry.status == XFormInboxStatus.PENDING
+    assert not UserVisit.objects.exists()
+
+
+@pytest.mark.django_db
+def test_drain_inbox_processes_forms(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    _post_form(api_client, form_json, mobile_user_with_connect_link, opportunity.hq_server.oauth_application)
+    entry = XFormInboxEntry.objects.get()
+
+    assert drain_inbox_slot(get_inbox_slot(entry.user_bucket)) is False
+
+    entry.refresh_from_db()
+    assert entry.status == XFormInboxStatus.PROCESSED
+    assert entry.processed_on is not None
+    assert UserVisit.objects.filter(xform_id=form_json["id"]).exists()
+
+
+@pytest.mark.django_db
+def test_inbox_retry_and_dead_letter(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity, settings
+):
+    settings.FORM_INBOX_MAX_ATTEMPTS = 2
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    _post_form(api_client, form_json, mobile_user_with_connect_link, opportunity.hq_server.oauth_application)
+    entry = XFormInboxEntry.objects.select_related("hq_server").get()
+
+    with mock.patch("commcare_connect.form_receiver.inbox.process_xform", side_effect=ProcessingError("oops")):
+        assert process_inbox_entry(entry) is False
+        assert entry.status == XFormInboxStatus.RETRYING
+        assert entry.attempts == 1
+        assert entry.next_attempt_on is not None
+
+        assert process_inbox_entry(entry) is False
+        assert entry.status == XFormInboxStatus.DEAD_LETTER
+        assert entry.attempts == 2
+        assert "oops" in entry.last_error
+
+
+@pytest.mark.django_db
+def test_drain_inbox_keeps_user_order(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    second_form_json = deepcopy(form_json)
+    second_form_json["id"] = str(uuid4())
+    oauth_application = opportunity.hq_server.oauth_application
+    _post_form(api_client, form_json, mobile_user_with_connect_link, oauth_application)
+    _post_form(api_client, second_form_json, mobile_user_with_connect_link, oauth_application)
+    first, second = XFormInboxEntry.objects.order_by("id")
+
+    with mock.patch("commcare_connect.form_receiver.inbox.process_xform", side_effect=ProcessingError("oops")) as m:
+        drain_inbox_slot(get_inbox_slot(first.user_bucket))
+
+    # the second form is held back until the first one has been processed
+    assert m.call_count == 1
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.status == XFormInboxStatus.RETRYING
+    assert second.status == XFormInboxStatus.PENDING
+
+
+@pytest.mark.django_db
+def test_delete_old_inbox_entries(opportunity: Opportunity, settings):
+    settings.FORM_INBOX_RETENTION_DAYS = 7
+    old = now() - datetime.timedelta(days=8)
+
+    def create_entry(xform_id, status, processed_on=None):
+        return XFormInboxEntry.objects.create(
+            xform_id=xform_id,
+            hq_server=opportunity.hq_server,
+            username="user",
+            user_bucket=1,
+            payload={},
+            status=status,
+            processed_on=processed_on,
+        )
+
+    create_entry("old", XFormInboxStatus.PROCESSED, old)
+    create_entry("recent", XFormInboxStatus.PROCESSED, now())
+    create_entry("dead", XFormInboxStatus.DEAD_LETTER, old)
+    create_entry("pending", XFormInboxStatus.PENDING)
+
+    assert delete_old_inbox_entries() == 1
+    assert set(XFormInboxEntry.objects.values_list("xform_id", flat=True)) == {"recent", "dead", "pending"}
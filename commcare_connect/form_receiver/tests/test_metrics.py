@@ -0,0 +1,127 @@
+from unittest import mock
+
+import pytest
+from django.test import Client
+from rest_framework.test import APIClient
+
+from commcare_connect.form_receiver import metrics
+from commcare_connect.form_receiver.metrics import (
+    DURATION_METRIC,
+    QUERIES_METRIC,
+    collect_metrics,
+    ingestion_stage,
+    render_metrics,
+    set_ingestion_opportunity,
+    track_form_ingestion,
+)
+from commcare_connect.form_receiver.tests.test_receiver_integration import (
+    get_form_json_for_payment_unit,
+    make_request,
+)
+from commcare_connect.opportunity.models import Opportunity
+from commcare_connect.users.models import User
+
+
+@pytest.fixture(autouse=True)
+def metrics_buffer(settings):
+    settings.FORM_INGESTION_METRICS_FLUSH_INTERVAL = 3600
+    metrics._buffer.clear()
+    with mock.patch("commcare_connect.form_receiver.metrics.get_redis_connection") as redis:
+        redis.return_value.hgetall.return_value = {}
+        yield redis
+    metrics._buffer.clear()
+
+
+@pytest.mark.django_db
+def test_track_form_ingestion_records_stages():
+    with track_form_ingestion("form-1"):
+        set_ingestion_opportunity(12)
+        with ingestion_stage(metrics.USER_LOOKUP):
+            User.objects.count()
+            User.objects.count()
+        with ingestion_stage(metrics.OPPORTUNITY_LOOKUP):
+            pass
+
+    values = collect_metrics()
+    assert values[f"{QUERIES_METRIC}|{metrics.USER_LOOKUP}|12|2"] == 1
+    assert values[f"{QUERIES_METRIC}|{metrics.USER_LOOKUP}|12|sum"] == 2
+    assert values[f"{QUERIES_METRIC}|{metrics.OPPORTUNITY_LOOKUP}|12|1"] == 1
+    assert values[f"{DURATION_METRIC}|{metrics.USER_LOOKUP}|12|sum"] > 0
+
+
+def test_ingestion_stage_outside_tracker():
+    with ingestion_stage(metrics.USER_LOOKUP):
+        pass
+    assert not metrics._buffer
+
+
+def test_flush_metrics(metrics_buffer):
+    with track_form_ingestion("form-1"):
+        with ingestion_stage(metrics.ATTACHMENTS):
+            pass
+    metrics.flush_metrics()
+
+    pipeline = metrics_buffer.return_value.pipeline.return_value
+    fields = {call.args[1]: call.args[2] for call in pipeline.hincrby.call_args_list}
+    assert fields[f"{QUERIES_METRIC}|{metrics.ATTACHMENTS}|none|sum"] == 0
+    assert fields[f"{DURATION_METRIC}|{metrics.ATTACHMENTS}|none|0.005"] == 1
+    pipeline.execute.assert_called_once()
+    assert not metrics._buffer
+
+
+def test_render_metrics():
+    output = render_metrics(
+        {
+            f"{DURATION_METRIC}|user_lookup|5|0.01": 2,
+            f"{DURATION_METRIC}|user_lookup|5|0.5": 1,
+            f"{DURATION_METRIC}|user_lookup|5|sum": 250_000,
+        }
+    )
+    assert "# TYPE form_ingestion_stage_seconds histogram" in output
+    assert 'form_ingestion_stage_seconds_bucket{stage="user_lookup",opportunity="5",le="0.005"} 0' in output
+    assert 'form_ingestion_stage_seconds_bucket{stage="user_lookup",opportunity="5",le="0.01"} 2' in output
+    assert 'form_ingestion_stage_seconds_bucket{stage="user_lookup",opportunity="5",le="+Inf"} 3' in output
+    assert 'form_ingestion_stage_seconds_sum{stage="user_lookup",opportunity="5"} 0.25' in output
+    assert 'form_ingestion_stage_seconds_count{stage="user_lookup",opportunity="5"} 3' in output
+
+
+@pytest.mark.django_db
+def test_receiver_records_stage_timings(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    oauth_application = opportunity.hq_server.oauth_application
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    make_request(api_client, form_json, mobile_user_with_connect_link, oauth_application=oauth_application)
+
+    values = collect_metrics()
+    stages = {
+        stage
+        for field in values
+        for metric, stage, opportunity_id, _ in [field.split("|")]
+        if metric == QUERIES_METRIC and opportunity_id == str(opportunity.id)
+    }
+    assert {
+        metrics.USER_LOOKUP,
+        metrics.OPPORTUNITY_LOOKUP,
+        metrics.CLAIM_LIMIT_LOCK,
+        metrics.VISIT_COUNTS,
+        metrics.VERIFICATION_FLAGS,
+        metrics.COMPLETED_WORK,
+        metrics.PAYMENT_ACCRUED,
+        metrics.ATTACHMENTS,
+    } <= stages
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client: Client, settings):
+    url = "/api/metrics/form_ingestion/"
+    settings.METRICS_API_TOKEN = None
+    assert client.get(url).status_code == 404
+
+    settings.METRICS_API_TOKEN = "secret"
+    assert client.get(url).status_code == 401
+    assert client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code == 401
+
+    response = client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+    assert response.status_code == 200
+    assert "# TYPE form_ingestion_stage_queries histogram" in response.content.decode()
@@ -6,8 +6,6 @@ import pytest
 from django.utils.timezone import now
 
 from commcare_connect.form_receiver.processor import (
-    ASSESSMENT_JSONPATH,
-    _get_matching_blocks,
     process_assessments,
     process_deliver_form,
     process_learn_form,
@@ -207,7 +205,7 @@ def test_process_assessments(notification_patch, django_capture_on_commit_callba
     opportunity_access = OpportunityAccessFactory()
     assessment_form = AssessmentStubFactory().json
     xform = get_form_model(form_block=assessment_form)
-    matches = _get_matching_blocks(ASSESSMENT_JSONPATH, xform)
+    matches = xform.connect_blocks.assessment
 
     with django_capture_on_commit_callbacks(execute=True):
         process_assessments(
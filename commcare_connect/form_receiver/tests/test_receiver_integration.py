@@ -2,6 +2,7 @@ import datetime
 import importlib
 from copy import deepcopy
 from datetime import timedelta
+from decimal import Decimal
 from http import HTTPStatus
 from unittest.mock import patch
 from uuid import uuid4
@@ -11,7 +12,9 @@ from django.db import connection
 from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from rest_framework.test import APIClient
+from waffle.testutils import override_switch
 
+from commcare_connect.flags.switch_names import DEFERRED_PAYMENT_ACCRUAL, VISIT_LIMIT_COUNTERS
 from commcare_connect.form_receiver.processor import update_completed_learn_date
 from commcare_connect.form_receiver.tests.test_receiver_endpoint import add_credentials
 from commcare_connect.form_receiver.tests.xforms import (
@@ -35,10 +38,12 @@ from commcare_connect.opportunity.models import (
     OpportunityClaimLimit,
     OpportunityVerificationFlags,
     UserVisit,
+    UserVisitCounter,
+    VisitCounterType,
     VisitReviewStatus,
     VisitValidationStatus,
 )
-from commcare_connect.opportunity.tasks import bulk_approve_completed_work
+from commcare_connect.opportunity.tasks import bulk_approve_completed_work, update_pending_payment_accrued
 from commcare_connect.opportunity.tests.factories import (
     CatchmentAreaFactory,
     CompletedModuleFactory,
@@ -53,6 +58,7 @@ from commcare_connect.opportunity.tests.factories import (
     UserVisitFactory,
 )
 from commcare_connect.opportunity.tests.helpers import validate_saved_fields
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
 from commcare_connect.opportunity.visit_import import update_payment_accrued
 from commcare_connect.users.models import User
 
@@ -141,6 +147,8 @@ def test_form_receiver_multiple_module_submissions(
     assert CompletedModule.objects.count() == module_count * 2  # Initial + subsequent submissions
     access = OpportunityAccess.objects.get(opportunity=opportunity, user=mobile_user_with_connect_link)
     assert access.unique_completed_modules.count() == module_count
+    assert access.learn_modules_completed == module_count
+    assert access.learn_modules_total == LearnModule.objects.filter(app=opportunity.learn_app).count()
 
     for module in modules:
         assert CompletedModule.objects.filter(
@@ -291,6 +299,68 @@ def test_receiver_deliver_form_max_visits_reached(
     assert user_visits[4].status == VisitValidationStatus.over_limit
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("paymentunit_options", [pytest.param({"max_daily": 2})])
+def test_receiver_deliver_form_daily_limit_with_visit_counters(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity
+):
+    oauth_application = opportunity.hq_server.oauth_application
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    with override_switch(VISIT_LIMIT_COUNTERS, active=True):
+        for _ in range(3):
+            form_json = deepcopy(form_json)
+            form_json["id"] = str(uuid4())
+            form_json["form"]["deliver"]["entity_id"] = str(uuid4())
+            make_request(api_client, form_json, mobile_user_with_connect_link, oauth_application=oauth_application)
+
+    user_visits = UserVisit.objects.filter(user=mobile_user_with_connect_link).order_by("id")
+    assert [visit.status == VisitValidationStatus.over_limit for visit in user_visits] == [False, False, True]
+
+    access = OpportunityAccess.objects.get(user=mobile_user_with_connect_link, opportunity=opportunity)
+    counters = UserVisitCounter.objects.filter(opportunity_access=access)
+    counter_values = set(counters.values_list("counter_type", "key", "count"))
+    assert (VisitCounterType.TOTAL, "", 2) in counter_values
+    rebuild_visit_counters(access)
+    assert set(counters.values_list("counter_type", "key", "count")) == counter_values
+
+
+@pytest.mark.django_db
+def test_receiver_deliver_form_deferred_payment_accrual(
+    mobile_user_with_connect_link: User,
+    api_client: APIClient,
+    opportunity: Opportunity,
+    settings,
+    django_capture_on_commit_callbacks,
+):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    oauth_application = opportunity.hq_server.oauth_application
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    with (
+        override_switch(DEFERRED_PAYMENT_ACCRUAL, active=True),
+        patch("commcare_connect.opportunity.visit_import.update_pending_payment_accrued") as update_task,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        for _ in range(2):
+            form_json = deepcopy(form_json)
+            form_json["id"] = str(uuid4())
+            form_json["form"]["deliver"]["entity_id"] = str(uuid4())
+            make_request(api_client, form_json, mobile_user_with_connect_link, oauth_application=oauth_application)
+
+    access = OpportunityAccess.objects.get(user=mobile_user_with_connect_link, opportunity=opportunity)
+    # both forms are covered by a single recalculation
+    update_task.apply_async.assert_called_once_with(args=(access.id,), countdown=settings.PAYMENT_ACCRUAL_DELAY)
+    assert access.payment_accrual_pending_since is not None
+    assert access.last_active is not None
+    assert access.payment_accrued == 0
+
+    update_pending_payment_accrued(access.id)
+    access.refresh_from_db()
+    assert access.payment_accrual_pending_since is None
+    assert access.payment_accrued == sum(
+        completed_work.saved_payment_accrued for completed_work in access.completedwork_set.all()
+    )
+
+
 @pytest.mark.django_db
 def test_receiver_deliver_form_end_date_reached(
     user_with_connectid_link: User, api_client: APIClient, opportunity: Opportunity
@@ -530,8 +600,14 @@ def test_auto_approve_payments_approved_visit(
     "update_func, args_required", [(update_payment_accrued, True), (bulk_approve_completed_work, False)]
 )
 def test_auto_approve_payments_rejected_visit_functions(
-    user_with_connectid_link: User, api_client: APIClient, opportunity: Opportunity, update_func, args_required
+    user_with_connectid_link: User,
+    api_client: APIClient,
+    opportunity: Opportunity,
+    update_func,
+    args_required,
+    settings,
 ):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
     form_json = _create_opp_and_form_json(opportunity, user=user_with_connectid_link)
     form_json["metadata"]["timeEnd"] = "2023-06-07T12:36:10.178000Z"
     opportunity.auto_approve_payments = True
@@ -559,8 +635,9 @@ def test_auto_approve_payments_rejected_visit_functions(
 
 
 def test_auto_approve_payments_approved_visit_task(
-    user_with_connectid_link: User, api_client: APIClient, opportunity: Opportunity
+    user_with_connectid_link: User, api_client: APIClient, opportunity: Opportunity, settings
 ):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
     form_json = _create_opp_and_form_json(opportunity, user=user_with_connectid_link)
     form_json["metadata"]["timeEnd"] = "2023-06-07T12:36:10.178000Z"
     opportunity.auto_approve_payments = True
@@ -731,6 +808,56 @@ def test_receiver_verification_flags_catchment_areas(
     assert ["catchment", "Visit outside worker catchment areas"] in visit.flag_reason.get("flags", [])
 
 
+@pytest.mark.parametrize("radius, flagged", [(1000, False), (10, True)])
+def test_receiver_verification_flags_catchment_area_distance(
+    user_with_connectid_link: User, api_client: APIClient, opportunity: Opportunity, radius, flagged
+):
+    verification_flags = OpportunityVerificationFlags.objects.get(opportunity=opportunity)
+    verification_flags.catchment_areas = True
+    verification_flags.save()
+
+    form_json = _create_opp_and_form_json(opportunity, user=user_with_connectid_link)
+    form_json["metadata"]["location"] = "20.09 40.09 20 40"
+
+    access = OpportunityAccess.objects.get(user=user_with_connectid_link, opportunity=opportunity)
+    # about 150m from the visit location
+    CatchmentAreaFactory(
+        opportunity=opportunity,
+        opportunity_access=access,
+        active=True,
+        latitude=Decimal("20.091"),
+        longitude=Decimal("40.091"),
+        radius=radius,
+    )
+    oauth_application = opportunity.hq_server.oauth_application
+    make_request(api_client, form_json, user_with_connectid_link, oauth_application=oauth_application)
+    visit = UserVisit.objects.get(user=user_with_connectid_link)
+    catchment_flags = [flag for flag, _ in (visit.flag_reason or {}).get("flags", []) if flag == "catchment"]
+    assert bool(catchment_flags) == flagged
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("opportunity", [{"verification_flags": {"location": 10}}], indirect=True)
+@pytest.mark.parametrize("location, flagged", [("20.090209 40.09320 20 40", True), ("20.1 40.1 20 40", False)])
+def test_receiver_verification_flags_location(
+    mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity, location, flagged
+):
+    oauth_application = opportunity.hq_server.oauth_application
+    form_json = get_form_json_for_payment_unit(opportunity.paymentunit_set.first())
+    make_request(api_client, form_json, mobile_user_with_connect_link, oauth_application=oauth_application)
+    first_visit = UserVisit.objects.get(xform_id=form_json["id"])
+    assert first_visit.location_point is not None
+
+    second_form_json = deepcopy(form_json)
+    second_form_json["id"] = str(uuid4())
+    second_form_json["form"]["deliver"]["entity_id"] = str(uuid4())
+    second_form_json["metadata"]["location"] = location
+    make_request(api_client, second_form_json, mobile_user_with_connect_link, oauth_application=oauth_application)
+    visit = UserVisit.objects.get(xform_id=second_form_json["id"])
+    location_flags = [flag for flag, _ in (visit.flag_reason or {}).get("flags", []) if flag == "location"]
+    assert bool(location_flags) == flagged
+
+
 @pytest.mark.parametrize("opportunity", [{"opp_options": {"managed": True}}], indirect=True)
 def test_approve_rejected_visit(mobile_user_with_connect_link: User, api_client: APIClient, opportunity: Opportunity):
     assert opportunity.managed
@@ -891,6 +1018,8 @@ def create_learn_module_data(opportunity, mobile_user, access):
             opportunity_access=access,
             xform_id=uuid4(),
         )
+    # load the learn module counts updated for the completed modules
+    access.refresh_from_db()
 
     return {
         "today": today,
@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+
+from commcare_connect.commcarehq.tests.factories import HQServerFactory
+from commcare_connect.form_receiver.exceptions import ProcessingError
+from commcare_connect.form_receiver.processor import get_opportunity
+from commcare_connect.form_receiver.routing import RouteRole, get_routes
+from commcare_connect.opportunity.models import Opportunity
+from commcare_connect.opportunity.tasks import auto_deactivate_ended_opportunities
+from commcare_connect.opportunity.tests.factories import OpportunityFactory
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+def test_get_opportunity_uses_routing_table(opportunity: Opportunity, django_assert_num_queries):
+    deliver_app = opportunity.deliver_app
+    learn_app = opportunity.learn_app
+    get_routes(deliver_app.cc_domain, deliver_app.cc_app_id, RouteRole.DELIVER)
+
+    # the opportunity and its apps are cached with the routes
+    with django_assert_num_queries(0):
+        result = get_opportunity(deliver_app.cc_domain, opportunity.hq_server, deliver_app_id=deliver_app.cc_app_id)
+        assert result == opportunity
+        assert result.deliver_app == deliver_app
+    with django_assert_num_queries(0):
+        result = get_opportunity(learn_app.cc_domain, opportunity.hq_server, learn_app_id=learn_app.cc_app_id)
+        assert result == opportunity
+        assert result.learn_app == learn_app
+    with django_assert_num_queries(0):
+        assert get_opportunity(learn_app.cc_domain, opportunity.hq_server, deliver_app_id=learn_app.cc_app_id) is None
+
+
+def test_routing_table_invalidated_on_save(opportunity: Opportunity):
+    deliver_app = opportunity.deliver_app
+    hq_server = opportunity.hq_server
+    assert get_opportunity(deliver_app.cc_domain, hq_server, deliver_app_id=deliver_app.cc_app_id) == opportunity
+
+    opportunity.end_date = datetime.date.today() - datetime.timedelta(days=1)
+    opportunity.save()
+    assert get_opportunity(deliver_app.cc_domain, hq_server, deliver_app_id=deliver_app.cc_app_id) is None
+
+    opportunity.end_date = datetime.date.today()
+    opportunity.save()
+    deliver_app.cc_app_id = "new-app-id"
+    deliver_app.save()
+    assert get_opportunity(deliver_app.cc_domain, hq_server, deliver_app_id="new-app-id") == opportunity
+
+
+def test_routing_table_invalidated_on_bulk_deactivation(opportunity: Opportunity):
+    deliver_app = opportunity.deliver_app
+    hq_server = opportunity.hq_server
+    assert get_opportunity(deliver_app.cc_domain, hq_server, deliver_app_id=deliver_app.cc_app_id) == opportunity
+
+    Opportunity.objects.filter(pk=opportunity.pk).update(end_date=datetime.date.today() - datetime.timedelta(days=60))
+    auto_deactivate_ended_opportunities()
+    assert get_opportunity(deliver_app.cc_domain, hq_server, deliver_app_id=deliver_app.cc_app_id) is None
+
+
+def test_get_opportunity_returns_copy(opportunity: Opportunity):
+    deliver_app = opportunity.deliver_app
+    result = get_opportunity(deliver_app.cc_domain, opportunity.hq_server, deliver_app_id=deliver_app.cc_app_id)
+    result.name = "changed"
+    result = get_opportunity(deliver_app.cc_domain, opportunity.hq_server, deliver_app_id=deliver_app.cc_app_id)
+    assert result.name == opportunity.name
+
+
+def test_routing_errors(opportunity: Opportunity):
+    deliver_app = opportunity.deliver_app
+    with pytest.raises(ProcessingError):
+        get_opportunity(deliver_app.cc_domain, HQServerFactory(), deliver_app_id=deliver_app.cc_app_id)
+
+    OpportunityFactory(deliver_app=deliver_app, organization=opportunity.organization)
+    with pytest.raises(ProcessingError, match="Multiple active opportunities"):
+        get_opportunity(deliver_app.cc_domain, opportunity.hq_server, deliver_app_id=deliver_app.cc_app_id)
@@ -1,18 +1,38 @@
 import logging
+import secrets
 
-from django.db import IntegrityError
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from oauth2_provider.contrib.rest_framework import OAuth2Authentication, TokenHasReadWriteScope
 from rest_framework import parsers, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from waffle import switch_is_active
 
 from commcare_connect.commcarehq.models import HQServer
-from commcare_connect.form_receiver.processor import process_xform
+from commcare_connect.flags.switch_names import ASYNC_FORM_INGESTION
+from commcare_connect.form_receiver.batch import process_xform_batch
+from commcare_connect.form_receiver.const import BATCH_RECEIVER_MAX_FORMS
+from commcare_connect.form_receiver.exceptions import ProcessingError
+from commcare_connect.form_receiver.inbox import enqueue_xform
+from commcare_connect.form_receiver.metrics import collect_metrics, render_metrics
+from commcare_connect.form_receiver.processor import get_duplicate_submission_message, process_xform
 from commcare_connect.form_receiver.serializers import XFormSerializer
 
 logger = logging.getLogger(__name__)
 
 
+def _get_hq_server(request):
+    try:
+        return HQServer.objects.get(oauth_application=request.auth.application)
+    except HQServer.DoesNotExist as e:
+        raise ProcessingError from e
+
+
 class FormReceiver(APIView):
     parser_classes = [parsers.JSONParser]
     authentication_classes = [OAuth2Authentication]
@@ -28,22 +48,50 @@ class FormReceiver(APIView):
         serializer = XFormSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         xform = serializer.save()
-        try:
-            hq_server = HQServer.objects.get(oauth_application=request.auth.application)
-        except HQServer.DoesNotExist as e:
-            from commcare_connect.form_receiver.exceptions import ProcessingError
+        hq_server = _get_hq_server(request)
 
-            raise ProcessingError from e
+        if switch_is_active(ASYNC_FORM_INGESTION):
+            # the form is stored in the inbox and processed by a celery worker
+            enqueue_xform(xform, hq_server)
+            return Response(status=status.HTTP_202_ACCEPTED)
 
         try:
             process_xform(xform, hq_server)
         except IntegrityError as e:
-            if "unique_xform_entity_deliver_unit" in str(e):
-                logger.info(f"Duplicate form with ID: {xform.id} received.")
-            elif "unique_xform_completed_module" in str(e):
-                logger.info(f"Learn Module is already completed with form ID: {xform.id}.")
-            elif "unique_xform_work_area_inaccessibility" in str(e):
-                logger.info(f"Duplicate inaccessibility request for form ID: {xform.id}.")
-            else:
+            message = get_duplicate_submission_message(e, xform)
+            if message is None:
                 raise
+            logger.info(message)
         return Response(status=status.HTTP_200_OK)
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class FormBatchReceiver(APIView):
+    """Accepts a list of forms in a single request.
+
+    Each form is processed in its own transaction, so the request itself is not atomic.
+    The response contains one result per submitted form, in the order they were submitted."""
+
+    parser_classes = [parsers.JSONParser]
+    authentication_classes = [OAuth2Authentication]
+    permission_classes = [TokenHasReadWriteScope]
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError("Expected a list of forms.")
+        if len(request.data) > BATCH_RECEIVER_MAX_FORMS:
+            raise ValidationError(f"A maximum of {BATCH_RECEIVER_MAX_FORMS} forms can be submitted at once.")
+        hq_server = _get_hq_server(request)
+        results = process_xform_batch(request.data, hq_server)
+        return Response(results, status=status.HTTP_200_OK)
+
+
+@require_GET
+def form_ingestion_metrics(request):
+    """Form ingestion stage timings in the Prometheus text format."""
+    if not settings.METRICS_API_TOKEN:
+        raise Http404
+    authorization = request.headers.get("Authorization", "")
+    if not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_API_TOKEN}"):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(collect_metrics()), content_type="text/plain; version=0.0.4; charset=utf-8")
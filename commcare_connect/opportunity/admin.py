@@ -28,6 +28,8 @@ from commcare_connect.opportunity.models import (
     UserVisit,
 )
 from commcare_connect.opportunity.tasks import create_learn_modules_and_deliver_units
+from commcare_connect.opportunity.utils.payment_ledger import refresh_payment_ledger
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
 
 # Register your models here.
 
@@ -73,6 +75,8 @@ class OpportunityAccessAdmin(admin.ModelAdmin):
             CompletedModule.objects.filter(opportunity_access=access).delete()
             Assessment.objects.filter(opportunity_access=access).delete()
             CompletedWork.objects.filter(opportunity_access=access).delete()
+            rebuild_visit_counters(access)
+            refresh_payment_ledger([access.id])
 
 
 @admin.register(LearnModule)
@@ -161,10 +161,21 @@ class OpportunitySerializer(serializers.ModelSerializer):
         return None
 
     def get_learn_progress(self, obj):
+        # the counts are updated in bulk as modules are completed, so they are read past the cached access,
+        # from the values annotated by the opportunity list when they are available
+        if hasattr(obj, "user_learn_modules_total"):
+            return {
+                "total_modules": obj.user_learn_modules_total,
+                "completed_modules": obj.user_learn_modules_completed,
+            }
         opp_access = _get_opp_access(self.context.get("request").user, obj)
-        total_modules = LearnModule.objects.filter(app=opp_access.opportunity.learn_app)
-        completed_modules = opp_access.unique_completed_modules
-        return {"total_modules": total_modules.count(), "completed_modules": completed_modules.count()}
+        progress = OpportunityAccess.objects.filter(pk=opp_access.pk).values(
+            "learn_modules_total", "learn_modules_completed"
+        )[0]
+        return {
+            "total_modules": progress["learn_modules_total"],
+            "completed_modules": progress["learn_modules_completed"],
+        }
 
     def get_deliver_progress(self, obj):
         opp_access = _get_opp_access(self.context.get("request").user, obj)
@@ -3,7 +3,7 @@ import logging
 
 import waffle
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
 from django.http import Http404
 from django.utils.timezone import now
 from rest_framework import viewsets
@@ -40,7 +40,12 @@ class OpportunityViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Opportunity.objects.filter(opportunityaccess__user=self.request.user, archived=False)
+        # the learn progress of the user is read with the opportunities instead of per opportunity
+        accesses = OpportunityAccess.objects.filter(user=self.request.user, opportunity=OuterRef("pk"))
+        return Opportunity.objects.filter(opportunityaccess__user=self.request.user, archived=False).annotate(
+            user_learn_modules_total=Subquery(accesses.values("learn_modules_total")[:1]),
+            user_learn_modules_completed=Subquery(accesses.values("learn_modules_completed")[:1]),
+        )
 
 
 class UserLearnProgressView(RetrieveAPIView):
@@ -0,0 +1,58 @@
+"""Cached lookup of deliver unit and learn module IDs by the slug used in form blocks.
+
+Deliver units and learn modules rarely change once an app has been synced, so the mapping of
+slug to ID for each app is cached and only reloaded after a deliver unit or learn module of the
+app is saved or deleted. A slug that is not in the mapping is a unit that has not been synced
+yet, which form processing creates as before.
+"""
+
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from commcare_connect.opportunity.models import CommCareApp, DeliverUnit, LearnModule
+
+APP_UNITS_CACHE_TIMEOUT = 60 * 60 * 24
+
+DELIVER_UNITS = "deliver_units"
+LEARN_MODULES = "learn_modules"
+
+
+def _cache_key(app_id: int) -> str:
+    return f"app_unit_ids:{app_id}"
+
+
+def get_deliver_unit_id(app_id: int, slug: str) -> int | None:
+    return _get_app_units(app_id)[DELIVER_UNITS].get(slug)
+
+
+def get_learn_module_id(app_id: int, slug: str) -> int | None:
+    return _get_app_units(app_id)[LEARN_MODULES].get(slug)
+
+
+def warm_app_units(app: CommCareApp):
+    """Load the mapping once the units of the app are synced, after any invalidation from the sync."""
+    transaction.on_commit(partial(_load_app_units, app.id))
+
+
+def invalidate_app_units(app_id: int):
+    cache.delete(_cache_key(app_id))
+    transaction.on_commit(partial(cache.delete, _cache_key(app_id)))
+
+
+def _get_app_units(app_id: int) -> dict[str, dict[str, int]]:
+    app_units = cache.get(_cache_key(app_id))
+    if app_units is None:
+        app_units = _load_app_units(app_id)
+    return app_units
+
+
+def _load_app_units(app_id: int) -> dict[str, dict[str, int]]:
+    # ordered so that the oldest unit is used if a slug is duplicated
+    app_units = {
+        DELIVER_UNITS: dict(DeliverUnit.objects.filter(app_id=app_id).order_by("-id").values_list("slug", "id")),
+        LEARN_MODULES: dict(LearnModule.objects.filter(app_id=app_id).order_by("-id").values_list("slug", "id")),
+    }
+    cache.set(_cache_key(app_id), app_units, APP_UNITS_CACHE_TIMEOUT)
+    return app_units
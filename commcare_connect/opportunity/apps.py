@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OppurtunityConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "commcare_connect.opportunity"
+
+    def ready(self):
+        import commcare_connect.opportunity.signals  # noqa: F401
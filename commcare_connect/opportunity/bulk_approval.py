@@ -0,0 +1,101 @@
+"""Planning and progress tracking for the nightly bulk approval of completed work.
+
+A run splits the users of every auto approved opportunity into chunks that are processed by
+separate tasks. The number of chunks of each opportunity and the number completed, failed or
+skipped because the run passed its deadline are kept in the cache for the duration of the run.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+from commcare_connect.opportunity.models import CompletedWork, Opportunity, OpportunityAccess
+from commcare_connect.utils.itertools import batched
+
+BULK_APPROVAL_PROGRESS_TIMEOUT = 60 * 60 * 48
+LATEST_RUN_KEY = "bulk_approval:latest_run"
+
+COMPLETED = "completed"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def _run_key(run_id: str) -> str:
+    return f"bulk_approval:{run_id}"
+
+
+def _counter_key(run_id: str, opportunity_id: int, counter: str) -> str:
+    return f"bulk_approval:{run_id}:{opportunity_id}:{counter}"
+
+
+def get_bulk_approval_opportunities():
+    return Opportunity.objects.filter(
+        active=True,
+        end_date__gte=datetime.date.today(),
+        auto_approve_payments=True,
+    ).order_by("id")
+
+
+def plan_bulk_approval(run_id: str, deadline: datetime.datetime) -> list[tuple[int, tuple[int, ...]]]:
+    """Split the active users of the opportunities into chunks of (opportunity id, access ids)
+    and start tracking the progress of the run."""
+    chunks = []
+    for opportunity_id in get_bulk_approval_opportunities().values_list("id", flat=True):
+        access_ids = (
+            OpportunityAccess.objects.filter(opportunity_id=opportunity_id, suspended=False)
+            .filter(Exists(CompletedWork.objects.filter(opportunity_access_id=OuterRef("id"))))
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for chunk in batched(access_ids.iterator(), settings.BULK_APPROVAL_CHUNK_SIZE):
+            chunks.append((opportunity_id, chunk))
+
+    chunk_counts = {}
+    for opportunity_id, _ in chunks:
+        chunk_counts[opportunity_id] = chunk_counts.get(opportunity_id, 0) + 1
+    run = {
+        "started": now(),
+        "deadline": deadline,
+        "opportunities": chunk_counts,
+    }
+    cache.set(_run_key(run_id), run, BULK_APPROVAL_PROGRESS_TIMEOUT)
+    cache.set(LATEST_RUN_KEY, run_id, BULK_APPROVAL_PROGRESS_TIMEOUT)
+    return chunks
+
+
+def record_chunk_progress(run_id: str, opportunity_id: int, counter: str):
+    key = _counter_key(run_id, opportunity_id, counter)
+    cache.add(key, 0, BULK_APPROVAL_PROGRESS_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the counter expired or the cache is unavailable
+        pass
+
+
+def get_bulk_approval_progress(run_id: str | None = None) -> dict | None:
+    """Chunks, completed, skipped and failed chunks of each opportunity in the run, by default the latest run."""
+    run_id = run_id or cache.get(LATEST_RUN_KEY)
+    run = cache.get(_run_key(run_id)) if run_id else None
+    if run is None:
+        return None
+
+    keys = {
+        (opportunity_id, counter): _counter_key(run_id, opportunity_id, counter)
+        for opportunity_id in run["opportunities"]
+        for counter in (COMPLETED, SKIPPED, FAILED)
+    }
+    counts = cache.get_many(keys.values())
+    opportunities = {
+        opportunity_id: {
+            "chunks": chunk_count,
+            COMPLETED: counts.get(keys[(opportunity_id, COMPLETED)], 0),
+            SKIPPED: counts.get(keys[(opportunity_id, SKIPPED)], 0),
+            FAILED: counts.get(keys[(opportunity_id, FAILED)], 0),
+        }
+        for opportunity_id, chunk_count in run["opportunities"].items()
+    }
+    return {"run_id": run_id, "started": run["started"], "deadline": run["deadline"], "opportunities": opportunities}
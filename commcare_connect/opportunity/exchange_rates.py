@@ -0,0 +1,144 @@
+"""Cached lookup of exchange rates without fetching rates on the request or task path.
+
+The exchange rate for a date is the latest rate stored on or before that date. All stored rates
+of a currency are loaded with one query and cached together, so an operation that converts
+amounts for many dates does not query per conversion. Inside ``exchange_rate_memo`` the rates
+are also kept in process for the duration of the block.
+
+Rates are fetched on the first of each month by the ``fetch_exchange_rates`` task. When the
+month of a date has no stored rate yet, the lookup queues a fetch for that month and falls
+back to the latest stored rate. Only a currency with no stored rates at all is fetched inline,
+as there is no rate to fall back to.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import datetime
+from collections.abc import Iterable
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from commcare_connect.opportunity.models import ExchangeRate
+
+EXCHANGE_RATES_CACHE_TIMEOUT = 60 * 60 * 24
+EXCHANGE_RATE_FETCH_TIMEOUT = 60 * 60
+
+_current_rates = contextvars.ContextVar("exchange_rates", default=None)
+
+
+def _cache_key(currency_code: str) -> str:
+    return f"exchange_rates:{currency_code}"
+
+
+def _to_date(value: datetime.date | datetime.datetime) -> datetime.date:
+    # the same conversion as DateField applies when filtering on rate_date
+    if isinstance(value, datetime.datetime):
+        if settings.USE_TZ and timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.get_default_timezone())
+        return value.date()
+    return value
+
+
+class ExchangeRates:
+    """Stored exchange rates by currency, as (rate_date, rate, id) tuples ordered by date."""
+
+    def __init__(self):
+        self._rates = {}
+
+    def preload(self, currency_codes: Iterable[str]):
+        """Load the rates of all the currencies, querying once for the currencies not in the cache."""
+        currency_codes = {code.upper() for code in currency_codes if code} - set(self._rates)
+        if not currency_codes:
+            return
+        cached = cache.get_many([_cache_key(code) for code in currency_codes])
+        missing = set()
+        for code in currency_codes:
+            rates = cached.get(_cache_key(code))
+            if rates is None:
+                missing.add(code)
+            else:
+                self._rates[code] = rates
+        if not missing:
+            return
+
+        loaded = {code: [] for code in missing}
+        stored_rates = ExchangeRate.objects.filter(currency_code__in=missing).order_by("currency_code", "rate_date")
+        for pk, code, rate_date, rate in stored_rates.values_list("id", "currency_code", "rate_date", "rate"):
+            loaded[code].append((rate_date, rate, pk))
+        cache.set_many({_cache_key(code): rates for code, rates in loaded.items()}, EXCHANGE_RATES_CACHE_TIMEOUT)
+        self._rates.update(loaded)
+
+    def forget(self, currency_code: str):
+        self._rates.pop(currency_code.upper(), None)
+
+    def get(self, currency_code: str, date: datetime.date | datetime.datetime | None = None) -> ExchangeRate:
+        """The latest rate on or before the date. A fetch of the rate is queued if the month of the date
+        has no rate yet, meanwhile dates before the first stored rate use the earliest stored rate as
+        the one closest to the date. If the currency has no stored rates the rate of the month is
+        fetched synchronously."""
+        currency_code = currency_code.upper()
+        rate_date = _to_date(date) if date else timezone.now().date()
+        self.preload([currency_code])
+        rates = self._rates[currency_code]
+        if not rates:
+            return self._fetch(currency_code, rate_date)
+
+        index = bisect.bisect_right(rates, rate_date, key=lambda rate: rate[0]) - 1
+        if index < 0 or rates[index][0] < rate_date.replace(day=1):
+            queue_exchange_rate_fetch(currency_code, rate_date)
+        index = max(index, 0)
+        stored_date, rate, pk = rates[index]
+        return ExchangeRate(id=pk, currency_code=currency_code, rate=rate, rate_date=stored_date)
+
+    def _fetch(self, currency_code: str, rate_date: datetime.date) -> ExchangeRate:
+        from commcare_connect.opportunity.tasks import fetch_exchange_rates
+
+        exchange_rate = fetch_exchange_rates(rate_date.replace(day=1), currency_code)
+        invalidate_exchange_rates(currency_code)
+        self._rates[currency_code] = [(exchange_rate.rate_date, exchange_rate.rate, exchange_rate.pk)]
+        return exchange_rate
+
+
+def queue_exchange_rate_fetch(currency_code: str, date: datetime.date):
+    from commcare_connect.opportunity.tasks import fetch_exchange_rates
+
+    month = date.replace(day=1)
+    if cache.add(f"exchange_rate_fetch:{currency_code}:{month.isoformat()}", True, EXCHANGE_RATE_FETCH_TIMEOUT):
+        transaction.on_commit(partial(fetch_exchange_rates.delay, month.isoformat(), currency_code))
+
+
+def invalidate_exchange_rates(currency_code: str):
+    cache.delete(_cache_key(currency_code.upper()))
+    transaction.on_commit(partial(cache.delete, _cache_key(currency_code.upper())))
+    rates = _current_rates.get()
+    if rates is not None:
+        rates.forget(currency_code)
+
+
+def get_exchange_rate_record(currency_code: str, date=None) -> ExchangeRate:
+    rates = _current_rates.get()
+    if rates is None:
+        rates = ExchangeRates()
+    return rates.get(currency_code, date)
+
+
+@contextlib.contextmanager
+def exchange_rate_memo(currency_codes: Iterable[str] = ()):
+    """Keep the exchange rates looked up in the block in process, optionally preloading the rates
+    of the given currencies. Nested blocks share the outer memo."""
+    rates = _current_rates.get()
+    token = None
+    if rates is None:
+        rates = ExchangeRates()
+        token = _current_rates.set(rates)
+    try:
+        rates.preload(currency_codes)
+        yield rates
+    finally:
+        if token is not None:
+            _current_rates.reset(token)
@@ -1,10 +1,17 @@
+import csv
 import datetime
+import io
 import json
+import shutil
 
+import pyarrow as pa
 from django.core.paginator import Paginator
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from django.utils.encoding import force_str
 from flatten_dict import flatten as flatten_json
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from tablib import Dataset
 
 from commcare_connect.opportunity.helpers import (
@@ -28,7 +35,17 @@ from commcare_connect.opportunity.tables import (
     UserVisitReviewTable,
     UserVisitTable,
 )
+from commcare_connect.opportunity.utils.payment_unit_hierarchy import payment_unit_hierarchy_memo
 from commcare_connect.utils.datetime import get_start_end_date_range_with_time
+from commcare_connect.utils.itertools import batched
+from commcare_connect.utils.parquet import CATEGORY, TIMESTAMP, concat_parquet, write_parquet
+
+EXPORT_CHUNK_SIZE = 500
+
+VISIT_PARQUET_COLUMN_TYPES = {
+    "visit_date_export": TIMESTAMP,
+    "status": CATEGORY,
+}
 
 
 class UserVisitExporter:
@@ -71,15 +88,29 @@ class UserVisitExporter:
             row.append(json.dumps(form_json))
         return row
 
-    def get_dataset(self, from_date, to_date, status: list[VisitValidationStatus]) -> Dataset:
-        """Get dataset of all user visits for an opportunity."""
+    def _get_user_visits(self, from_date, to_date, status: list[VisitValidationStatus]):
         from_date, to_date = get_start_end_date_range_with_time(from_date, to_date)
         user_visits = UserVisit.objects.filter(
             opportunity=self.opportunity, visit_date__gte=from_date, visit_date__lte=to_date
         )
         if status and "all" not in status:
             user_visits = user_visits.filter(status__in=status)
-        user_visits = user_visits.order_by("visit_date")
+        # ordered by id within a visit date so that the visits can be split into partitions in export order
+        return user_visits.order_by("visit_date", "id")
+
+    def _get_form_json_schema(self, user_visits) -> list[str]:
+        """Flattened form keys of the visits, in the order they are first seen. Only the form JSON is read,
+        through a server-side cursor."""
+        schema = {}
+        form_jsons = user_visits.values_list("form_json", flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        for form_json in form_jsons:
+            form_json.pop("attachments", None)
+            schema.update(dict.fromkeys(flatten_json(form_json, reducer="dot", enumerate_types=(list,))))
+        return list(schema)
+
+    def get_dataset(self, from_date, to_date, status: list[VisitValidationStatus]) -> Dataset:
+        """Get dataset of all user visits for an opportunity."""
+        user_visits = self._get_user_visits(from_date, to_date, status)
         self._get_table_metadata()
 
         dataset = Dataset(title="Export User Visits", headers=self.headers)
@@ -96,6 +127,145 @@ class UserVisitExporter:
                 dataset.append([force_str(col, strings_only=True) for col in row])
         return dataset
 
+    def get_partitions(self, from_date, to_date, status: list[VisitValidationStatus], partition_size: int):
+        """Split the export into partitions of ``partition_size`` visits that can be written separately with
+        ``write_export`` and concatenated in order. A partition is given by the sort keys of the visits it
+        follows and ends with, and the form columns of the whole export so that all partitions have the
+        same columns. Returns a single partition when the export is not larger than ``partition_size``."""
+        user_visits = self._get_user_visits(from_date, to_date, status)
+        keys = user_visits.values_list("visit_date", "id").iterator(chunk_size=10_000)
+        bounds = []
+        last_key = None
+        for index, last_key in enumerate(keys, start=1):
+            if index % partition_size == 0:
+                bounds.append([last_key[0].isoformat(), last_key[1]])
+        if bounds and bounds[-1][1] == last_key[1]:
+            # the last partition would be empty
+            bounds.pop()
+        if not bounds:
+            return [{"after": None, "until": None, "form_json_schema": None, "headers": True}]
+
+        form_json_schema = self._get_form_json_schema(user_visits) if self.flatten else []
+        return [
+            {"after": after, "until": until, "form_json_schema": form_json_schema, "headers": index == 0}
+            for index, (after, until) in enumerate(zip([None] + bounds, bounds + [None]))
+        ]
+
+    def iter_rows(self, from_date, to_date, status: list[VisitValidationStatus], partition: dict | None = None):
+        """Yield the headers and then the rows of the export of all user visits for an opportunity, or of
+        the visits of one of the partitions from ``get_partitions``.
+
+        Unlike ``get_dataset`` the columns of the form are discovered up front so the visits can be
+        streamed from a server-side cursor without holding the export in memory."""
+        user_visits = self._get_user_visits(from_date, to_date, status)
+        self._get_table_metadata()
+        if self.flatten:
+            if partition and partition["form_json_schema"] is not None:
+                self.form_json_schema = partition["form_json_schema"]
+            else:
+                self.form_json_schema = self._get_form_json_schema(user_visits)
+        yield self.headers + self.form_json_schema
+
+        if partition:
+            user_visits = _filter_partition(user_visits, partition["after"], partition["until"])
+        user_visits = user_visits.select_related("user", "deliver_unit")
+        for visits in batched(user_visits.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+            table = UserVisitTable(list(visits))
+            for table_row in table.rows:
+                row = [table_row.get_cell_value(column.name) for column in self.columns]
+                form_json = table_row.get_cell_value("form_json")
+                form_json.pop("attachments", None)
+                if self.flatten:
+                    flat_json = flatten_json(form_json, reducer="dot", enumerate_types=(list,))
+                    row.extend(flat_json.get(key, "") for key in self.form_json_schema)
+                else:
+                    row.append(json.dumps(form_json))
+                yield [force_str(col, strings_only=True) for col in row]
+
+    def _get_parquet_schema(self, headers) -> pa.Schema:
+        # the table columns come first, followed by the form columns which are always text
+        types = [VISIT_PARQUET_COLUMN_TYPES.get(column.name, pa.string()) for column in self.columns]
+        types += [pa.string()] * (len(headers) - len(types))
+        return pa.schema([pa.field(header, arrow_type) for header, arrow_type in zip(headers, types)])
+
+    def write_export(
+        self,
+        export_file,
+        export_format: str,
+        from_date,
+        to_date,
+        status: list[VisitValidationStatus],
+        partition: dict | None = None,
+    ):
+        """Write the export of all user visits for an opportunity to the binary file ``export_file``, or of
+        the visits of one of the partitions from ``get_partitions``. Only the first partition of a CSV export
+        is written with the headers, so the files of the partitions can be joined."""
+        rows = self.iter_rows(from_date, to_date, status, partition)
+        if export_format == "csv":
+            if partition and not partition["headers"]:
+                next(rows)
+            write_csv(export_file, rows)
+        elif export_format == "xlsx":
+            write_xlsx(export_file, rows, title="Export User Visits")
+        elif export_format == "parquet":
+            headers = next(rows)
+            write_parquet(export_file, rows, self._get_parquet_schema(headers))
+        else:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def _filter_partition(user_visits, after: list | None, until: list | None):
+    """Visits after the sort key ``after`` up to and including the sort key ``until``."""
+    if after:
+        visit_date, visit_id = datetime.datetime.fromisoformat(after[0]), after[1]
+        user_visits = user_visits.filter(Q(visit_date__gt=visit_date) | Q(visit_date=visit_date, id__gt=visit_id))
+    if until:
+        visit_date, visit_id = datetime.datetime.fromisoformat(until[0]), until[1]
+        user_visits = user_visits.filter(Q(visit_date__lt=visit_date) | Q(visit_date=visit_date, id__lte=visit_id))
+    return user_visits
+
+
+def join_export_parts(export_file, export_format: str, part_files):
+    """Join the files of the partitions of an export, in order, into the binary file ``export_file``."""
+    if export_format == "csv":
+        for part_file in part_files:
+            shutil.copyfileobj(part_file, export_file)
+    elif export_format == "parquet":
+        concat_parquet(export_file, part_files)
+    else:
+        raise ValueError(f"Export format cannot be joined: {export_format}")
+
+
+def write_csv(export_file, rows):
+    """Write the rows to the binary file ``export_file`` as CSV, one row at a time."""
+    text_file = io.TextIOWrapper(export_file, encoding="utf-8", newline="")
+    writer = csv.writer(text_file)
+    for row in rows:
+        writer.writerow(row)
+    text_file.flush()
+    # leave the underlying file open for the caller
+    text_file.detach()
+
+
+def write_xlsx(export_file, rows, title: str):
+    """Write the rows to the binary file ``export_file`` as a single sheet workbook. The first row is
+    the headers. Rows are written as they come and are not kept in memory."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.freeze_panes = "A2"
+    rows = iter(rows)
+    headers = next(rows, [])
+    bold = Font(bold=True)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = bold
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(export_file)
+
 
 def export_user_visit_review_data(
     opportunity: Opportunity, from_date, to_date, status: list[VisitReviewStatus]
@@ -171,13 +341,14 @@ def export_deliver_status_table(opportunity: Opportunity) -> Dataset:
 def export_work_status_table(opportunity: Opportunity) -> Dataset:
     access_objects = OpportunityAccess.objects.filter(opportunity=opportunity, suspended=False)
     completed_works = []
-    for completed_work in CompletedWork.objects.filter(opportunity_access__in=access_objects):
-        completed = completed_work.completed
-        if opportunity.auto_approve_payments and completed and completed_work.flags:
-            completed_works.append(completed_work)
-            continue
-        if completed:
-            completed_works.append(completed_work)
+    with payment_unit_hierarchy_memo(access_objects.values("id")):
+        for completed_work in CompletedWork.objects.filter(opportunity_access__in=access_objects):
+            completed = completed_work.completed
+            if opportunity.auto_approve_payments and completed and completed_work.flags:
+                completed_works.append(completed_work)
+                continue
+            if completed:
+                completed_works.append(completed_work)
     table = CompletedWorkTable(completed_works, exclude=("date_popup"))
     return get_dataset(table, export_title="Payment Verification export")
 
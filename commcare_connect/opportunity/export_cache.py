@@ -0,0 +1,129 @@
+"""Reuse of export files while the data they were generated from is unchanged.
+
+Exports are requested repeatedly with the same options, usually with no new data in between.
+The file saved for an export is cached under a key of the export type, its options and a
+fingerprint of the exported data, read with a single aggregate query. An identical request
+is answered with the saved file for as long as the fingerprint matches and the file has not
+expired from the export storage.
+
+The fingerprint is read before the export is generated, so a change made while an export is
+generated only ever causes the file to be regenerated, never an outdated file to be reused.
+
+Users and deliver units have no modified date, so the names, usernames and phone numbers that
+the exports include are covered by a checksum of those columns instead. Other columns of joined
+rows that are not part of the fingerprint can be outdated in a reused file for at most
+``EXPORT_CACHE_TIMEOUT``.
+"""
+
+import hashlib
+import json
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q, Sum, TextField, Value
+from django.db.models.functions import MD5, Concat
+
+from commcare_connect.opportunity.models import CompletedWork, DeliverUnit, Opportunity, OpportunityAccess, UserVisit
+
+EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+VISIT_EXPORT = "visit"
+REVIEW_VISIT_EXPORT = "review_visit"
+WORK_STATUS_EXPORT = "work_status"
+PAYMENT_EXPORT = "payment"
+
+
+def _cache_key(export_type: str, opportunity_id: int, options: dict, fingerprint: dict) -> str:
+    data = json.dumps([options, fingerprint], cls=DjangoJSONEncoder, sort_keys=True)
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    return f"export_file:{export_type}:{opportunity_id}:{digest}"
+
+
+def _export_file_exists(file_name: str) -> bool:
+    from commcare_connect.utils.storages import ExportS3Boto3Storage
+
+    return ExportS3Boto3Storage().exists(file_name)
+
+
+def get_cached_export(export_type: str, opportunity_id: int, options: dict) -> tuple[str, str | None]:
+    """Cache key of an export of the current data of the opportunity with the given options, and the name
+    of the saved file of an earlier identical export if it can be reused."""
+    fingerprint = get_export_fingerprint(export_type, opportunity_id)
+    key = _cache_key(export_type, opportunity_id, options, fingerprint)
+    file_name = cache.get(key)
+    if file_name and _export_file_exists(file_name):
+        return key, file_name
+    return key, None
+
+
+def set_cached_export(key: str, file_name: str):
+    cache.set(key, file_name, EXPORT_CACHE_TIMEOUT)
+
+
+def get_or_generate_export(export_type: str, opportunity_id: int, options: dict, generate) -> str:
+    """Name of a saved export of the opportunity with the given options, reusing the file of an earlier
+    identical export of unchanged data or calling ``generate`` to save a new one."""
+    key, file_name = get_cached_export(export_type, opportunity_id, options)
+    if file_name is None:
+        file_name = generate()
+        set_cached_export(key, file_name)
+    return file_name
+
+
+def get_export_fingerprint(export_type: str, opportunity_id: int) -> dict:
+    """Summary of the data an export of the opportunity is generated from, which changes whenever a
+    record is added, updated or removed."""
+    if export_type in (VISIT_EXPORT, REVIEW_VISIT_EXPORT):
+        return _get_visit_fingerprint(opportunity_id)
+    if export_type == WORK_STATUS_EXPORT:
+        # completed work is exported with its visit counts and flags
+        completed_works = CompletedWork.objects.filter(opportunity_access__opportunity_id=opportunity_id).aggregate(
+            count=Count("id"), max_id=Max("id"), max_modified=Max("last_modified")
+        )
+        return {
+            "completed_works": completed_works,
+            "visits": _get_visit_fingerprint(opportunity_id),
+            "accesses": _get_access_fingerprint(opportunity_id),
+        }
+    if export_type == PAYMENT_EXPORT:
+        return {"accesses": _get_access_fingerprint(opportunity_id), "users": _get_user_fingerprint(opportunity_id)}
+    raise ValueError(f"Unknown export type {export_type}")
+
+
+def _get_visit_fingerprint(opportunity_id: int) -> dict:
+    visits = UserVisit.objects.filter(opportunity_id=opportunity_id).aggregate(
+        count=Count("id"), max_id=Max("id"), max_modified=Max("date_modified")
+    )
+    return {
+        **visits,
+        "users": _get_user_fingerprint(opportunity_id),
+        "deliver_units": _get_deliver_unit_fingerprint(opportunity_id),
+    }
+
+
+def _checksum(*fields):
+    """Checksum of the given columns of all rows, ordered by the first column."""
+    row = Concat(*[part for field in fields for part in (field, Value("|"))], output_field=TextField())
+    return MD5(StringAgg(row, delimiter="\n", ordering=fields[0]))
+
+
+def _get_user_fingerprint(opportunity_id: int) -> str | None:
+    # users have no modified date, the exports include their name, username and phone number
+    return OpportunityAccess.objects.filter(opportunity_id=opportunity_id).aggregate(
+        checksum=_checksum("user_id", "user__name", "user__username", "user__phone_number")
+    )["checksum"]
+
+
+def _get_deliver_unit_fingerprint(opportunity_id: int) -> str | None:
+    deliver_units = DeliverUnit.objects.filter(
+        app__in=Opportunity.objects.filter(pk=opportunity_id).values("deliver_app")
+    )
+    return deliver_units.aggregate(checksum=_checksum("id", "name", "slug"))["checksum"]
+
+
+def _get_access_fingerprint(opportunity_id: int) -> dict:
+    # accesses have no modified date, the exports depend on which users are accepted and not suspended
+    return OpportunityAccess.objects.filter(opportunity_id=opportunity_id, suspended=False).aggregate(
+        count=Count("id"), id_total=Sum("id"), accepted_id_total=Sum("id", filter=Q(accepted=True))
+    )
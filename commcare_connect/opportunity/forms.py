@@ -68,6 +68,8 @@ DOMAIN_PLACEHOLDER_CHOICE = ("", "Select an API key to load domains.")
 APP_PLACEHOLDER_CHOICE = ("", "Select an Application")
 API_KEY_PLACEHOLDER_CHOICE = ("", "Select a HQ Server to load API Keys.")
 
+EXPORT_FORMAT_CHOICES = (("csv", "CSV"), ("xlsx", "Excel"), ("parquet", "Parquet"))
+
 
 class HQApiKeyCreateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -877,7 +879,7 @@ class DateRanges(TextChoices):
 
 
 class VisitExportForm(forms.Form):
-    format = forms.ChoiceField(choices=(("csv", "CSV"), ("xlsx", "Excel")), initial="csv")
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES, initial="csv")
     from_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
     to_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
     status = forms.MultipleChoiceField(
@@ -966,7 +968,7 @@ class VisitExportForm(forms.Form):
 
 
 class PaymentExportForm(forms.Form):
-    format = forms.ChoiceField(choices=(("csv", "CSV"), ("xlsx", "Excel")), initial="csv")
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES, initial="csv")
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -38,6 +38,7 @@ from commcare_connect.opportunity.models import (
     OpportunityClaim,
     OpportunityClaimLimit,
     Payment,
+    PaymentAccruedLedger,
     UserInvite,
     UserInviteStatus,
     UserVisit,
@@ -176,10 +177,7 @@ def get_annotated_opportunity_access(opportunity: Opportunity):
                 filter=Q(opportunity_access__assessment__passed=True),
                 distinct=True,
             ),
-            completed_modules_count=Count(
-                "opportunity_access__completedmodule__module",
-                distinct=True,
-            ),
+            completed_modules_count=F("opportunity_access__learn_modules_completed"),
             job_claimed=Case(
                 When(
                     Q(opportunity_access__opportunityclaim__isnull=False),
@@ -344,16 +342,16 @@ def get_payment_report_data(opportunity: Opportunity, usd=False):
         "PaymentReportData", ["payment_unit", "approved", "user_payment_accrued", "nm_payment_accrued"]
     )
 
-    accrued_attr = "saved_payment_accrued_usd" if usd else "saved_payment_accrued"
-    org_accrued_attr = "saved_org_payment_accrued_usd" if usd else "saved_org_payment_accrued"
+    accrued_attr = "payment_accrued_usd" if usd else "payment_accrued"
+    org_accrued_attr = "org_payment_accrued_usd" if usd else "org_payment_accrued"
     report_data_qs = (
-        CompletedWork.objects.filter(
-            opportunity_access__opportunity=opportunity,
+        PaymentAccruedLedger.objects.filter(
+            opportunity=opportunity,
             status=CompletedWorkStatus.approved,
         )
         .values("payment_unit__name")
         .annotate(
-            approved=Count("id"),
+            approved=Sum("works"),
             user_payment_accrued=Sum(accrued_attr),
             nm_payment_accrued=Sum(org_accrued_attr),
         )
@@ -587,7 +585,7 @@ def get_worker_learn_table_data(opportunity):
     )
     queryset = OpportunityAccess.objects.filter(opportunity=opportunity, accepted=True).annotate(
         status=Subquery(UserInvite.objects.filter(opportunity_access=OuterRef("pk")).values("status")[:1]),
-        completed_modules_count=Count("completedmodule__module", distinct=True),
+        completed_modules_count=F("learn_modules_completed"),
         assesment_count=Count("assessment", distinct=True),
         learning_hours=Subquery(duration_subquery, output_field=DurationField()),
         modules_completed_percentage=Round(
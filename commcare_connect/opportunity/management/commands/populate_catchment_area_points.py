@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from commcare_connect.opportunity.models import CatchmentArea
+
+
+class Command(BaseCommand):
+    help = "Populates the point geometry of catchment areas from their latitude and longitude"
+
+    def add_arguments(self, parser, *args, **kwargs):
+        parser.add_argument("--opp", type=int)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        opp_id = options.get("opp")
+        batch_size = options["batch_size"]
+        filter_kwargs = {"opportunity": opp_id} if opp_id else {}
+        catchments = CatchmentArea.objects.filter(point__isnull=True, **filter_kwargs).only(
+            "id", "latitude", "longitude"
+        )
+
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(catchments.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for catchment in batch:
+                catchment.update_point()
+            CatchmentArea.objects.bulk_update(batch, ["point"])
+            updated += len(batch)
+            self.stdout.write(f"Updated {updated} catchment areas")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from commcare_connect.form_receiver.processor import _parse_xform_location
+from commcare_connect.opportunity.models import UserVisit
+
+
+class Command(BaseCommand):
+    help = "Populates location_point for user visits from the visit location"
+
+    def add_arguments(self, parser, *args, **kwargs):
+        parser.add_argument("--opp", type=int)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        opp_id = options.get("opp")
+        batch_size = options["batch_size"]
+        filter_kwargs = {"opportunity": opp_id} if opp_id else {}
+        user_visits = UserVisit.objects.filter(
+            location__isnull=False, location_point__isnull=True, **filter_kwargs
+        ).only("id", "location")
+
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(user_visits.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            to_update = []
+            for visit in batch:
+                visit.location_point = _parse_xform_location(visit.location)
+                if visit.location_point is not None:
+                    to_update.append(visit)
+            UserVisit.objects.bulk_update(to_update, ["location_point"])
+            updated += len(to_update)
+            self.stdout.write(f"Updated {updated} visits")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from commcare_connect.opportunity.models import Opportunity
+from commcare_connect.opportunity.utils.learn_progress import rebuild_learn_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the learn module counts of opportunity users from their completed modules"
+
+    def add_arguments(self, parser, *args, **kwargs):
+        parser.add_argument("--opp", type=int)
+
+    def handle(self, *args, **options):
+        opp_id = options.get("opp")
+        filter_kwargs = {"id": opp_id} if opp_id else {}
+        opportunities = Opportunity.objects.filter(**filter_kwargs).order_by("id")
+        for opportunity in opportunities.iterator():
+            count = rebuild_learn_progress(opportunity)
+            self.stdout.write(f"Rebuilt learn progress for {count} users in opportunity {opportunity.id}")
+        self.stdout.write(self.style.SUCCESS("Learn progress rebuilt"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from commcare_connect.opportunity.models import Opportunity, OpportunityAccess
+from commcare_connect.opportunity.utils.payment_ledger import refresh_payment_ledger
+from commcare_connect.utils.itertools import batched
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the payment accrued ledger of opportunity users from their completed work"
+
+    def add_arguments(self, parser, *args, **kwargs):
+        parser.add_argument("--opp", type=int)
+
+    def handle(self, *args, **options):
+        opp_id = options.get("opp")
+        filter_kwargs = {"id": opp_id} if opp_id else {}
+        opportunities = Opportunity.objects.filter(**filter_kwargs).order_by("id")
+        for opportunity in opportunities.iterator():
+            access_ids = OpportunityAccess.objects.filter(opportunity=opportunity).order_by("id")
+            count = 0
+            for batch in batched(access_ids.values_list("id", flat=True).iterator(), 500):
+                refresh_payment_ledger(batch)
+                count += len(batch)
+            self.stdout.write(f"Rebuilt payment ledger for {count} users in opportunity {opportunity.id}")
+        self.stdout.write(self.style.SUCCESS("Payment ledger rebuilt"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from commcare_connect.opportunity.models import OpportunityAccess
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the visit counters used for visit limits from the user visits"
+
+    def add_arguments(self, parser, *args, **kwargs):
+        parser.add_argument("--opp", type=int)
+
+    def handle(self, *args, **options):
+        opp_id = options.get("opp")
+        filter_kwargs = {"opportunity": opp_id} if opp_id else {}
+        access_objects = OpportunityAccess.objects.filter(**filter_kwargs).order_by("id")
+        for count, access in enumerate(access_objects.iterator(), start=1):
+            rebuild_visit_counters(access)
+            if count % 1000 == 0:
+                self.stdout.write(f"Rebuilt visit counters for {count} users")
+        self.stdout.write(self.style.SUCCESS("Visit counters rebuilt"))
@@ -0,0 +1,16 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0135_opportunity_archived"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uservisit",
+            name="location_point",
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,16 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0136_uservisit_location_point"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="catchmentarea",
+            name="point",
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0137_catchmentarea_point"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserVisitCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "counter_type",
+                    models.CharField(
+                        choices=[("total", "Total"), ("daily", "Daily"), ("entity", "Entity")], max_length=10
+                    ),
+                ),
+                ("key", models.CharField(blank=True, max_length=255)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "deliver_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="opportunity.deliverunit"
+                    ),
+                ),
+                (
+                    "opportunity_access",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="opportunity.opportunityaccess"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("opportunity_access", "deliver_unit", "counter_type", "key"),
+                        name="unique_user_visit_counter",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+from django_celery_beat.models import CrontabSchedule, PeriodicTask
+
+
+def create_stale_payment_accrued_periodic_task(apps, schema_editor):
+    schedule, _ = CrontabSchedule.objects.get_or_create(
+        minute="*/10",
+        hour="*",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+    )
+    PeriodicTask.objects.update_or_create(
+        name="update_stale_pending_payment_accrued",
+        defaults={
+            "crontab": schedule,
+            "task": "commcare_connect.opportunity.tasks.update_stale_pending_payment_accrued",
+        },
+    )
+
+
+def delete_stale_payment_accrued_periodic_task(apps, schema_editor):
+    PeriodicTask.objects.filter(name="update_stale_pending_payment_accrued").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0138_uservisitcounter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="opportunityaccess",
+            name="payment_accrual_pending_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            create_stale_payment_accrued_periodic_task,
+            delete_stale_payment_accrued_periodic_task,
+            hints={"run_on_secondary": False},
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_learn_module_counts(apps, schema_editor):
+    Opportunity = apps.get_model("opportunity", "Opportunity")
+    OpportunityAccess = apps.get_model("opportunity", "OpportunityAccess")
+    LearnModule = apps.get_model("opportunity", "LearnModule")
+    CompletedModule = apps.get_model("opportunity", "CompletedModule")
+
+    modules_completed = (
+        CompletedModule.objects.filter(opportunity_access_id=OuterRef("pk"))
+        .values("opportunity_access_id")
+        .annotate(count=Count("module_id", distinct=True))
+        .values("count")
+    )
+    for opportunity in Opportunity.objects.only("id", "learn_app_id").iterator():
+        total = LearnModule.objects.filter(app_id=opportunity.learn_app_id).count()
+        OpportunityAccess.objects.filter(opportunity_id=opportunity.id).update(
+            learn_modules_total=total,
+            learn_modules_completed=Coalesce(Subquery(modules_completed), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0139_opportunityaccess_payment_accrual_pending_since"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="opportunityaccess",
+            name="learn_modules_completed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="opportunityaccess",
+            name="learn_modules_total",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            populate_learn_module_counts, migrations.RunPython.noop, hints={"run_on_secondary": False}
+        ),
+    ]
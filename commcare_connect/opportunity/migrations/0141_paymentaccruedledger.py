@@ -0,0 +1,105 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_payment_accrued_ledger(apps, schema_editor):
+    Opportunity = apps.get_model("opportunity", "Opportunity")
+    CompletedWork = apps.get_model("opportunity", "CompletedWork")
+    PaymentAccruedLedger = apps.get_model("opportunity", "PaymentAccruedLedger")
+
+    for opportunity in Opportunity.objects.only("id", "currency_id").iterator():
+        totals = (
+            CompletedWork.objects.filter(opportunity_access__opportunity_id=opportunity.id)
+            .annotate(month=TruncMonth("status_modified_date", output_field=DateField()))
+            .values("opportunity_access_id", "payment_unit_id", "status", "invoice_id", "month")
+            .annotate(
+                works=Count("id"),
+                approved_count=Sum("saved_approved_count"),
+                payment_accrued=Sum("saved_payment_accrued"),
+                payment_accrued_usd=Sum("saved_payment_accrued_usd"),
+                org_payment_accrued=Sum("saved_org_payment_accrued"),
+                org_payment_accrued_usd=Sum("saved_org_payment_accrued_usd"),
+            )
+            .order_by()
+        )
+        PaymentAccruedLedger.objects.bulk_create(
+            [
+                PaymentAccruedLedger(opportunity_id=opportunity.id, currency_id=opportunity.currency_id, **row)
+                for row in totals
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0140_opportunityaccess_learn_modules"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentAccruedLedger",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField(null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("approved", "Approved"),
+                            ("rejected", "Rejected"),
+                            ("over_limit", "Over Limit"),
+                            ("incomplete", "Incomplete"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("works", models.IntegerField(default=0)),
+                ("approved_count", models.IntegerField(default=0)),
+                ("payment_accrued", models.IntegerField(default=0)),
+                ("payment_accrued_usd", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("org_payment_accrued", models.IntegerField(default=0)),
+                ("org_payment_accrued_usd", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                (
+                    "currency",
+                    models.ForeignKey(
+                        null=True, on_delete=django.db.models.deletion.PROTECT, to="opportunity.currency"
+                    ),
+                ),
+                (
+                    "invoice",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="opportunity.paymentinvoice",
+                    ),
+                ),
+                (
+                    "opportunity",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="opportunity.opportunity"),
+                ),
+                (
+                    "opportunity_access",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="opportunity.opportunityaccess"
+                    ),
+                ),
+                (
+                    "payment_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.DO_NOTHING, to="opportunity.paymentunit"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["opportunity", "status"], name="opportunity_opportu_64e319_idx")],
+            },
+        ),
+        migrations.RunPython(
+            populate_payment_accrued_ledger, migrations.RunPython.noop, hints={"run_on_secondary": False}
+        ),
+    ]
@@ -0,0 +1,88 @@
+import django.utils.timezone
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("opportunity", "0141_paymentaccruedledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="date_modified",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="paymentinvoice",
+            name="date_modified",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="uservisit",
+            name="date_modified",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="completedwork",
+            trigger=pgtrigger.compiler.Trigger(
+                name="set_last_modified",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='NEW."last_modified" = clock_timestamp(); RETURN NEW;',
+                    hash="462abc9b6dc2902c6539c81b58a46cd9882d7fc4",
+                    operation="UPDATE",
+                    pgid="pgtrigger_set_last_modified_e715e",
+                    table="opportunity_completedwork",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="payment",
+            trigger=pgtrigger.compiler.Trigger(
+                name="set_date_modified",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='NEW."date_modified" = clock_timestamp(); RETURN NEW;',
+                    hash="70ef508c73a4ffca89b02affe88bc51bd0f56e3c",
+                    operation="UPDATE",
+                    pgid="pgtrigger_set_date_modified_aed6c",
+                    table="opportunity_payment",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="paymentinvoice",
+            trigger=pgtrigger.compiler.Trigger(
+                name="set_date_modified",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='NEW."date_modified" = clock_timestamp(); RETURN NEW;',
+                    hash="4fe643e51a3cfbbc0de72f05fa9cea1f12d922d9",
+                    operation="UPDATE",
+                    pgid="pgtrigger_set_date_modified_0b94a",
+                    table="opportunity_paymentinvoice",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="uservisit",
+            trigger=pgtrigger.compiler.Trigger(
+                name="set_date_modified",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='NEW."date_modified" = clock_timestamp(); RETURN NEW;',
+                    hash="4e33ef906b859e6c30ae21930747cf2cd04fa310",
+                    operation="UPDATE",
+                    pgid="pgtrigger_set_date_modified_58d80",
+                    table="opportunity_uservisit",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("opportunity", "0142_date_modified_triggers"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="completedwork",
+            index=models.Index(fields=["last_modified", "id"], name="opportunity_last_mo_fe83a7_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(fields=["date_modified", "id"], name="opportunity_date_mo_b83bbf_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="paymentinvoice",
+            index=models.Index(fields=["opportunity", "date_modified", "id"], name="opportunity_opportu_e295d0_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="uservisit",
+            index=models.Index(fields=["opportunity", "date_modified", "id"], name="opportunity_opportu_00195f_idx"),
+        ),
+    ]
@@ -6,6 +6,8 @@ from decimal import Decimal
 from uuid import uuid4
 
 import pghistory
+from django.contrib.gis.db import models as geo_models
+from django.contrib.gis.geos import Point
 from django.core.validators import MinValueValidator
 from django.db import IntegrityError, models, transaction
 from django.db.models import Count, F, Q, Sum
@@ -18,7 +20,7 @@ from commcare_connect.commcarehq.models import HQServer
 from commcare_connect.opportunity.exceptions import ListTooLongError, TaskAlreadyAssignedError
 from commcare_connect.organization.models import Organization
 from commcare_connect.users.models import User, UserCredential
-from commcare_connect.utils.db import BaseModel, slugify_uniquely
+from commcare_connect.utils.db import BaseModel, set_modified_trigger, slugify_uniquely
 
 
 class CommCareApp(BaseModel):
@@ -299,6 +301,12 @@ class OpportunityAccess(models.Model):
     invited_date = models.DateTimeField(auto_now_add=True, editable=False, null=True)
     completed_learn_date = models.DateTimeField(null=True)
     last_active = models.DateTimeField(null=True)
+    # set while a deferred recalculation of payment_accrued is waiting to run
+    payment_accrual_pending_since = models.DateTimeField(null=True, blank=True)
+    # number of learn modules in the learn app and distinct modules completed by the user,
+    # kept up to date by form processing, module syncs and the rebuild_learn_progress command
+    learn_modules_total = models.PositiveIntegerField(default=0)
+    learn_modules_completed = models.PositiveIntegerField(default=0)
 
     class Meta:
         indexes = [
@@ -307,15 +315,18 @@ class OpportunityAccess(models.Model):
         ]
         unique_together = ("user", "opportunity")
 
-    # TODO: Convert to a field and calculate this property CompletedModule is saved
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if not self.learn_modules_total:
+                learn_app_id = Opportunity.objects.filter(pk=self.opportunity_id).values("learn_app_id")
+                self.learn_modules_total = LearnModule.objects.filter(app_id__in=learn_app_id).count()
+        super().save(*args, **kwargs)
+
     @property
     def learn_progress(self):
-        learn_modules = LearnModule.objects.filter(app=self.opportunity.learn_app)
-        learn_modules_count = learn_modules.count()
-        if learn_modules_count <= 0:
+        if self.learn_modules_total <= 0:
             return 0
-        completed_modules = self.unique_completed_modules.count()
-        percentage = (completed_modules / learn_modules_count) * 100
+        percentage = (min(self.learn_modules_completed, self.learn_modules_total) / self.learn_modules_total) * 100
         return round(percentage, 2)
 
     @property
@@ -594,14 +605,9 @@ class ExchangeRate(models.Model):
 
     @classmethod
     def latest_exchange_rate(cls, currency_code, date):
-        from commcare_connect.opportunity.tasks import fetch_exchange_rates
+        from commcare_connect.opportunity.exchange_rates import get_exchange_rate_record
 
-        latest_rates = cls.objects.filter(currency_code=currency_code, rate_date__lte=date).order_by("-rate_date")
-        if latest_rates:
-            return latest_rates.first()
-        else:
-            date = date.replace(day=1)
-            return fetch_exchange_rates(date, currency_code)
+        return get_exchange_rate_record(currency_code, date)
 
 
 class InvoiceStatus(models.TextChoices):
@@ -644,9 +650,14 @@ class PaymentInvoice(models.Model):
     status = models.CharField(choices=InvoiceStatus.choices, default=InvoiceStatus.PENDING_NM_REVIEW, max_length=50)
     archived_date = models.DateTimeField(null=True, blank=True)
     invoice_ticket_link = models.URLField(null=True, blank=True)
+    date_modified = models.DateTimeField(default=now)
 
     class Meta:
         unique_together = ("opportunity", "invoice_number")
+        indexes = [
+            models.Index(fields=["opportunity", "date_modified", "id"]),
+        ]
+        triggers = [set_modified_trigger("date_modified")]
 
     @property
     def invoice_type(self):
@@ -662,7 +673,13 @@ class PaymentInvoice(models.Model):
         return InvoiceStatus.get_label(self.status)
 
     def unlink_completed_works(self):
-        CompletedWork.objects.filter(invoice=self).update(invoice=None)
+        from commcare_connect.opportunity.utils.payment_ledger import refresh_payment_ledger
+
+        completed_works = CompletedWork.objects.filter(invoice=self)
+        with transaction.atomic():
+            access_ids = set(completed_works.values_list("opportunity_access_id", flat=True))
+            completed_works.update(invoice=None)
+            refresh_payment_ledger(access_ids)
 
 
 class Payment(models.Model):
@@ -687,6 +704,13 @@ class Payment(models.Model):
     invoice = models.OneToOneField(PaymentInvoice, on_delete=models.DO_NOTHING, null=True, blank=True)
     payment_method = models.CharField(max_length=50, null=True, blank=True)
     payment_operator = models.CharField(max_length=50, null=True, blank=True)
+    date_modified = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_modified", "id"]),
+        ]
+        triggers = [set_modified_trigger("date_modified")]
 
 
 class CompletedWorkStatus(models.TextChoices):
@@ -731,6 +755,10 @@ class CompletedWork(models.Model):
 
     class Meta:
         unique_together = ("opportunity_access", "entity_id", "payment_unit")
+        indexes = [
+            models.Index(fields=["last_modified", "id"]),
+        ]
+        triggers = [set_modified_trigger("last_modified")]
 
     def __init__(self, *args, **kwargs):
         self.status = CompletedWorkStatus.incomplete
@@ -743,15 +771,24 @@ class CompletedWork(models.Model):
                 self.status_modified_date = now()
         super().__setattr__(name, value)
 
-    # TODO: add caching on this property
     @property
     def completed_count(self):
         """Returns the no of completion of this work. Includes duplicate submissions."""
+        from commcare_connect.opportunity.utils.payment_unit_hierarchy import get_payment_unit_hierarchy
+
+        hierarchy = get_payment_unit_hierarchy()
+        if hierarchy is not None:
+            return hierarchy.completed_count(self)
         visits = self.uservisit_set.values_list("deliver_unit_id", flat=True)
         return self.calculate_completed(visits)
 
     @property
     def approved_count(self):
+        from commcare_connect.opportunity.utils.payment_unit_hierarchy import get_payment_unit_hierarchy
+
+        hierarchy = get_payment_unit_hierarchy()
+        if hierarchy is not None:
+            return hierarchy.approved_count(self)
         qs = self.uservisit_set.filter(status=VisitValidationStatus.approved, review_status=VisitReviewStatus.agree)
         visits = qs.values_list("deliver_unit_id", flat=True)
         return self.calculate_completed(visits, approved=True)
@@ -825,6 +862,35 @@ class CompletedWork(models.Model):
         return visit.visit_date if visit else None
 
 
+class PaymentAccruedLedger(models.Model):
+    """Totals of the saved counts and payments of the CompletedWork of a user, by payment unit,
+    month of the last status change, currency, status and invoice.
+
+    The rows of a user are rebuilt from their CompletedWork by ``refresh_payment_ledger`` whenever
+    the saved fields or invoices of the works change, so reports can read the totals without
+    scanning CompletedWork.
+    """
+
+    opportunity = models.ForeignKey(Opportunity, on_delete=models.CASCADE)
+    opportunity_access = models.ForeignKey(OpportunityAccess, on_delete=models.CASCADE)
+    payment_unit = models.ForeignKey(PaymentUnit, on_delete=models.DO_NOTHING)
+    month = models.DateField(null=True)
+    currency = models.ForeignKey(Currency, on_delete=models.PROTECT, null=True)
+    status = models.CharField(max_length=50, choices=CompletedWorkStatus.choices)
+    invoice = models.ForeignKey(PaymentInvoice, on_delete=models.SET_NULL, null=True, blank=True)
+    works = models.IntegerField(default=0)
+    approved_count = models.IntegerField(default=0)
+    payment_accrued = models.IntegerField(default=0)
+    payment_accrued_usd = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    org_payment_accrued = models.IntegerField(default=0)
+    org_payment_accrued_usd = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["opportunity", "status"]),
+        ]
+
+
 class VisitReviewStatus(models.TextChoices):
     pending = "pending", gettext("Pending Review")
     agree = "agree", gettext("Agree")
@@ -852,6 +918,8 @@ class UserVisit(XFormBaseModel):
     form_json = models.JSONField()
     reason = models.CharField(max_length=300, null=True, blank=True)
     location = models.CharField(null=True)
+    # parsed from `location`, used for proximity checks between visits
+    location_point = geo_models.PointField(geography=True, null=True, blank=True)
     flagged = models.BooleanField(default=False)
     flag_reason = models.JSONField(null=True, blank=True)
     completed_work = models.ForeignKey(CompletedWork, on_delete=models.DO_NOTHING, null=True, blank=True)
@@ -868,6 +936,7 @@ class UserVisit(XFormBaseModel):
     review_created_on = models.DateTimeField(blank=True, null=True)
     justification = models.CharField(max_length=300, null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    date_modified = models.DateTimeField(default=now)
 
     def __init__(self, *args, **kwargs):
         self.status = VisitValidationStatus.pending
@@ -919,7 +988,9 @@ class UserVisit(XFormBaseModel):
         ]
         indexes = [
             models.Index(fields=["opportunity", "status"]),
+            models.Index(fields=["opportunity", "date_modified", "id"]),
         ]
+        triggers = [set_modified_trigger("date_modified")]
 
 
 class OpportunityClaim(models.Model):
@@ -930,6 +1001,33 @@ class OpportunityClaim(models.Model):
     date_claimed = models.DateField(auto_now_add=True)
 
 
+class VisitCounterType(models.TextChoices):
+    TOTAL = "total", gettext_lazy("Total")
+    DAILY = "daily", gettext_lazy("Daily")
+    ENTITY = "entity", gettext_lazy("Entity")
+
+
+class UserVisitCounter(models.Model):
+    """Number of visits counted towards the limits of a user and deliver unit.
+
+    Visits with the over limit or trial status are not counted. The key is empty for the
+    total count, the visit date for daily counts and the entity id for entity counts."""
+
+    opportunity_access = models.ForeignKey(OpportunityAccess, on_delete=models.CASCADE)
+    deliver_unit = models.ForeignKey(DeliverUnit, on_delete=models.CASCADE)
+    counter_type = models.CharField(max_length=10, choices=VisitCounterType.choices)
+    key = models.CharField(max_length=255, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["opportunity_access", "deliver_unit", "counter_type", "key"],
+                name="unique_user_visit_counter",
+            )
+        ]
+
+
 class OpportunityClaimLimit(models.Model):
     opportunity_claim = models.ForeignKey(OpportunityClaim, on_delete=models.CASCADE)
     payment_unit = models.ForeignKey(PaymentUnit, on_delete=models.CASCADE)
@@ -1044,10 +1142,19 @@ class CatchmentArea(models.Model):
     active = models.BooleanField(default=True)
     name = models.CharField(max_length=255)
     site_code = models.SlugField(max_length=255)
+    # centre of the area, kept in sync with latitude / longitude for spatial queries
+    point = geo_models.PointField(geography=True, null=True, blank=True)
 
     class Meta:
         unique_together = ("site_code", "opportunity")
 
+    def save(self, *args, **kwargs):
+        self.update_point()
+        super().save(*args, **kwargs)
+
+    def update_point(self):
+        self.point = Point(float(self.longitude), float(self.latitude), srid=4326)
+
 
 class CredentialConfiguration(models.Model):
     opportunity = models.ForeignKey(
@@ -0,0 +1,104 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from commcare_connect.opportunity.app_units import invalidate_app_units
+from commcare_connect.opportunity.exchange_rates import invalidate_exchange_rates
+from commcare_connect.opportunity.models import (
+    CompletedModule,
+    CompletedWork,
+    DeliverUnit,
+    DeliverUnitFlagRules,
+    ExchangeRate,
+    FormJsonValidationRules,
+    LearnModule,
+    Opportunity,
+    OpportunityVerificationFlags,
+    UserVisit,
+)
+from commcare_connect.opportunity.utils.learn_progress import (
+    refresh_learn_modules_completed,
+    update_learn_modules_total,
+)
+from commcare_connect.opportunity.utils.payment_ledger import refresh_payment_ledger
+from commcare_connect.opportunity.utils.visit_counters import decrement_visit_counters
+from commcare_connect.opportunity.verification_rules import invalidate_verification_rules
+
+
+@receiver(post_save, sender=OpportunityVerificationFlags)
+@receiver(post_delete, sender=OpportunityVerificationFlags)
+@receiver(post_save, sender=DeliverUnitFlagRules)
+@receiver(post_delete, sender=DeliverUnitFlagRules)
+@receiver(post_save, sender=FormJsonValidationRules)
+@receiver(post_delete, sender=FormJsonValidationRules)
+def invalidate_verification_rules_on_change(sender, instance, **kwargs):
+    invalidate_verification_rules(instance.opportunity_id)
+
+
+@receiver(m2m_changed, sender=FormJsonValidationRules.deliver_unit.through)
+def invalidate_verification_rules_on_deliver_unit_change(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # changed from the deliver unit side, so any opportunity using its app may be affected
+        opportunity_ids = Opportunity.objects.filter(deliver_app_id=instance.app_id).values_list("id", flat=True)
+    else:
+        opportunity_ids = [instance.opportunity_id]
+    for opportunity_id in opportunity_ids:
+        invalidate_verification_rules(opportunity_id)
+
+
+@receiver(post_save, sender=DeliverUnit)
+@receiver(post_delete, sender=DeliverUnit)
+@receiver(post_save, sender=LearnModule)
+@receiver(post_delete, sender=LearnModule)
+def invalidate_app_units_on_change(sender, instance, **kwargs):
+    invalidate_app_units(instance.app_id)
+
+
+@receiver(post_save, sender=LearnModule)
+@receiver(post_delete, sender=LearnModule)
+def update_learn_modules_total_on_change(sender, instance, created=False, **kwargs):
+    if kwargs["signal"] is post_save and not created:
+        return
+    update_learn_modules_total(instance.app_id)
+
+
+@receiver(post_save, sender=CompletedModule)
+@receiver(post_delete, sender=CompletedModule)
+def refresh_learn_modules_completed_on_change(sender, instance, **kwargs):
+    # completed modules from forms are bulk created and counted by the form processor
+    if instance.opportunity_access_id:
+        refresh_learn_modules_completed(instance.opportunity_access_id)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_exchange_rates_on_change(sender, instance, **kwargs):
+    invalidate_exchange_rates(instance.currency_code)
+
+
+LEDGER_SOURCE_FIELDS = {
+    "status",
+    "status_modified_date",
+    "invoice",
+    "saved_approved_count",
+    "saved_payment_accrued",
+    "saved_payment_accrued_usd",
+    "saved_org_payment_accrued",
+    "saved_org_payment_accrued_usd",
+}
+
+
+@receiver(post_save, sender=CompletedWork)
+@receiver(post_delete, sender=CompletedWork)
+def refresh_payment_ledger_on_change(sender, instance, update_fields=None, **kwargs):
+    # bulk updates of the saved fields refresh the ledger themselves
+    if update_fields is not None and not LEDGER_SOURCE_FIELDS.intersection(update_fields):
+        return
+    refresh_payment_ledger([instance.opportunity_access_id], [instance.payment_unit_id])
+
+
+@receiver(post_delete, sender=UserVisit)
+def decrement_visit_counters_on_delete(sender, instance, **kwargs):
+    # covers every delete path, e.g. the delete_duplicate_visits command
+    decrement_visit_counters(instance)
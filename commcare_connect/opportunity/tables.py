@@ -1217,6 +1217,15 @@ class WorkerPaymentsTable(tables.Table):
         )
         order_by = ("-last_active",)
 
+    def render_payment_accrued(self, record, value):
+        if record.payment_accrual_pending_since is None:
+            return value
+        return format_html(
+            '{} <i class="fa-solid fa-rotate text-slate-400" x-data x-tooltip.raw="{}"></i>',
+            value,
+            _("Pending recalculation"),
+        )
+
     def render_last_paid(self, record, value):
         return render_to_string(
             "components/worker_page/last_paid.html",
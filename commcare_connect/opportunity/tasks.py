@@ -1,15 +1,19 @@
 import datetime
 import logging
+import tempfile
+import uuid
+from contextlib import ExitStack
 from decimal import Decimal
 
 import httpx
 import pghistory
 import sentry_sdk
 from allauth.utils import build_absolute_uri
+from celery import chord, group
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 from django.db import transaction
@@ -24,9 +28,19 @@ from tablib import Dataset
 from commcare_connect.cache import quickcache
 from commcare_connect.connect_id_client import fetch_users, send_message, send_message_bulk
 from commcare_connect.connect_id_client.models import ConnectIdUser, Message
+from commcare_connect.form_receiver.routing import invalidate_routing_table
 from commcare_connect.microplanning.models import WorkAreaInaccessibilityRequest
+from commcare_connect.opportunity.app_units import warm_app_units
 from commcare_connect.opportunity.app_xml import get_connect_blocks_for_app, get_deliver_units_for_app
+from commcare_connect.opportunity.bulk_approval import (
+    COMPLETED,
+    FAILED,
+    SKIPPED,
+    plan_bulk_approval,
+    record_chunk_progress,
+)
 from commcare_connect.opportunity.deletion import delete_opportunity
+from commcare_connect.opportunity.exchange_rates import exchange_rate_memo
 from commcare_connect.opportunity.export import (
     UserVisitExporter,
     export_catchment_area_table,
@@ -35,11 +49,22 @@ from commcare_connect.opportunity.export import (
     export_user_status_table,
     export_user_visit_review_data,
     export_work_status_table,
+    join_export_parts,
+)
+from commcare_connect.opportunity.export_cache import (
+    PAYMENT_EXPORT,
+    REVIEW_VISIT_EXPORT,
+    VISIT_EXPORT,
+    WORK_STATUS_EXPORT,
+    get_cached_export,
+    get_or_generate_export,
+    set_cached_export,
 )
 from commcare_connect.opportunity.models import (
     Assessment,
     AssignedTask,
     BlobMeta,
+    CompletedWork,
     CompletedWorkStatus,
     DeliverUnit,
     ExchangeRate,
@@ -57,16 +82,21 @@ from commcare_connect.opportunity.models import (
     VisitValidationStatus,
 )
 from commcare_connect.opportunity.utils.completed_work import (
-    get_uninvoiced_visit_items,
-    link_invoice_to_completed_works,
+    get_invoice_items_from_records,
+    link_service_delivery_invoices,
+    update_opportunity_status,
+    update_payment_accrued_for_user,
     update_status,
 )
-from commcare_connect.opportunity.utils.invoice import generate_invoice_number, get_start_date_for_invoice
+from commcare_connect.opportunity.utils.invoice import generate_invoice_number
+from commcare_connect.opportunity.utils.payment_ledger import get_ledger_uninvoiced_rows_by_opportunity
 from commcare_connect.users.models import User
 from commcare_connect.users.user_credentials import UserCredentialIssuer
 from commcare_connect.utils.analytics import Event, GATrackingInfo, _serialize_events, send_event_task
 from commcare_connect.utils.celery import set_task_progress
 from commcare_connect.utils.datetime import get_end_date_previous_month, is_date_before
+from commcare_connect.utils.itertools import batched
+from commcare_connect.utils.parquet import dataset_to_parquet
 from commcare_connect.utils.sms import send_sms
 from config import celery_app
 
@@ -76,6 +106,10 @@ OPPORTUNITY_AUTO_DEACTIVATION_DAYS = 30
 OPPORTUNITY_AUTO_ARCHIVE_DAYS = 30
 SYSTEM = "system"
 
+# formats of visit exports that can be generated in parts and joined
+PARTITIONED_EXPORT_FORMATS = ("csv", "parquet")
+VISIT_EXPORT_PROGRESS_TIMEOUT = 60 * 60 * 24
+
 
 def sync_learn_modules_and_deliver_units(opportunity):
     """Fetch learn modules and deliver units from CommCare HQ and upsert them for the opportunity's apps."""
@@ -98,6 +132,9 @@ def sync_learn_modules_and_deliver_units(opportunity):
     for block in deliver_app_connect_blocks:
         DeliverUnit.objects.get_or_create(app=deliver_app, slug=block.id, defaults=dict(name=block.name))
 
+    warm_app_units(learn_app)
+    warm_app_units(deliver_app)
+
 
 @celery_app.task()
 def create_learn_modules_and_deliver_units(opportunity_id):
@@ -194,18 +231,111 @@ def delete_stale_opportunities():
     logger.info("Deleted %s stale opportunities created before %s", count, cutoff)
 
 
-@celery_app.task()
+@celery_app.task(bind=True)
 def generate_visit_export(
-    opportunity_id: int, from_date, to_date, status: list[str], export_format: str, flatten: bool
+    self, opportunity_id: int, from_date, to_date, status: list[str], export_format: str, flatten: bool
 ):
     opportunity = Opportunity.objects.get(id=opportunity_id)
     logger.info(
         f"Export for {opportunity.name} with date range from {from_date} to {to_date} and status {','.join(status)}"
     )
+    options = {"from_date": from_date, "to_date": to_date, "status": sorted(status), "flatten": flatten}
+    cache_key, file_name = get_cached_export(VISIT_EXPORT, opportunity_id, {**options, "format": export_format})
+    if file_name:
+        return file_name
+
     exporter = UserVisitExporter(opportunity, flatten)
-    dataset = exporter.get_dataset(from_date, to_date, [VisitValidationStatus(s) for s in status])
+    visit_status = [VisitValidationStatus(s) for s in status]
     export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_visit_export.{export_format}"
-    return save_export(dataset, export_tmp_name, export_format)
+    partitions = [None]
+    if export_format in PARTITIONED_EXPORT_FORMATS:
+        partitions = exporter.get_partitions(from_date, to_date, visit_status, settings.VISIT_EXPORT_PARTITION_SIZE)
+    if len(partitions) > 1:
+        set_task_progress(self, f"Exporting visits in {len(partitions)} parts")
+        export = {**options, "export_format": export_format}
+        return self.replace(
+            get_visit_export_parts_chord(
+                self.request.id, opportunity_id, export, partitions, export_tmp_name, cache_key
+            )
+        )
+
+    # large exports are spooled to disk and uploaded in parts rather than built in memory
+    with tempfile.TemporaryFile() as export_file:
+        exporter.write_export(export_file, export_format, from_date, to_date, visit_status)
+        file_name = save_export_file(export_file, export_tmp_name)
+    set_cached_export(cache_key, file_name)
+    return file_name
+
+
+def get_visit_export_parts_chord(
+    export_task_id: str, opportunity_id: int, export: dict, partitions: list[dict], export_name: str, cache_key: str
+):
+    """Chord that generates the partitions of a visit export on separate workers and joins them. It replaces
+    the export task and its tasks write to the id of that task, so each takes the opportunity id checked by
+    the export views: first for the parts, and as a keyword for the join, whose first argument is the parts."""
+    return chord(
+        group(
+            generate_visit_export_part.s(
+                opportunity_id, export_task_id, export, partition, f"{export_name}.part{index}", len(partitions)
+            )
+            for index, partition in enumerate(partitions)
+        ),
+        join_visit_export_parts.s(export_name, export["export_format"], cache_key, opportunity_id=opportunity_id),
+    )
+
+
+@celery_app.task(bind=True)
+def generate_visit_export_part(
+    self,
+    opportunity_id: int,
+    export_task_id: str,
+    export: dict,
+    partition: dict,
+    part_name: str,
+    part_count: int,
+):
+    opportunity = Opportunity.objects.get(id=opportunity_id)
+    exporter = UserVisitExporter(opportunity, export["flatten"])
+    visit_status = [VisitValidationStatus(s) for s in export["status"]]
+    with tempfile.TemporaryFile() as part_file:
+        exporter.write_export(
+            part_file, export["export_format"], export["from_date"], export["to_date"], visit_status, partition
+        )
+        part_name = save_export_file(part_file, part_name)
+
+    completed = _record_visit_export_part(export_task_id)
+    if completed:
+        set_task_progress(self, f"Exported {completed} of {part_count} parts of the visits", task_id=export_task_id)
+    return part_name
+
+
+@celery_app.task()
+def join_visit_export_parts(
+    part_names: list[str], export_name: str, export_format: str, cache_key: str, *, opportunity_id: int
+):
+    from commcare_connect.utils.storages import ExportS3Boto3Storage
+
+    logger.info(f"Joining {len(part_names)} parts of the visit export of opportunity {opportunity_id}")
+    storage = ExportS3Boto3Storage()
+    with tempfile.TemporaryFile() as export_file, ExitStack() as stack:
+        part_files = [stack.enter_context(storage.open(part_name)) for part_name in part_names]
+        join_export_parts(export_file, export_format, part_files)
+        file_name = save_export_file(export_file, export_name)
+    for part_name in part_names:
+        storage.delete(part_name)
+    set_cached_export(cache_key, file_name)
+    return file_name
+
+
+def _record_visit_export_part(export_task_id: str) -> int | None:
+    """Count a completed part of a visit export, returning the number of completed parts."""
+    key = f"visit_export_parts:{export_task_id}"
+    cache.add(key, 0, VISIT_EXPORT_PROGRESS_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # the counter expired or the cache is unavailable
+        return None
 
 
 @celery_app.task()
@@ -215,17 +345,28 @@ def generate_review_visit_export(opportunity_id: int, from_date, to_date, status
         f"""Export review visit for {opportunity.name} with date
         from {from_date} to {to_date} and status {",".join(status)}"""
     )
-    dataset = export_user_visit_review_data(opportunity, from_date, to_date, [VisitReviewStatus(s) for s in status])
-    export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_review_visit_export.{export_format}"
-    return save_export(dataset, export_tmp_name, export_format)
+
+    def generate():
+        dataset = export_user_visit_review_data(
+            opportunity, from_date, to_date, [VisitReviewStatus(s) for s in status]
+        )
+        export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_review_visit_export.{export_format}"
+        return save_export(dataset, export_tmp_name, export_format)
+
+    options = {"from_date": from_date, "to_date": to_date, "status": sorted(status), "format": export_format}
+    return get_or_generate_export(REVIEW_VISIT_EXPORT, opportunity_id, options, generate)
 
 
 @celery_app.task()
 def generate_payment_export(opportunity_id: int, export_format: str):
     opportunity = Opportunity.objects.get(id=opportunity_id)
-    dataset = export_empty_payment_table(opportunity)
-    export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_payment_export.{export_format}"
-    return save_export(dataset, export_tmp_name, export_format)
+
+    def generate():
+        dataset = export_empty_payment_table(opportunity)
+        export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_payment_export.{export_format}"
+        return save_export(dataset, export_tmp_name, export_format)
+
+    return get_or_generate_export(PAYMENT_EXPORT, opportunity_id, {"format": export_format}, generate)
 
 
 @celery_app.task()
@@ -247,12 +388,24 @@ def generate_deliver_status_export(opportunity_id: int, export_format: str):
 def save_export(dataset: Dataset, file_name: str, export_format: str):
     from commcare_connect.utils.storages import ExportS3Boto3Storage
 
-    content = dataset.export(export_format)
+    if export_format == "parquet":
+        content = dataset_to_parquet(dataset)
+    else:
+        content = dataset.export(export_format)
     if isinstance(content, str):
         content = content.encode()
     return ExportS3Boto3Storage().save(file_name, ContentFile(content))
 
 
+def save_export_file(export_file, file_name: str):
+    """Upload an export written to ``export_file``. The storage streams the file, using a multipart
+    upload for large files."""
+    from commcare_connect.utils.storages import ExportS3Boto3Storage
+
+    export_file.seek(0)
+    return ExportS3Boto3Storage().save(file_name, File(export_file, name=file_name))
+
+
 @celery_app.task()
 def send_notification_inactive_users():
     opportunity_accesses = OpportunityAccess.objects.filter(
@@ -275,6 +428,8 @@ def auto_deactivate_ended_opportunities():
     action = f"{__name__}.auto_deactivate_ended_opportunities"
     with pghistory.context(username=SYSTEM, action=action):
         opportunities.update(active=False)
+    # the update does not send the save signals that reload the form routing table
+    invalidate_routing_table()
 
 
 @celery_app.task()
@@ -436,22 +591,76 @@ def download_inaccessibility_request_attachments(self, xform_id: str, attachment
 @celery_app.task()
 def generate_work_status_export(opportunity_id: int, export_format: str):
     opportunity = Opportunity.objects.get(id=opportunity_id)
-    dataset = export_work_status_table(opportunity)
-    export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_work_status.{export_format}"
-    return save_export(dataset, export_tmp_name, export_format)
+
+    def generate():
+        dataset = export_work_status_table(opportunity)
+        export_tmp_name = f"{now().isoformat()}_{slugify(opportunity.name)}_work_status.{export_format}"
+        return save_export(dataset, export_tmp_name, export_format)
+
+    return get_or_generate_export(WORK_STATUS_EXPORT, opportunity_id, {"format": export_format}, generate)
 
 
 @celery_app.task()
 def bulk_approve_completed_work():
-    access_objects = OpportunityAccess.objects.filter(
-        opportunity__active=True,
-        opportunity__end_date__gte=datetime.date.today(),
-        opportunity__auto_approve_payments=True,
-        suspended=False,
+    """Approve the completed work of the auto approved opportunities, fanning out one task per
+    chunk of users. The progress of the run is available from ``get_bulk_approval_progress``."""
+    run_id = bulk_approve_completed_work.request.id or uuid.uuid4().hex
+    deadline = now() + datetime.timedelta(seconds=settings.BULK_APPROVAL_DEADLINE)
+    chunks = plan_bulk_approval(run_id, deadline)
+    if not chunks:
+        return
+    chord(
+        group(
+            bulk_approve_completed_work_chunk.s(run_id, opportunity_id, list(access_ids), deadline.isoformat())
+            for opportunity_id, access_ids in chunks
+        ),
+        bulk_approve_completed_work_summary.s(run_id),
+    ).apply_async()
+
+
+@celery_app.task()
+def bulk_approve_completed_work_chunk(run_id: str, opportunity_id: int, access_ids: list[int], deadline: str):
+    if now() > datetime.datetime.fromisoformat(deadline):
+        record_chunk_progress(run_id, opportunity_id, SKIPPED)
+        return {"opportunity_id": opportunity_id, "updated": 0, "skipped": True, "failed": False}
+
+    # a failed chunk is returned as a result so that the summary of the run is still reported
+    try:
+        opportunity = Opportunity.objects.get(id=opportunity_id)
+        completed_works = CompletedWork.objects.filter(
+            opportunity_access_id__in=access_ids, opportunity_access__suspended=False
+        ).exclude(status=CompletedWorkStatus.rejected)
+        updated = update_opportunity_status(opportunity, completed_works, compute_payment=True)
+    except Exception as e:
+        logger.exception("Bulk approval %s failed for a chunk of opportunity %s", run_id, opportunity_id)
+        sentry_sdk.capture_exception(e)
+        record_chunk_progress(run_id, opportunity_id, FAILED)
+        return {"opportunity_id": opportunity_id, "updated": 0, "skipped": False, "failed": True}
+    record_chunk_progress(run_id, opportunity_id, COMPLETED)
+    return {"opportunity_id": opportunity_id, "updated": updated, "skipped": False, "failed": False}
+
+
+@celery_app.task()
+def bulk_approve_completed_work_summary(results: list[dict], run_id: str):
+    skipped = {result["opportunity_id"] for result in results if result["skipped"]}
+    failed = {result["opportunity_id"] for result in results if result["failed"]}
+    updated = sum(result["updated"] for result in results)
+    logger.info(
+        "Bulk approval %s updated %s completed works in %s chunks, skipped %s chunks, %s chunks failed",
+        run_id,
+        updated,
+        len(results),
+        sum(result["skipped"] for result in results),
+        sum(bool(result["failed"]) for result in results),
     )
-    for access in access_objects:
-        completed_works = access.completedwork_set.exclude(status=CompletedWorkStatus.rejected)
-        update_status(completed_works, access, compute_payment=True)
+    if skipped:
+        sentry_sdk.capture_message(
+            f"Bulk approval {run_id} passed its deadline, skipped opportunities: {sorted(skipped)}", level="warning"
+        )
+    if failed:
+        sentry_sdk.capture_message(
+            f"Bulk approval {run_id} failed for chunks of opportunities: {sorted(failed)}", level="error"
+        )
 
 
 @celery_app.task()
@@ -536,12 +745,44 @@ def bulk_update_visit_status_task(
 def bulk_update_payment_accrued(opportunity_id, user_ids: list):
     """Updates payment accrued for completed and approved CompletedWork instances."""
     access_objects = OpportunityAccess.objects.filter(opportunity=opportunity_id, user__in=user_ids, suspended=False)
-    for access in access_objects:
-        with cache.lock(f"update_payment_accrued_lock_{access.id}", timeout=900):
-            completed_works = access.completedwork_set.exclude(status=CompletedWorkStatus.rejected).select_related(
-                "payment_unit"
-            )
-            update_status(completed_works, access, compute_payment=True)
+    with exchange_rate_memo():
+        for access in access_objects:
+            with cache.lock(f"update_payment_accrued_lock_{access.id}", timeout=900):
+                completed_works = access.completedwork_set.exclude(status=CompletedWorkStatus.rejected).select_related(
+                    "payment_unit"
+                )
+                update_status(completed_works, access, compute_payment=True)
+
+
+def get_payment_accrual_schedule_key(opportunity_access_id):
+    return f"payment_accrual_scheduled_{opportunity_access_id}"
+
+
+@celery_app.task()
+def update_pending_payment_accrued(opportunity_access_id):
+    """Recalculates payment accrued for a user whose update was deferred by schedule_payment_accrued_update."""
+    # forms received from now on schedule a new recalculation
+    cache.delete(get_payment_accrual_schedule_key(opportunity_access_id))
+    access = OpportunityAccess.objects.get(pk=opportunity_access_id)
+    pending_since = access.payment_accrual_pending_since
+    update_payment_accrued_for_user(access, incremental=True)
+    # the marker is only cleared once the recalculation succeeded so that a failed run is retried
+    # by update_stale_pending_payment_accrued
+    if pending_since is not None:
+        OpportunityAccess.objects.filter(
+            pk=opportunity_access_id, payment_accrual_pending_since__lte=pending_since
+        ).update(payment_accrual_pending_since=None)
+
+
+@celery_app.task()
+def update_stale_pending_payment_accrued():
+    """Reschedules deferred payment accrued updates that did not run, e.g. because a worker was restarted."""
+    stale_before = now() - datetime.timedelta(seconds=settings.PAYMENT_ACCRUAL_DELAY * 2)
+    access_ids = OpportunityAccess.objects.filter(payment_accrual_pending_since__lt=stale_before).values_list(
+        "id", flat=True
+    )
+    for access_id in access_ids:
+        update_pending_payment_accrued.delay(access_id)
 
 
 @quickcache(vary_on=["url"], timeout=60 * 60 * 24)
@@ -558,6 +799,8 @@ def fetch_exchange_rates(date=None, currency=None):
     if date is None:
         # fetch for the first of the month
         date = datetime.date.today().replace(day=1)
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
     url = f"{base_url}/historical/{date.strftime('%Y-%m-%d')}.json"
     url = f"{url}?app_id={settings.OPEN_EXCHANGE_RATES_API_ID}"
     rates = request_rates(url)
@@ -574,7 +817,11 @@ def fetch_exchange_rates(date=None, currency=None):
     else:
         # Parsing it to decimal otherwise the returned object rate will still be in float.
         rate = Decimal(rates[currency])
-        return ExchangeRate.objects.create(currency_code=currency, rate=rate, rate_date=date)
+        # the rate may have been stored since the fetch was queued
+        exchange_rate, _ = ExchangeRate.objects.get_or_create(
+            currency_code=currency, rate_date=date, defaults={"rate": rate}
+        )
+        return exchange_rate
 
 
 @celery_app.task()
@@ -637,61 +884,49 @@ def send_invoice_paid_mail(opportunity_id, invoice_ids):
 @celery_app.task()
 def generate_automated_service_delivery_invoice():
     CHUNK_SIZE = 100
-    invoices_chunk = []
     end_date_prev_month = get_end_date_previous_month()
 
     opp_start_date = datetime.date(2026, 1, 1)
-    created_invoices_ids = []
-
-    for opportunity in Opportunity.objects.filter(active=True, is_test=False, start_date__gte=opp_start_date).iterator(
-        chunk_size=CHUNK_SIZE
-    ):
-        start_date = get_start_date_for_invoice(opportunity)
-        # Below indicates there are no uninvoiced completed works to invoice in previous month or earlier
-        if start_date > end_date_prev_month:
-            continue
-
-        invoice_number = generate_invoice_number()
-        line_items = get_uninvoiced_visit_items(opportunity, start_date, end_date_prev_month)
-        if not line_items:
-            continue
-
-        total_local_amount = sum(item["total_amount_local"] for item in line_items)
-        total_usd_amount = sum(item["total_amount_usd"] for item in line_items)
-        exchange_rate = ExchangeRate.latest_exchange_rate(line_items[-1]["currency"], line_items[-1]["month"])
-
-        payment_invoice = PaymentInvoice(
-            opportunity=opportunity,
-            amount=total_local_amount,
-            amount_usd=total_usd_amount,
-            date=datetime.datetime.utcnow(),
-            start_date=start_date,
-            end_date=end_date_prev_month,
-            status=InvoiceStatus.PENDING_NM_REVIEW,
-            invoice_number=invoice_number,
-            service_delivery=True,
-            exchange_rate=exchange_rate,
-        )
-        invoices_chunk.append(payment_invoice)
-
-        if len(invoices_chunk) == CHUNK_SIZE:
-            created_invoices_ids += _bulk_create_and_link_invoices(invoices_chunk)
-            invoices_chunk = []
+    opportunities = Opportunity.objects.filter(active=True, is_test=False, start_date__gte=opp_start_date)
+    # the approved uninvoiced work of previous months of all opportunities, with one grouped query
+    rows_by_opportunity = get_ledger_uninvoiced_rows_by_opportunity(opportunities, end_date_prev_month)
+
+    invoices = []
+    with exchange_rate_memo():
+        for opportunity_id, rows in rows_by_opportunity.items():
+            line_items = get_invoice_items_from_records(rows)
+            total_local_amount = sum(item["total_amount_local"] for item in line_items)
+            total_usd_amount = sum(item["total_amount_usd"] for item in line_items)
+            exchange_rate = ExchangeRate.latest_exchange_rate(line_items[-1]["currency"], line_items[-1]["month"])
+
+            invoices.append(
+                PaymentInvoice(
+                    opportunity_id=opportunity_id,
+                    amount=total_local_amount,
+                    amount_usd=total_usd_amount,
+                    date=datetime.datetime.utcnow(),
+                    # line items are ordered by month, so the first is the earliest uninvoiced month
+                    start_date=line_items[0]["month"].date(),
+                    end_date=end_date_prev_month,
+                    status=InvoiceStatus.PENDING_NM_REVIEW,
+                    invoice_number=generate_invoice_number(),
+                    service_delivery=True,
+                    exchange_rate=exchange_rate,
+                )
+            )
 
-    if invoices_chunk:
-        created_invoices_ids += _bulk_create_and_link_invoices(invoices_chunk)
+    created_invoices_ids = []
+    for invoices_chunk in batched(invoices, CHUNK_SIZE):
+        created_invoices_ids += _bulk_create_and_link_invoices(invoices_chunk, end_date_prev_month)
 
     _send_auto_invoice_created_notification(created_invoices_ids)
 
 
-def _bulk_create_and_link_invoices(invoices_chunk):
-    invoice_ids = []
+def _bulk_create_and_link_invoices(invoices_chunk, end_date):
     with transaction.atomic():
         invoice_objs = PaymentInvoice.objects.bulk_create(invoices_chunk)
-        for invoice in invoice_objs:
-            link_invoice_to_completed_works(invoice, start_date=invoice.start_date, end_date=invoice.end_date)
-            invoice_ids.append(invoice.id)
-    return invoice_ids
+        link_service_delivery_invoices(invoice_objs, end_date)
+    return [invoice.id for invoice in invoice_objs]
 
 
 def _send_auto_invoice_created_notification(invoice_ids):
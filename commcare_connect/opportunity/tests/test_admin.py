@@ -0,0 +1,29 @@
+import pytest
+from django.contrib import admin
+
+from commcare_connect.opportunity.admin import OpportunityAccessAdmin
+from commcare_connect.opportunity.models import OpportunityAccess, UserVisit, UserVisitCounter, VisitValidationStatus
+from commcare_connect.opportunity.tests.factories import OpportunityAccessFactory, UserVisitFactory
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
+
+
+@pytest.mark.django_db
+def test_clear_user_progress_clears_visit_counters(opportunity):
+    access = OpportunityAccessFactory(opportunity=opportunity)
+    other_access = OpportunityAccessFactory(opportunity=opportunity)
+    for opportunity_access in (access, other_access):
+        UserVisitFactory.create_batch(
+            2,
+            opportunity=opportunity,
+            user=opportunity_access.user,
+            opportunity_access=opportunity_access,
+            status=VisitValidationStatus.approved,
+        )
+        rebuild_visit_counters(opportunity_access)
+
+    model_admin = OpportunityAccessAdmin(OpportunityAccess, admin.site)
+    model_admin.clear_user_progress(None, OpportunityAccess.objects.filter(id=access.id))
+
+    assert not UserVisit.objects.filter(opportunity_access=access).exists()
+    assert not UserVisitCounter.objects.filter(opportunity_access=access).exists()
+    assert UserVisitCounter.objects.filter(opportunity_access=other_access).exists()
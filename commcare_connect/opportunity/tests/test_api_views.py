@@ -1,6 +1,8 @@
 import datetime
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 from commcare_connect.opportunity.api.serializers.mobile import (
@@ -224,6 +226,49 @@ def test_opportunity_list_endpoint(
     assert all(all(field in unit for field in payment_unit_fields) for unit in payment_units)
 
 
+@pytest.mark.django_db
+def test_opportunity_list_endpoint_learn_progress_not_cached(
+    mobile_user_with_connect_link: User,
+    api_client: APIClient,
+    opportunity: Opportunity,
+    settings,
+):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    access = OpportunityAccess.objects.get(user=mobile_user_with_connect_link, opportunity=opportunity)
+    OpportunityAccess.objects.filter(pk=access.pk).update(learn_modules_total=3, learn_modules_completed=1)
+    api_client.force_authenticate(mobile_user_with_connect_link)
+    response = api_client.get("/api/opportunity/")
+    assert response.data[0]["learn_progress"] == {"total_modules": 3, "completed_modules": 1}
+
+    # progress is recorded with bulk updates while the access stays cached
+    OpportunityAccess.objects.filter(pk=access.pk).update(learn_modules_completed=2)
+    response = api_client.get("/api/opportunity/")
+    assert response.data[0]["learn_progress"] == {"total_modules": 3, "completed_modules": 2}
+
+
+@pytest.mark.django_db
+def test_opportunity_list_endpoint_learn_progress_read_with_list(
+    mobile_user_with_connect_link: User,
+    api_client: APIClient,
+    opportunity: Opportunity,
+):
+    other_access = OpportunityAccessFactory(user=mobile_user_with_connect_link)
+    OpportunityAccess.objects.filter(pk=other_access.pk).update(learn_modules_total=4, learn_modules_completed=3)
+    api_client.force_authenticate(mobile_user_with_connect_link)
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get("/api/opportunity/")
+
+    progress = {item["id"]: item["learn_progress"] for item in response.data}
+    assert progress[other_access.opportunity_id] == {"total_modules": 4, "completed_modules": 3}
+    # no per opportunity query of the learn progress
+    progress_queries = [
+        query
+        for query in context.captured_queries
+        if query["sql"].startswith('SELECT "opportunity_opportunityaccess"."learn_modules_total"')
+    ]
+    assert progress_queries == []
+
+
 @pytest.mark.django_db
 def test_opportunity_list_endpoint_excludes_archived(
     mobile_user_with_connect_link: User,
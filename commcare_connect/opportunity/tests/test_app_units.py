@@ -0,0 +1,62 @@
+import pytest
+
+from commcare_connect.form_receiver.processor import get_or_create_deliver_unit, get_or_create_learn_module_id
+from commcare_connect.opportunity.app_units import get_deliver_unit_id, get_learn_module_id
+from commcare_connect.opportunity.models import DeliverUnit
+from commcare_connect.opportunity.tests.factories import (
+    CommCareAppFactory,
+    DeliverUnitFactory,
+    LearnModuleFactory,
+)
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+@pytest.mark.django_db
+def test_app_units_are_cached(django_assert_num_queries):
+    app = CommCareAppFactory()
+    deliver_unit = DeliverUnitFactory(app=app)
+    learn_module = LearnModuleFactory(app=app)
+
+    assert get_deliver_unit_id(app.id, deliver_unit.slug) == deliver_unit.id
+    with django_assert_num_queries(0):
+        assert get_learn_module_id(app.id, learn_module.slug) == learn_module.id
+        assert get_deliver_unit_id(app.id, "unknown") is None
+        assert get_deliver_unit_id(app.id, learn_module.slug) is None
+
+
+@pytest.mark.django_db
+def test_app_units_invalidated_on_change():
+    app = CommCareAppFactory()
+    deliver_unit = DeliverUnitFactory(app=app)
+    assert get_deliver_unit_id(app.id, "new-slug") is None
+
+    deliver_unit.slug = "new-slug"
+    deliver_unit.save()
+    assert get_deliver_unit_id(app.id, "new-slug") == deliver_unit.id
+
+    learn_module = LearnModuleFactory(app=app)
+    assert get_learn_module_id(app.id, learn_module.slug) == learn_module.id
+    learn_module.delete()
+    assert get_learn_module_id(app.id, learn_module.slug) is None
+
+
+@pytest.mark.django_db
+def test_get_or_create_units_during_ingestion(django_assert_num_queries):
+    app = CommCareAppFactory()
+    deliver_unit = DeliverUnitFactory(app=app)
+    get_deliver_unit_id(app.id, deliver_unit.slug)
+
+    # the cached deliver unit and its payment unit are loaded together
+    with django_assert_num_queries(1):
+        unit = get_or_create_deliver_unit(app, {"@id": deliver_unit.slug, "name": deliver_unit.name})
+        assert unit.payment_unit == deliver_unit.payment_unit
+
+    unit = get_or_create_deliver_unit(app, {"@id": "unsynced", "name": "Unsynced"})
+    assert DeliverUnit.objects.get(app=app, slug="unsynced") == unit
+    assert get_deliver_unit_id(app.id, "unsynced") == unit.id
+
+    module_data = {"@id": "module_1", "name": "Module 1", "description": "", "time_estimate": 1}
+    module_id = get_or_create_learn_module_id(app, module_data)
+    with django_assert_num_queries(0):
+        assert get_or_create_learn_module_id(app, module_data) == module_id
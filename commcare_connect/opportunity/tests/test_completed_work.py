@@ -7,6 +7,7 @@ from dateutil.relativedelta import relativedelta
 from commcare_connect.opportunity.models import (
     CompletedWork,
     CompletedWorkStatus,
+    OpportunityAccess,
     VisitReviewStatus,
     VisitValidationStatus,
 )
@@ -23,6 +24,7 @@ from commcare_connect.opportunity.tests.factories import (
 from commcare_connect.opportunity.utils.completed_work import (
     get_invoice_items,
     get_uninvoiced_visit_items,
+    update_opportunity_status,
     update_status,
 )
 
@@ -857,6 +859,144 @@ class TestUpdateStatus:
         assert completed_work.status == CompletedWorkStatus.approved
 
 
+class TestOpportunityUpdateStatus(TestUpdateStatus):
+    """Runs the update status tests against the set based updater."""
+
+    def _run_update_status(self, completed_work):
+        opportunity = completed_work.opportunity_access.opportunity
+        completed_works = CompletedWork.objects.filter(id=completed_work.id)
+        update_opportunity_status(opportunity, completed_works, compute_payment=True)
+        completed_work.refresh_from_db()
+
+
+SAVED_FIELDS = [
+    "status",
+    "reason",
+    "saved_completed_count",
+    "saved_approved_count",
+    "saved_payment_accrued",
+    "saved_payment_accrued_usd",
+    "saved_org_payment_accrued",
+    "saved_org_payment_accrued_usd",
+]
+
+
+@pytest.mark.django_db
+def test_opportunity_updater_matches_completed_work_updater(django_assert_max_num_queries):
+    opportunity = OpportunityFactory(auto_approve_payments=True)
+    parent_unit = PaymentUnitFactory(opportunity=opportunity, amount=100, org_amount=10)
+    child_unit = PaymentUnitFactory(opportunity=opportunity, amount=50, org_amount=5, parent_payment_unit=parent_unit)
+    parent_deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=parent_unit)
+    parent_optional_unit = DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=parent_unit, optional=True)
+    child_deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=child_unit)
+
+    visit_statuses = [
+        [VisitValidationStatus.approved, VisitValidationStatus.approved],
+        [VisitValidationStatus.approved, VisitValidationStatus.pending],
+        [VisitValidationStatus.approved, VisitValidationStatus.rejected],
+        [VisitValidationStatus.pending],
+    ]
+    accesses = OpportunityAccessFactory.create_batch(3, opportunity=opportunity)
+    for access in accesses:
+        for index, statuses in enumerate(visit_statuses):
+            entity_id = f"entity-{index}"
+            parent_work = CompletedWorkFactory(
+                opportunity_access=access, payment_unit=parent_unit, entity_id=entity_id
+            )
+            child_work = CompletedWorkFactory(opportunity_access=access, payment_unit=child_unit, entity_id=entity_id)
+            for status in statuses:
+                for work, deliver_unit in [
+                    (parent_work, parent_deliver_unit),
+                    (parent_work, parent_optional_unit),
+                    (child_work, child_deliver_unit),
+                ]:
+                    UserVisitFactory(
+                        opportunity=opportunity,
+                        user=access.user,
+                        opportunity_access=access,
+                        deliver_unit=deliver_unit,
+                        completed_work=work,
+                        status=status,
+                        review_status=VisitReviewStatus.agree,
+                        reason="Invalid" if status == VisitValidationStatus.rejected else None,
+                    )
+    # a parent work without its child work
+    lone_work = CompletedWorkFactory(opportunity_access=accesses[0], payment_unit=parent_unit, entity_id="lone")
+    UserVisitFactory(
+        opportunity=opportunity,
+        user=accesses[0].user,
+        opportunity_access=accesses[0],
+        deliver_unit=parent_deliver_unit,
+        completed_work=lone_work,
+        status=VisitValidationStatus.approved,
+        review_status=VisitReviewStatus.agree,
+    )
+    works = CompletedWork.objects.filter(opportunity_access__opportunity=opportunity).order_by("id")
+    # approved before the status date was recorded
+    undated_work = works.get(opportunity_access=accesses[0], payment_unit=parent_unit, entity_id="entity-0")
+
+    def saved_values():
+        return {
+            "works": list(works.values("id", *SAVED_FIELDS)),
+            "payment_accrued": list(
+                OpportunityAccess.objects.filter(opportunity=opportunity).order_by("id").values("payment_accrued")
+            ),
+        }
+
+    def reset():
+        works.update(status=CompletedWorkStatus.incomplete, reason=None, **{field: 0 for field in SAVED_FIELDS[2:]})
+        OpportunityAccess.objects.filter(opportunity=opportunity).update(payment_accrued=0)
+        works.filter(id=undated_work.id).update(status=CompletedWorkStatus.approved, status_modified_date=None)
+
+    reset()
+    for access in accesses:
+        update_status(access.completedwork_set.select_related("payment_unit"), access, compute_payment=True)
+    expected = saved_values()
+
+    reset()
+    with django_assert_max_num_queries(18):
+        update_opportunity_status(opportunity)
+    assert saved_values() == expected
+    assert expected["payment_accrued"] != [{"payment_accrued": 0}] * len(accesses)
+    undated_work.refresh_from_db()
+    assert undated_work.status_modified_date is None
+    assert undated_work.saved_payment_accrued > 0
+
+
+@pytest.mark.django_db
+def test_opportunity_updater_writes_changed_works_only():
+    opportunity = OpportunityFactory(auto_approve_payments=True)
+    payment_unit = PaymentUnitFactory(opportunity=opportunity, amount=100)
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=payment_unit)
+    access = OpportunityAccessFactory(opportunity=opportunity)
+    work = CompletedWorkFactory(
+        opportunity_access=access, payment_unit=payment_unit, status=CompletedWorkStatus.incomplete
+    )
+    UserVisitFactory(
+        opportunity=opportunity,
+        user=access.user,
+        opportunity_access=access,
+        deliver_unit=deliver_unit,
+        completed_work=work,
+        status=VisitValidationStatus.approved,
+        review_status=VisitReviewStatus.agree,
+    )
+
+    assert update_opportunity_status(opportunity, compute_payment=False) == 1
+    work.refresh_from_db()
+    assert work.status == CompletedWorkStatus.approved
+    # the saved payment fields are only set when computing payment
+    assert work.saved_approved_count == 0
+    assert work.saved_payment_accrued == 0
+
+    assert update_opportunity_status(opportunity) == 1
+    work.refresh_from_db()
+    assert work.saved_approved_count == 1
+    assert work.saved_payment_accrued == 100
+
+    assert update_opportunity_status(opportunity) == 0
+
+
 @pytest.mark.django_db
 def test_get_invoice_items_total_includes_org_pay():
     payment_unit = PaymentUnitFactory(amount=10, org_amount=4)
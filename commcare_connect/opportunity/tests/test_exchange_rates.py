@@ -0,0 +1,103 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from commcare_connect.opportunity.exchange_rates import exchange_rate_memo, get_exchange_rate_record
+from commcare_connect.opportunity.models import (
+    CompletedWork,
+    CompletedWorkStatus,
+    ExchangeRate,
+    VisitReviewStatus,
+    VisitValidationStatus,
+)
+from commcare_connect.opportunity.tests.factories import (
+    CompletedWorkFactory,
+    DeliverUnitFactory,
+    ExchangeRateFactory,
+    OpportunityAccessFactory,
+    PaymentUnitFactory,
+    UserVisitFactory,
+)
+from commcare_connect.opportunity.utils.completed_work import update_status
+from commcare_connect.opportunity.visit_import import get_exchange_rate
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+@pytest.fixture
+def mock_fetch():
+    with mock.patch("commcare_connect.opportunity.tasks.fetch_exchange_rates.delay") as fetch:
+        yield fetch
+
+
+@pytest.mark.django_db
+def test_exchange_rates_preloaded(mock_fetch, django_assert_num_queries):
+    ExchangeRateFactory(currency_code="EUR", rate_date=datetime.date(2025, 1, 1), rate=Decimal("0.9"))
+    ExchangeRateFactory(currency_code="EUR", rate_date=datetime.date(2025, 2, 1), rate=Decimal("0.8"))
+
+    with django_assert_num_queries(1), exchange_rate_memo(["EUR"]):
+        assert get_exchange_rate("EUR", datetime.date(2025, 1, 20)) == Decimal("0.9")
+        assert get_exchange_rate("eur", datetime.datetime(2025, 2, 1, 10, tzinfo=datetime.UTC)) == Decimal("0.8")
+        assert get_exchange_rate_record("EUR", datetime.date(2025, 2, 28)).rate_date == datetime.date(2025, 2, 1)
+
+    # the rates are cached between operations
+    with django_assert_num_queries(0):
+        assert get_exchange_rate("EUR", datetime.date(2025, 1, 2)) == Decimal("0.9")
+    mock_fetch.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_missing_rate_queues_fetch(mock_fetch, django_capture_on_commit_callbacks):
+    ExchangeRateFactory(currency_code="EUR", rate_date=datetime.date(2025, 1, 1), rate=Decimal("0.9"))
+    ExchangeRateFactory(currency_code="EUR", rate_date=datetime.date(2025, 2, 1), rate=Decimal("0.8"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert get_exchange_rate("EUR", datetime.date(2025, 3, 15)) == Decimal("0.8")
+        assert get_exchange_rate("EUR", datetime.date(2025, 3, 16)) == Decimal("0.8")
+        # dates before the first stored rate use the earliest stored rate
+        assert get_exchange_rate("EUR", datetime.date(2024, 6, 1)) == Decimal("0.9")
+    assert mock_fetch.call_args_list == [mock.call("2025-03-01", "EUR"), mock.call("2024-06-01", "EUR")]
+
+    ExchangeRate.objects.create(currency_code="EUR", rate_date=datetime.date(2025, 3, 1), rate=Decimal("0.7"))
+    assert get_exchange_rate("EUR", datetime.date(2025, 3, 15)) == Decimal("0.7")
+
+
+@pytest.mark.django_db
+def test_no_stored_rates_fetched_once(mock_fetch):
+    with mock.patch("commcare_connect.opportunity.tasks.request_rates", return_value={"XYZ": 2.5}) as request_rates:
+        assert get_exchange_rate("XYZ", datetime.date(2025, 1, 15)) == Decimal("2.5")
+        assert get_exchange_rate("XYZ", datetime.date(2025, 1, 20)) == Decimal("2.5")
+    request_rates.assert_called_once()
+    assert ExchangeRate.objects.get(currency_code="XYZ").rate_date == datetime.date(2025, 1, 1)
+    mock_fetch.assert_not_called()
+    assert get_exchange_rate("USD") == 1
+
+
+@pytest.mark.django_db
+def test_update_status_fetches_rate_for_currency_without_rates(mock_fetch):
+    access = OpportunityAccessFactory(opportunity__currency_id="EUR", opportunity__auto_approve_payments=True)
+    payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=100)
+    deliver_unit = DeliverUnitFactory(app=access.opportunity.deliver_app, payment_unit=payment_unit)
+    completed_work = CompletedWorkFactory(
+        status=CompletedWorkStatus.pending, opportunity_access=access, payment_unit=payment_unit
+    )
+    UserVisitFactory(
+        opportunity=access.opportunity,
+        user=access.user,
+        opportunity_access=access,
+        deliver_unit=deliver_unit,
+        completed_work=completed_work,
+        status=VisitValidationStatus.approved,
+        review_status=VisitReviewStatus.agree,
+    )
+
+    with mock.patch("commcare_connect.opportunity.tasks.request_rates", return_value={"EUR": 0.5}):
+        update_status(CompletedWork.objects.filter(id=completed_work.id), access, compute_payment=True)
+
+    completed_work.refresh_from_db()
+    assert completed_work.status == CompletedWorkStatus.approved
+    assert completed_work.saved_payment_accrued == 100
+    assert completed_work.saved_payment_accrued_usd == 200
+    assert ExchangeRate.objects.filter(currency_code="EUR").count() == 1
@@ -1,9 +1,13 @@
 import datetime
 import random
+import tempfile
 from datetime import timedelta
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from django.utils.timezone import now
+from openpyxl import load_workbook
 from tablib import Dataset
 
 from commcare_connect.opportunity.export import (
@@ -11,8 +15,15 @@ from commcare_connect.opportunity.export import (
     export_catchment_area_table,
     export_user_status_table,
     export_user_visit_review_data,
+    join_export_parts,
+)
+from commcare_connect.opportunity.models import (
+    Opportunity,
+    UserInviteStatus,
+    UserVisit,
+    VisitReviewStatus,
+    VisitValidationStatus,
 )
-from commcare_connect.opportunity.models import Opportunity, UserInviteStatus, UserVisit, VisitReviewStatus
 from commcare_connect.opportunity.tests.factories import (
     AssessmentFactory,
     CatchmentAreaFactory,
@@ -144,6 +155,122 @@ def test_export_user_visit_data_no_flatten(mobile_user_with_connect_link):
     )
 
 
+@pytest.mark.parametrize("flatten", [True, False])
+def test_user_visit_exporter_write_export_matches_dataset(mobile_user_with_connect_link, flatten):
+    opportunity = OpportunityFactory()
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    date1 = now()
+    form_jsons = [
+        {"form": {"name": "test_form1", "items": [{"q": "a"}, {"q": "b"}]}, "attachments": {"a.jpg": {}}},
+        {"form": {"name": "test_form2"}},
+        {"form": {"name": "test_form3", "group": {"q": "c"}}},
+    ]
+    UserVisit.objects.bulk_create(
+        [
+            UserVisit(
+                opportunity=opportunity,
+                user=mobile_user_with_connect_link,
+                visit_date=date1 + timedelta(minutes=i),
+                deliver_unit=deliver_unit,
+                form_json=form_json,
+            )
+            for i, form_json in enumerate(form_jsons)
+        ]
+    )
+    to_date = date1 + timedelta(minutes=10)
+    dataset = UserVisitExporter(opportunity, flatten).get_dataset(date1, to_date, [])
+
+    with tempfile.TemporaryFile() as export_file:
+        UserVisitExporter(opportunity, flatten).write_export(export_file, "csv", date1, to_date, [])
+        export_file.seek(0)
+        assert export_file.read().decode() == dataset.export("csv")
+
+    with tempfile.TemporaryFile() as export_file:
+        UserVisitExporter(opportunity, flatten).write_export(export_file, "xlsx", date1, to_date, [])
+        export_file.seek(0)
+        sheet = load_workbook(export_file).active
+        rows = [["" if value is None else value for value in row] for row in sheet.iter_rows(values_only=True)]
+    assert sheet.title == "Export User Visits"
+    assert rows == [list(dataset.headers)] + [["" if value is None else value for value in row] for row in dataset]
+    if flatten:
+        assert "form.items.1.q" in rows[0]
+        assert not any(header.startswith("attachments") for header in rows[0])
+
+
+def test_user_visit_exporter_write_parquet(mobile_user_with_connect_link):
+    opportunity = OpportunityFactory()
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    visit_date = now()
+    UserVisitFactory(
+        opportunity=opportunity,
+        user=mobile_user_with_connect_link,
+        deliver_unit=deliver_unit,
+        visit_date=visit_date,
+        status=VisitValidationStatus.pending,
+        form_json={"form": {"name": "test_form1", "count": 2}},
+    )
+
+    with tempfile.TemporaryFile() as export_file:
+        UserVisitExporter(opportunity, True).write_export(export_file, "parquet", visit_date, visit_date, [])
+        export_file.seek(0)
+        table = pq.read_table(export_file)
+
+    assert table.schema.field("Visit date").type == pa.timestamp("us", tz="UTC")
+    assert pa.types.is_dictionary(table.schema.field("Status").type)
+    assert table.schema.field("form.count").type == pa.string()
+    [row] = table.to_pylist()
+    assert row["Visit date"] == visit_date
+    assert row["Status"] == "Pending"
+    assert row["Username"] == mobile_user_with_connect_link.username
+    assert row["form.name"] == "test_form1"
+    assert row["form.count"] == "2"
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet"])
+def test_user_visit_exporter_partitions_join_to_export(mobile_user_with_connect_link, export_format):
+    opportunity = OpportunityFactory()
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    date1 = now()
+    UserVisit.objects.bulk_create(
+        [
+            UserVisit(
+                opportunity=opportunity,
+                user=mobile_user_with_connect_link,
+                # visits on the same date are split between partitions by id
+                visit_date=date1 + timedelta(minutes=i // 2),
+                deliver_unit=deliver_unit,
+                form_json={"form": {f"question_{i}": i}},
+            )
+            for i in range(5)
+        ]
+    )
+    to_date = date1 + timedelta(minutes=10)
+    exporter = UserVisitExporter(opportunity, True)
+    assert len(exporter.get_partitions(date1, to_date, [], partition_size=5)) == 1
+    partitions = exporter.get_partitions(date1, to_date, [], partition_size=2)
+    assert len(partitions) == 3
+
+    part_files = []
+    for partition in partitions:
+        part_file = tempfile.TemporaryFile()
+        UserVisitExporter(opportunity, True).write_export(part_file, export_format, date1, to_date, [], partition)
+        part_file.seek(0)
+        part_files.append(part_file)
+    with tempfile.TemporaryFile() as export_file, tempfile.TemporaryFile() as joined_file:
+        UserVisitExporter(opportunity, True).write_export(export_file, export_format, date1, to_date, [])
+        join_export_parts(joined_file, export_format, part_files)
+        export_file.seek(0)
+        joined_file.seek(0)
+        if export_format == "csv":
+            assert joined_file.read() == export_file.read()
+        else:
+            assert pq.read_table(joined_file).equals(pq.read_table(export_file))
+            joined_file.seek(0)
+            assert pq.ParquetFile(joined_file).num_row_groups == 3
+    for part_file in part_files:
+        part_file.close()
+
+
 def _get_prepared_dataset_for_user_status_test(data):
     headers = (
         "Name",
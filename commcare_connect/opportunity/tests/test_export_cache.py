@@ -0,0 +1,104 @@
+from unittest import mock
+
+import pytest
+
+from commcare_connect.opportunity.export_cache import (
+    PAYMENT_EXPORT,
+    VISIT_EXPORT,
+    WORK_STATUS_EXPORT,
+    get_or_generate_export,
+)
+from commcare_connect.opportunity.models import DeliverUnit, UserVisit, VisitValidationStatus
+from commcare_connect.opportunity.tests.factories import (
+    CompletedWorkFactory,
+    DeliverUnitFactory,
+    OpportunityAccessFactory,
+    UserVisitFactory,
+)
+from commcare_connect.users.models import User
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+@pytest.fixture
+def export_file_exists():
+    with mock.patch("commcare_connect.opportunity.export_cache._export_file_exists", return_value=True) as exists:
+        yield exists
+
+
+def _generator():
+    return mock.Mock(side_effect=[f"export_{i}.csv" for i in range(1, 10)])
+
+
+@pytest.mark.django_db
+def test_visit_export_reused_until_visits_change(opportunity, export_file_exists):
+    visit = UserVisitFactory(opportunity=opportunity, status=VisitValidationStatus.pending)
+    generate = _generator()
+    options = {"from_date": "2025-01-01", "to_date": "2025-01-31", "status": ["pending"], "format": "csv"}
+
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_1.csv"
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_1.csv"
+    assert generate.call_count == 1
+
+    # other options are a different export
+    other_options = {**options, "format": "xlsx"}
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, other_options, generate) == "export_2.csv"
+
+    # bulk updates are picked up through the modified date set by the database
+    UserVisit.objects.filter(id=visit.id).update(status=VisitValidationStatus.approved)
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_3.csv"
+
+    UserVisitFactory(opportunity=opportunity)
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_4.csv"
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_4.csv"
+
+
+@pytest.mark.django_db
+def test_export_regenerated_when_file_expired(opportunity, export_file_exists):
+    generate = _generator()
+    options = {"format": "csv"}
+
+    assert get_or_generate_export(WORK_STATUS_EXPORT, opportunity.id, options, generate) == "export_1.csv"
+    export_file_exists.return_value = False
+    assert get_or_generate_export(WORK_STATUS_EXPORT, opportunity.id, options, generate) == "export_2.csv"
+    export_file_exists.assert_called_once_with("export_1.csv")
+
+
+@pytest.mark.django_db
+def test_work_status_and_payment_export_fingerprints(opportunity, export_file_exists):
+    access = OpportunityAccessFactory(opportunity=opportunity, accepted=True)
+    generate = _generator()
+    options = {"format": "csv"}
+
+    assert get_or_generate_export(WORK_STATUS_EXPORT, opportunity.id, options, generate) == "export_1.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_2.csv"
+
+    CompletedWorkFactory(opportunity_access=access)
+    assert get_or_generate_export(WORK_STATUS_EXPORT, opportunity.id, options, generate) == "export_3.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_2.csv"
+
+    access.suspended = True
+    access.save()
+    assert get_or_generate_export(WORK_STATUS_EXPORT, opportunity.id, options, generate) == "export_4.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_5.csv"
+
+
+@pytest.mark.django_db
+def test_export_regenerated_when_joined_rows_change(opportunity, export_file_exists):
+    access = OpportunityAccessFactory(opportunity=opportunity, accepted=True)
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    UserVisitFactory(opportunity=opportunity, opportunity_access=access, user=access.user, deliver_unit=deliver_unit)
+    generate = _generator()
+    options = {"format": "csv"}
+
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_1.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_2.csv"
+
+    # users and deliver units have no modified date, their exported columns are part of the fingerprint
+    User.objects.filter(pk=access.user_id).update(name="Renamed user")
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_3.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_4.csv"
+
+    DeliverUnit.objects.filter(pk=deliver_unit.pk).update(name="Renamed unit")
+    assert get_or_generate_export(VISIT_EXPORT, opportunity.id, options, generate) == "export_5.csv"
+    assert get_or_generate_export(PAYMENT_EXPORT, opportunity.id, options, generate) == "export_4.csv"
@@ -10,10 +10,15 @@ from commcare_connect.opportunity.models import (
     AssignedTaskStatus,
     InvoiceStatus,
     Opportunity,
+    OpportunityAccess,
     OpportunityActiveEvent,  # added via pghistory
     OpportunityClaimLimit,
     PaymentInvoice,
     PaymentInvoiceStatusEvent,  # added via pghistory
+    UserVisit,
+    UserVisitCounter,
+    VisitCounterType,
+    VisitValidationStatus,
 )
 from commcare_connect.opportunity.tests.factories import (
     AssignedTaskFactory,
@@ -31,6 +36,8 @@ from commcare_connect.opportunity.tests.factories import (
     UserVisitFactory,
 )
 from commcare_connect.opportunity.utils.invoice import generate_invoice_number
+from commcare_connect.opportunity.utils.learn_progress import rebuild_learn_progress
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
 from commcare_connect.opportunity.visit_import import update_payment_accrued
 from commcare_connect.users.models import User
 from commcare_connect.users.tests.factories import MobileUserFactory
@@ -114,9 +121,30 @@ def test_learn_progress(opportunity: Opportunity):
     access_1, access_2 = OpportunityAccessFactory.create_batch(2, opportunity=opportunity)
     for learn_module in learn_modules:
         CompletedModuleFactory(module=learn_module, opportunity_access=access_1)
+    access_1.refresh_from_db()
     assert access_1.learn_progress == 100
     assert access_2.learn_progress == 0
 
+    LearnModuleFactory(app=opportunity.learn_app)
+    access_1.refresh_from_db()
+    assert access_1.learn_modules_total == 3
+    assert access_1.learn_progress == 66.67
+
+
+@pytest.mark.django_db
+def test_rebuild_learn_progress(opportunity: Opportunity):
+    learn_modules = LearnModuleFactory.create_batch(2, app=opportunity.learn_app)
+    access = OpportunityAccessFactory(opportunity=opportunity)
+    for learn_module in learn_modules:
+        CompletedModuleFactory.create_batch(2, module=learn_module, opportunity_access=access)
+    OpportunityAccess.objects.filter(pk=access.pk).update(learn_modules_total=0, learn_modules_completed=0)
+
+    assert rebuild_learn_progress(opportunity) == 1
+    access.refresh_from_db()
+    assert access.learn_modules_total == 2
+    assert access.learn_modules_completed == 2
+    assert access.learn_progress == 100
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize("opportunity", [{}, {"opp_options": {"managed": True}}], indirect=True)
@@ -434,3 +462,39 @@ class TestAssignedTaskDeleteAndResetHQ:
             AssignedTask.bulk_delete([task_a.pk, task_b.pk], access.opportunity)
 
         mock_update.assert_called_once_with({access: {"properties": {"prop_a": "", "prop_b": ""}}})
+
+
+@pytest.mark.django_db
+def test_deleted_visits_are_removed_from_visit_counters(opportunity):
+    access = OpportunityAccessFactory(opportunity=opportunity)
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    visit_date = datetime.datetime(2024, 5, 1, 10, tzinfo=datetime.UTC)
+    visits = UserVisitFactory.create_batch(
+        3,
+        opportunity=opportunity,
+        opportunity_access=access,
+        user=access.user,
+        deliver_unit=deliver_unit,
+        visit_date=visit_date,
+        entity_id="entity",
+        status=VisitValidationStatus.approved,
+    )
+    over_limit = UserVisitFactory(
+        opportunity=opportunity,
+        opportunity_access=access,
+        user=access.user,
+        deliver_unit=deliver_unit,
+        visit_date=visit_date,
+        entity_id="entity",
+        status=VisitValidationStatus.over_limit,
+    )
+    rebuild_visit_counters(access)
+
+    UserVisit.objects.filter(id__in=[visits[0].id, visits[1].id, over_limit.id]).delete()
+
+    counters = UserVisitCounter.objects.filter(opportunity_access=access, deliver_unit=deliver_unit)
+    assert set(counters.values_list("counter_type", "count")) == {
+        (VisitCounterType.TOTAL, 1),
+        (VisitCounterType.DAILY, 1),
+        (VisitCounterType.ENTITY, 1),
+    }
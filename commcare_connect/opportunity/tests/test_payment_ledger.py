@@ -0,0 +1,161 @@
+import datetime
+
+import pytest
+
+from commcare_connect.opportunity.models import (
+    CompletedWork,
+    CompletedWorkStatus,
+    PaymentAccruedLedger,
+    VisitReviewStatus,
+    VisitValidationStatus,
+)
+from commcare_connect.opportunity.tests.factories import (
+    CompletedWorkFactory,
+    DeliverUnitFactory,
+    OpportunityAccessFactory,
+    PaymentInvoiceFactory,
+    PaymentUnitFactory,
+    UserVisitFactory,
+)
+from commcare_connect.opportunity.utils.completed_work import (
+    get_invoice_items,
+    get_invoiced_visit_items,
+    get_uninvoiced_visit_items,
+    link_invoice_to_completed_works,
+    update_status,
+)
+from commcare_connect.opportunity.utils.payment_ledger import get_ledger_payment_accrued
+
+
+def _create_approved_work(access, payment_unit, status_modified_date, approved_count=1):
+    work = CompletedWorkFactory(
+        status=CompletedWorkStatus.approved, opportunity_access=access, payment_unit=payment_unit
+    )
+    work.status_modified_date = status_modified_date
+    work.saved_approved_count = approved_count
+    work.saved_payment_accrued = approved_count * payment_unit.amount
+    work.saved_payment_accrued_usd = approved_count * payment_unit.amount
+    work.saved_org_payment_accrued = approved_count * payment_unit.org_amount
+    work.saved_org_payment_accrued_usd = approved_count * payment_unit.org_amount
+    work.save()
+    return work
+
+
+@pytest.mark.django_db
+def test_ledger_follows_update_status():
+    access = OpportunityAccessFactory(opportunity__auto_approve_payments=True)
+    payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=100, org_amount=10)
+    deliver_unit = DeliverUnitFactory(app=access.opportunity.deliver_app, payment_unit=payment_unit)
+    works = CompletedWorkFactory.create_batch(2, opportunity_access=access, payment_unit=payment_unit)
+    for work, status in zip(works, [VisitValidationStatus.approved, VisitValidationStatus.pending]):
+        UserVisitFactory(
+            opportunity=access.opportunity,
+            user=access.user,
+            opportunity_access=access,
+            deliver_unit=deliver_unit,
+            completed_work=work,
+            status=status,
+            review_status=VisitReviewStatus.agree,
+        )
+
+    update_status(access.completedwork_set.select_related("payment_unit"), access, compute_payment=True)
+
+    access.refresh_from_db()
+    assert access.payment_accrued == 100
+    rows = {row.status: row for row in PaymentAccruedLedger.objects.filter(opportunity_access=access)}
+    assert set(rows) == {CompletedWorkStatus.approved, CompletedWorkStatus.pending}
+    approved = rows[CompletedWorkStatus.approved]
+    assert (approved.works, approved.approved_count, approved.payment_accrued, approved.org_payment_accrued) == (
+        1,
+        1,
+        100,
+        10,
+    )
+    assert approved.opportunity_id == access.opportunity_id
+    assert approved.currency_id == "USD"
+
+
+@pytest.mark.django_db
+def test_invoice_items_read_from_ledger():
+    access = OpportunityAccessFactory()
+    other_access = OpportunityAccessFactory(opportunity=access.opportunity)
+    payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=10, org_amount=2)
+    _create_approved_work(access, payment_unit, datetime.datetime(2025, 1, 10, tzinfo=datetime.UTC), 2)
+    _create_approved_work(other_access, payment_unit, datetime.datetime(2025, 1, 20, tzinfo=datetime.UTC))
+    _create_approved_work(access, payment_unit, datetime.datetime(2025, 2, 5, tzinfo=datetime.UTC))
+    uninvoiced_works = CompletedWork.objects.filter(opportunity_access__opportunity=access.opportunity)
+
+    items = get_uninvoiced_visit_items(access.opportunity)
+    assert items == get_invoice_items(uninvoiced_works)
+    assert [(item["month"].month, item["number_approved"], item["total_amount_local"]) for item in items] == [
+        (1, 3, 36),
+        (2, 1, 12),
+    ]
+    # ranges that do not cover whole months are read from the completed work
+    partial_items = get_uninvoiced_visit_items(
+        access.opportunity, datetime.date(2025, 1, 15), datetime.date(2025, 2, 28)
+    )
+    assert [(item["month"].month, item["number_approved"]) for item in partial_items] == [(1, 1), (2, 1)]
+
+    invoice = PaymentInvoiceFactory(opportunity=access.opportunity)
+    link_invoice_to_completed_works(invoice, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+    assert get_invoiced_visit_items(invoice) == [items[0]]
+    assert get_invoiced_visit_items(invoice) == get_invoice_items(CompletedWork.objects.filter(invoice=invoice))
+    assert get_uninvoiced_visit_items(access.opportunity, datetime.date(2025, 1, 1)) == [items[1]]
+
+    invoice.unlink_completed_works()
+    assert get_invoiced_visit_items(invoice) == []
+    assert get_uninvoiced_visit_items(access.opportunity) == items
+
+
+@pytest.mark.django_db
+def test_ledger_refresh_limited_to_changed_works():
+    access = OpportunityAccessFactory(opportunity__auto_approve_payments=True)
+    payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=100, org_amount=10)
+    other_payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=50, org_amount=5)
+    deliver_unit = DeliverUnitFactory(app=access.opportunity.deliver_app, payment_unit=payment_unit)
+    work = CompletedWorkFactory(opportunity_access=access, payment_unit=payment_unit)
+    UserVisitFactory(
+        opportunity=access.opportunity,
+        user=access.user,
+        opportunity_access=access,
+        deliver_unit=deliver_unit,
+        completed_work=work,
+        status=VisitValidationStatus.approved,
+        review_status=VisitReviewStatus.agree,
+    )
+    _create_approved_work(access, other_payment_unit, datetime.datetime(2025, 1, 10, tzinfo=datetime.UTC))
+    other_row = PaymentAccruedLedger.objects.get(opportunity_access=access, payment_unit=other_payment_unit)
+    # a stale total of another payment unit is not touched by the refresh of the changed work
+    PaymentAccruedLedger.objects.filter(pk=other_row.pk).update(payment_accrued=1)
+
+    update_status(access.completedwork_set.select_related("payment_unit"), access, compute_payment=True)
+    row = PaymentAccruedLedger.objects.get(opportunity_access=access, payment_unit=payment_unit)
+    assert row.payment_accrued == 100
+    assert PaymentAccruedLedger.objects.get(pk=other_row.pk).payment_accrued == 1
+
+    # nothing changed, so the ledger is not rebuilt
+    ledger_ids = set(PaymentAccruedLedger.objects.filter(opportunity_access=access).values_list("id", flat=True))
+    update_status(access.completedwork_set.select_related("payment_unit"), access, compute_payment=True)
+    assert set(PaymentAccruedLedger.objects.filter(opportunity_access=access).values_list("id", flat=True)) == (
+        ledger_ids
+    )
+
+
+@pytest.mark.django_db
+def test_ledger_follows_saved_fields_and_deletes():
+    access = OpportunityAccessFactory()
+    payment_unit = PaymentUnitFactory(opportunity=access.opportunity, amount=100, org_amount=10)
+    work = _create_approved_work(access, payment_unit, datetime.datetime(2025, 1, 10, tzinfo=datetime.UTC))
+    assert get_ledger_payment_accrued(access) == 100
+
+    # the ledger is refreshed when the saved amounts are reset, whatever their new values
+    work.status = CompletedWorkStatus.rejected
+    work.saved_approved_count = work.saved_payment_accrued = work.saved_payment_accrued_usd = 0
+    work.save(update_fields=["status", "saved_approved_count", "saved_payment_accrued", "saved_payment_accrued_usd"])
+    assert get_ledger_payment_accrued(access) == 0
+
+    other_work = _create_approved_work(access, payment_unit, datetime.datetime(2025, 1, 12, tzinfo=datetime.UTC))
+    assert get_ledger_payment_accrued(access) == 100
+    other_work.delete()
+    assert get_ledger_payment_accrued(access) == 0
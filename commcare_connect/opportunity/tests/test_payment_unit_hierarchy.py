@@ -0,0 +1,71 @@
+import pytest
+
+from commcare_connect.opportunity.models import CompletedWork, Opportunity, VisitReviewStatus, VisitValidationStatus
+from commcare_connect.opportunity.tests.factories import (
+    CompletedWorkFactory,
+    DeliverUnitFactory,
+    OpportunityAccessFactory,
+    PaymentUnitFactory,
+    UserVisitFactory,
+)
+from commcare_connect.opportunity.utils.payment_unit_hierarchy import (
+    get_payment_unit_hierarchy,
+    payment_unit_hierarchy_memo,
+)
+
+
+def _create_hierarchy_works(opportunity: Opportunity):
+    root_unit = PaymentUnitFactory(opportunity=opportunity)
+    middle_unit = PaymentUnitFactory(opportunity=opportunity, parent_payment_unit=root_unit)
+    leaf_unit = PaymentUnitFactory(opportunity=opportunity, parent_payment_unit=middle_unit)
+    deliver_units = {
+        payment_unit.id: DeliverUnitFactory(app=opportunity.deliver_app, payment_unit=payment_unit)
+        for payment_unit in (root_unit, middle_unit, leaf_unit)
+    }
+    visit_counts = {root_unit.id: 3, middle_unit.id: 2, leaf_unit.id: 1}
+
+    accesses = OpportunityAccessFactory.create_batch(2, opportunity=opportunity)
+    for access in accesses:
+        for entity_id in ("entity-1", "entity-2"):
+            for payment_unit in (root_unit, middle_unit, leaf_unit):
+                work = CompletedWorkFactory(opportunity_access=access, payment_unit=payment_unit, entity_id=entity_id)
+                if entity_id == "entity-2" and payment_unit == leaf_unit:
+                    continue
+                for index in range(visit_counts[payment_unit.id]):
+                    UserVisitFactory(
+                        opportunity=opportunity,
+                        user=access.user,
+                        opportunity_access=access,
+                        deliver_unit=deliver_units[payment_unit.id],
+                        completed_work=work,
+                        status=VisitValidationStatus.approved if index else VisitValidationStatus.pending,
+                        review_status=VisitReviewStatus.agree,
+                    )
+    return accesses
+
+
+@pytest.mark.django_db
+def test_hierarchy_counts_match_properties(opportunity: Opportunity, django_assert_max_num_queries):
+    _create_hierarchy_works(opportunity)
+    works = list(CompletedWork.objects.filter(opportunity_access__opportunity=opportunity).order_by("id"))
+    expected = [(work.completed_count, work.approved_count) for work in works]
+    assert expected[:3] == [(1, 0), (1, 0), (1, 0)]
+
+    access_ids = {work.opportunity_access_id for work in works}
+    with django_assert_max_num_queries(5), payment_unit_hierarchy_memo(access_ids):
+        assert [(work.completed_count, work.approved_count) for work in works] == expected
+
+
+@pytest.mark.django_db
+def test_memo_loads_users_on_first_use(opportunity: Opportunity, django_assert_num_queries):
+    _create_hierarchy_works(opportunity)
+    work = CompletedWork.objects.filter(opportunity_access__opportunity=opportunity).first()
+    expected = work.completed_count
+
+    with payment_unit_hierarchy_memo():
+        with django_assert_num_queries(5):
+            assert work.completed_count == expected
+        with django_assert_num_queries(0):
+            assert work.completed_count == expected
+            assert work.approved_count == 0
+    assert get_payment_unit_hierarchy() is None
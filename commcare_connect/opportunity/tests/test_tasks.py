@@ -1,22 +1,28 @@
 import datetime
+import tempfile
 import uuid
 from decimal import Decimal
 from unittest import mock
 
 import pytest
+from django.core.files.storage import FileSystemStorage
 from django.utils.timezone import now
 from tablib import Dataset
 
 from commcare_connect.connect_id_client.models import ConnectIdUser, Message
 from commcare_connect.microplanning.tests.factories import WorkAreaInaccessibilityRequestFactory
+from commcare_connect.opportunity.bulk_approval import get_bulk_approval_progress
+from commcare_connect.opportunity.export import UserVisitExporter
 from commcare_connect.opportunity.models import (
     BlobMeta,
+    CompletedWork,
     CompletedWorkStatus,
     ExchangeRate,
     InvoiceStatus,
     Opportunity,
     OpportunityAccess,
     OpportunityActiveEvent,
+    PaymentAccruedLedger,
     PaymentInvoice,
     UserInvite,
 )
@@ -26,6 +32,7 @@ from commcare_connect.opportunity.tasks import (
     add_connect_users,
     auto_archive_test_opportunities,
     auto_deactivate_ended_opportunities,
+    bulk_approve_completed_work,
     download_inaccessibility_request_attachments,
     download_user_visit_attachments,
     generate_automated_service_delivery_invoice,
@@ -38,7 +45,9 @@ from commcare_connect.opportunity.tasks import (
     generate_work_status_export,
     notify_user_for_scored_assessment,
     save_export,
+    save_export_file,
     send_task_assignment_notification,
+    update_pending_payment_accrued,
 )
 from commcare_connect.opportunity.tests.factories import (
     AssessmentFactory,
@@ -271,7 +280,6 @@ class TestGenerateAutomatedServiceDeliveryInvoice:
     @pytest.fixture(autouse=True)
     def setup_mocks(self):
         with (
-            mock.patch("commcare_connect.opportunity.tasks.get_start_date_for_invoice") as mock_start_date,
             mock.patch("commcare_connect.opportunity.tasks.get_end_date_previous_month") as mock_end_date,
             mock.patch("commcare_connect.opportunity.tasks.generate_invoice_number") as mock_invoice_number,
             mock.patch(
@@ -279,7 +287,6 @@ class TestGenerateAutomatedServiceDeliveryInvoice:
                 create=True,
             ) as mock_latest_exchange_rate,
         ):
-            mock_start_date.return_value = datetime.date(2024, 1, 1)
             mock_end_date.return_value = datetime.date(2024, 1, 31)
             mock_invoice_number.side_effect = ["INV001", "INV002", "INV003", "INV004", "INV005"]
 
@@ -288,7 +295,6 @@ class TestGenerateAutomatedServiceDeliveryInvoice:
             )
             mock_latest_exchange_rate.return_value = rate
 
-            self.mock_start_date = mock_start_date
             self.mock_end_date = mock_end_date
             self.mock_invoice_number = mock_invoice_number
 
@@ -344,6 +350,38 @@ class TestGenerateAutomatedServiceDeliveryInvoice:
         assert {invoice1.invoice_number, invoice2.invoice_number} == {"INV001", "INV002"}
         assert completed_work2.invoice == invoice2
 
+    def test_invoice_covers_all_uninvoiced_months(self, django_assert_max_num_queries):
+        opportunity = OpportunityFactory(active=True, is_test=False, start_date=datetime.date(2026, 1, 1))
+        payment_unit = PaymentUnitFactory(opportunity=opportunity, amount=10, org_amount=0)
+        access = OpportunityAccessFactory(opportunity=opportunity)
+        works = []
+        for status_modified_date in [
+            datetime.date(2023, 12, 20),
+            datetime.date(2024, 1, 4),
+            datetime.date(2024, 2, 1),
+        ]:
+            completed_work = CompletedWorkFactory(
+                opportunity_access=access,
+                payment_unit=payment_unit,
+                status=CompletedWorkStatus.approved,
+                status_modified_date=status_modified_date,
+            )
+            completed_work.saved_approved_count = 1
+            completed_work.saved_payment_accrued = 10
+            completed_work.save()
+            works.append(completed_work)
+
+        with django_assert_max_num_queries(15):
+            generate_automated_service_delivery_invoice()
+
+        invoice = PaymentInvoice.objects.get(opportunity=opportunity)
+        assert invoice.amount == Decimal("20.00")
+        assert invoice.start_date == datetime.date(2023, 12, 1)
+        assert invoice.end_date == datetime.date(2024, 1, 31)
+        linked = CompletedWork.objects.filter(id__in=[work.id for work in works]).order_by("id")
+        assert list(linked.values_list("invoice_id", flat=True)) == [invoice.id, invoice.id, None]
+        assert PaymentAccruedLedger.objects.filter(invoice=invoice).count() == 2
+
     def test_no_invoice_for_inactive_opportunities(self):
         inactive_opportunity = OpportunityFactory(active=False, is_test=False, start_date=datetime.date(2026, 1, 1))
         payment_unit = PaymentUnitFactory(opportunity=inactive_opportunity)
@@ -484,22 +522,41 @@ def test_save_export_uses_export_storage():
     assert result == filename
 
 
+def test_save_export_file_streams_file_to_export_storage():
+    mock_storage_cls = mock.MagicMock()
+    mock_storage_cls.return_value.save.side_effect = lambda name, content: content.read()
+    filename = "2026-03-09T10:00:00_test_visit_export.csv"
+
+    with (
+        tempfile.TemporaryFile() as export_file,
+        mock.patch.dict(
+            "sys.modules", {"commcare_connect.utils.storages": mock.MagicMock(ExportS3Boto3Storage=mock_storage_cls)}
+        ),
+    ):
+        export_file.write(b"col1,col2\r\nval1,val2\r\n")
+        result = save_export_file(export_file, filename)
+
+    assert result == b"col1,col2\r\nval1,val2\r\n"
+
+
 @pytest.mark.django_db
 class TestExportTasksCreateExportFile:
-    @mock.patch("commcare_connect.opportunity.tasks.save_export")
+    @mock.patch("commcare_connect.opportunity.tasks.save_export_file")
     @mock.patch("commcare_connect.opportunity.tasks.UserVisitExporter")
     def test_generate_visit_export(self, mock_exporter_cls, mock_save, opportunity):
-        mock_exporter_cls.return_value.get_dataset.return_value = Dataset()
+        mock_save.return_value = "export.csv"
         generate_visit_export(opportunity.id, None, None, [], "csv", False)
+        mock_exporter_cls.return_value.write_export.assert_called_once()
+        assert mock_exporter_cls.return_value.write_export.call_args[0][1] == "csv"
         mock_save.assert_called_once()
         args = mock_save.call_args[0]
         assert args[1].endswith("_visit_export.csv")
-        assert args[2] == "csv"
 
     @mock.patch("commcare_connect.opportunity.tasks.save_export")
     @mock.patch("commcare_connect.opportunity.tasks.export_user_visit_review_data")
     def test_generate_review_visit_export(self, mock_export_fn, mock_save, opportunity):
         mock_export_fn.return_value = Dataset()
+        mock_save.return_value = "export.csv"
         generate_review_visit_export(opportunity.id, None, None, [], "csv")
         mock_save.assert_called_once()
         args = mock_save.call_args[0]
@@ -510,6 +567,7 @@ class TestExportTasksCreateExportFile:
     @mock.patch("commcare_connect.opportunity.tasks.export_empty_payment_table")
     def test_generate_payment_export(self, mock_export_fn, mock_save, opportunity):
         mock_export_fn.return_value = Dataset()
+        mock_save.return_value = "export.csv"
         generate_payment_export(opportunity.id, "csv")
         mock_save.assert_called_once()
         args = mock_save.call_args[0]
@@ -540,6 +598,7 @@ class TestExportTasksCreateExportFile:
     @mock.patch("commcare_connect.opportunity.tasks.export_work_status_table")
     def test_generate_work_status_export(self, mock_export_fn, mock_save, opportunity):
         mock_export_fn.return_value = Dataset()
+        mock_save.return_value = "export.csv"
         generate_work_status_export(opportunity.id, "csv")
         mock_save.assert_called_once()
         args = mock_save.call_args[0]
@@ -557,6 +616,39 @@ class TestExportTasksCreateExportFile:
         assert args[2] == "csv"
 
 
+@pytest.mark.django_db
+def test_generate_visit_export_in_parts(settings, tmp_path, opportunity):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    settings.VISIT_EXPORT_PARTITION_SIZE = 2
+    visit_date = now()
+    UserVisitFactory.create_batch(
+        5, opportunity=opportunity, visit_date=visit_date, form_json={"form": {"name": "test_form"}}
+    )
+    export_date = visit_date.date()
+    storage = FileSystemStorage(location=tmp_path)
+
+    with (
+        mock.patch("commcare_connect.utils.storages.ExportS3Boto3Storage", return_value=storage),
+        mock.patch("commcare_connect.opportunity.tasks.set_task_progress") as set_progress,
+    ):
+        result = generate_visit_export.apply(args=(opportunity.id, export_date, export_date, [], "csv", True))
+        file_name = result.get()
+        # an identical export of the same visits reuses the joined file
+        repeated = generate_visit_export.apply(args=(opportunity.id, export_date, export_date, [], "csv", True))
+        assert repeated.get() == file_name
+
+    assert storage.listdir("")[1] == [file_name]
+    assert set_progress.call_args_list[-1] == mock.call(
+        mock.ANY, "Exported 3 of 3 parts of the visits", task_id=result.id
+    )
+    with tempfile.TemporaryFile() as export_file:
+        UserVisitExporter(opportunity, True).write_export(export_file, "csv", export_date, export_date, [])
+        export_file.seek(0)
+        with storage.open(file_name) as joined_file:
+            assert joined_file.read() == export_file.read()
+
+
 @pytest.mark.django_db
 @mock.patch("commcare_connect.opportunity.tasks.send_message")
 def test_send_task_assignment_notification(send_message_patch):
@@ -582,3 +674,91 @@ def test_send_task_assignment_notification(send_message_patch):
             },
         )
     )
+
+
+@pytest.mark.django_db
+class TestBulkApproveCompletedWork:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        settings.BULK_APPROVAL_CHUNK_SIZE = 2
+
+    def _create_works(self, opportunity, count):
+        payment_unit = PaymentUnitFactory(opportunity=opportunity)
+        return [
+            CompletedWorkFactory(opportunity_access__opportunity=opportunity, payment_unit=payment_unit)
+            for _ in range(count)
+        ]
+
+    def test_chunks_and_progress(self):
+        opportunity = OpportunityFactory(auto_approve_payments=True)
+        other_opportunity = OpportunityFactory(auto_approve_payments=True)
+        self._create_works(opportunity, 3)
+        self._create_works(other_opportunity, 1)
+        self._create_works(OpportunityFactory(auto_approve_payments=False), 1)
+
+        with mock.patch(
+            "commcare_connect.opportunity.tasks.update_opportunity_status", return_value=1
+        ) as update_status:
+            bulk_approve_completed_work()
+
+        assert update_status.call_count == 3
+        progress = get_bulk_approval_progress()
+        assert progress["opportunities"] == {
+            opportunity.id: {"chunks": 2, "completed": 2, "skipped": 0, "failed": 0},
+            other_opportunity.id: {"chunks": 1, "completed": 1, "skipped": 0, "failed": 0},
+        }
+
+    def test_chunks_after_deadline_are_skipped(self, settings):
+        settings.BULK_APPROVAL_DEADLINE = -1
+        opportunity = OpportunityFactory(auto_approve_payments=True)
+        works = self._create_works(opportunity, 1)
+
+        with mock.patch("commcare_connect.opportunity.tasks.sentry_sdk") as sentry:
+            bulk_approve_completed_work()
+
+        works[0].refresh_from_db()
+        assert works[0].status == CompletedWorkStatus.incomplete
+        assert get_bulk_approval_progress()["opportunities"] == {
+            opportunity.id: {"chunks": 1, "completed": 0, "skipped": 1, "failed": 0}
+        }
+        sentry.capture_message.assert_called_once()
+
+    def test_failed_chunks_are_reported(self):
+        opportunity = OpportunityFactory(auto_approve_payments=True)
+        self._create_works(opportunity, 3)
+
+        with (
+            mock.patch(
+                "commcare_connect.opportunity.tasks.update_opportunity_status", side_effect=[RuntimeError, 1]
+            ) as update_status,
+            mock.patch("commcare_connect.opportunity.tasks.sentry_sdk") as sentry,
+        ):
+            bulk_approve_completed_work()
+
+        # the failed chunk does not stop the rest of the run or the summary
+        assert update_status.call_count == 2
+        assert get_bulk_approval_progress()["opportunities"] == {
+            opportunity.id: {"chunks": 2, "completed": 1, "skipped": 0, "failed": 1}
+        }
+        sentry.capture_exception.assert_called_once()
+        sentry.capture_message.assert_called_once()
+        assert "failed" in sentry.capture_message.call_args.args[0]
+
+
+@pytest.mark.django_db
+def test_update_pending_payment_accrued_keeps_marker_on_failure():
+    pending_since = now() - datetime.timedelta(hours=1)
+    access = OpportunityAccessFactory(payment_accrual_pending_since=pending_since)
+    with (
+        mock.patch("commcare_connect.opportunity.tasks.update_payment_accrued_for_user", side_effect=RuntimeError),
+        pytest.raises(RuntimeError),
+    ):
+        update_pending_payment_accrued(access.id)
+    access.refresh_from_db()
+    assert access.payment_accrual_pending_since == pending_since
+
+    update_pending_payment_accrued(access.id)
+    access.refresh_from_db()
+    assert access.payment_accrual_pending_since is None
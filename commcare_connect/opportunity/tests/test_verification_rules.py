@@ -0,0 +1,57 @@
+import pytest
+
+from commcare_connect.opportunity.models import OpportunityVerificationFlags
+from commcare_connect.opportunity.tests.factories import (
+    DeliverUnitFactory,
+    DeliverUnitFlagRulesFactory,
+    FormJsonValidationRulesFactory,
+    OpportunityFactory,
+)
+from commcare_connect.opportunity.verification_rules import get_verification_rules
+
+pytestmark = pytest.mark.usefixtures("local_cache")
+
+
+@pytest.mark.django_db
+def test_verification_rules_are_cached(django_assert_num_queries):
+    opportunity = OpportunityFactory()
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    DeliverUnitFlagRulesFactory(opportunity=opportunity, deliver_unit=deliver_unit, duration=5)
+    form_json_rule = FormJsonValidationRulesFactory(
+        opportunity=opportunity, question_path="form.value", question_value="123"
+    )
+    form_json_rule.deliver_unit.add(deliver_unit)
+
+    rules = get_verification_rules(opportunity.id)
+    assert rules.get_deliver_unit_rule(deliver_unit.id).duration == 5
+    [compiled_rule] = rules.get_form_json_rules(deliver_unit.id)
+    assert compiled_rule.matches({"form": {"value": "123"}})
+    assert not compiled_rule.matches({"form": {"value": "456"}})
+
+    with django_assert_num_queries(0):
+        assert get_verification_rules(opportunity.id) is rules
+
+
+@pytest.mark.django_db
+def test_verification_rules_invalidated_on_change():
+    opportunity = OpportunityFactory()
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    rules = get_verification_rules(opportunity.id)
+    assert not rules.flags.gps
+    assert rules.get_deliver_unit_rule(deliver_unit.id) is None
+
+    OpportunityVerificationFlags.objects.update_or_create(opportunity=opportunity, defaults={"gps": True})
+    flag_rule = DeliverUnitFlagRulesFactory(opportunity=opportunity, deliver_unit=deliver_unit, check_attachments=True)
+    form_json_rule = FormJsonValidationRulesFactory(opportunity=opportunity, question_path="form.value")
+    form_json_rule.deliver_unit.add(deliver_unit)
+
+    rules = get_verification_rules(opportunity.id)
+    assert rules.flags.gps
+    assert rules.get_deliver_unit_rule(deliver_unit.id).check_attachments
+    assert len(rules.get_form_json_rules(deliver_unit.id)) == 1
+
+    flag_rule.delete()
+    form_json_rule.deliver_unit.clear()
+    rules = get_verification_rules(opportunity.id)
+    assert rules.get_deliver_unit_rule(deliver_unit.id) is None
+    assert rules.get_form_json_rules(deliver_unit.id) == []
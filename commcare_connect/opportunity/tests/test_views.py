@@ -5,7 +5,12 @@ from unittest import mock
 from uuid import uuid4
 
 import pytest
+from celery.app.task import Context as TaskRequest
+from celery.backends.cache import CacheBackend
+from celery.result import AsyncResult
 from django.contrib.messages import get_messages
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.files.storage.handler import StorageHandler
 from django.template import Context
 from django.test import Client
@@ -35,11 +40,13 @@ from commcare_connect.opportunity.models import (
     TaskType,
     UserInvite,
     UserInviteStatus,
+    UserVisitCounter,
+    VisitCounterType,
     VisitReviewStatus,
     VisitValidationStatus,
 )
 from commcare_connect.opportunity.tables import TaskTable
-from commcare_connect.opportunity.tasks import invite_user
+from commcare_connect.opportunity.tasks import get_visit_export_parts_chord, invite_user
 from commcare_connect.opportunity.tests.factories import (
     AssignedTaskFactory,
     BlobMetaFactory,
@@ -59,6 +66,7 @@ from commcare_connect.opportunity.tests.factories import (
     UserInviteFactory,
     UserVisitFactory,
 )
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
 from commcare_connect.opportunity.views import WorkerPaymentsView
 from commcare_connect.organization.models import Organization
 from commcare_connect.program.tests.factories import ProgramFactory
@@ -70,6 +78,7 @@ from commcare_connect.users.tests.factories import (
     UserFactory,
 )
 from commcare_connect.utils.commcarehq_api import CommCareHQAPIException
+from config import celery_app
 
 
 @pytest.mark.django_db
@@ -436,6 +445,44 @@ def test_reject_visit(client: Client, opportunity):
     assert accept_visit.reason is None
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("view_name", ["approve_visits", "reject_visits"])
+def test_review_over_limit_visit_updates_visit_counters(client: Client, opportunity, view_name):
+    access = OpportunityAccessFactory(opportunity=opportunity)
+    deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+    visit_date = datetime(2024, 5, 1, 10, tzinfo=UTC)
+    UserVisitFactory.create(
+        opportunity=opportunity,
+        opportunity_access=access,
+        user=access.user,
+        deliver_unit=deliver_unit,
+        visit_date=visit_date,
+        status=VisitValidationStatus.pending,
+    )
+    over_limit = UserVisitFactory.create(
+        opportunity=opportunity,
+        opportunity_access=access,
+        user=access.user,
+        deliver_unit=deliver_unit,
+        visit_date=visit_date,
+        status=VisitValidationStatus.over_limit,
+        flagged=False,
+    )
+    rebuild_visit_counters(access)
+    counters = UserVisitCounter.objects.filter(opportunity_access=access, deliver_unit=deliver_unit)
+    assert counters.get(counter_type=VisitCounterType.TOTAL).count == 1
+    assert counters.get(counter_type=VisitCounterType.DAILY).count == 1
+
+    user = MembershipFactory.create(organization=opportunity.organization).user
+    client.force_login(user)
+    url = reverse(f"opportunity:{view_name}", args=(opportunity.organization.slug, opportunity.id))
+    response = client.post(url, {"reason": "duplicate", "visit_ids[]": [over_limit.id]})
+    assert response.status_code == HTTPStatus.OK
+
+    assert counters.get(counter_type=VisitCounterType.TOTAL).count == 2
+    assert counters.get(counter_type=VisitCounterType.DAILY).count == 2
+
+
 @pytest.mark.django_db
 def test_approve_previously_rejected_visit_updates_completed_work_status(
     client: Client, organization, program_manager_org, program_manager_org_user_admin, managed_opportunity
@@ -2744,3 +2791,57 @@ class TestDeleteTasks:
         assert AssignedTask.objects.filter(pk=task.pk).exists()
         msgs = list(get_messages(response.wsgi_request))
         assert any("could not update CommCare HQ" in str(m) for m in msgs)
+
+
+@pytest.mark.django_db
+class TestPartitionedVisitExportViews:
+    @pytest.fixture
+    def result_backend(self):
+        backend = CacheBackend(app=celery_app, backend="memory")
+
+        def get_result(task_id):
+            return AsyncResult(task_id, backend=backend, app=celery_app)
+
+        with (
+            mock.patch("commcare_connect.opportunity.views.AsyncResult", side_effect=get_result),
+            mock.patch("commcare_connect.utils.celery.AsyncResult", side_effect=get_result),
+        ):
+            yield backend
+
+    def test_status_and_download(self, client, org_user_member, opportunity, result_backend, tmp_path):
+        task_id = str(uuid4())
+        export = {"from_date": None, "to_date": None, "status": [], "flatten": True, "export_format": "csv"}
+        parts_chord = get_visit_export_parts_chord(task_id, opportunity.id, export, [{}, {}], "export.csv", "key")
+        org_slug = opportunity.organization.slug
+        status_url = reverse("opportunity:export_status", args=(org_slug, task_id))
+        download_url = reverse("opportunity:download_export", args=(org_slug, task_id))
+        client.force_login(org_user_member)
+
+        # the parts report progress on the id of the export task
+        part = parts_chord.tasks[0]
+        result_backend.store_result(
+            task_id,
+            {"message": "Exported 1 of 2 parts of the visits"},
+            "PROGRESS",
+            request=TaskRequest(args=part.args, kwargs=part.kwargs),
+        )
+        response = client.get(status_url)
+        assert response.status_code == HTTPStatus.OK
+        assert "Exported 1 of 2 parts of the visits" in response.content.decode()
+
+        # the join stores the export under the same id
+        join = parts_chord.body
+        part_names = ["export.csv.part0", "export.csv.part1"]
+        result_backend.store_result(
+            task_id, "export.csv", "SUCCESS", request=TaskRequest(args=[part_names, *join.args], kwargs=join.kwargs)
+        )
+        assert client.get(status_url).status_code == HTTPStatus.OK
+        storage = FileSystemStorage(location=tmp_path)
+        storage.save("export.csv", ContentFile(b"col1,col2\r\n"))
+        with mock.patch("commcare_connect.utils.storages.ExportS3Boto3Storage", return_value=storage):
+            response = client.get(download_url)
+        assert response.status_code == HTTPStatus.OK
+        assert b"".join(response.streaming_content) == b"col1,col2\r\n"
+
+        other_org_slug = OrganizationFactory().slug
+        assert client.get(reverse("opportunity:download_export", args=(other_org_slug, task_id))).status_code == 404
@@ -22,6 +22,8 @@ from commcare_connect.opportunity.models import (
     Payment,
     PaymentUnit,
     UserVisit,
+    UserVisitCounter,
+    VisitCounterType,
     VisitReviewStatus,
     VisitValidationStatus,
 )
@@ -37,6 +39,7 @@ from commcare_connect.opportunity.tests.factories import (
 )
 from commcare_connect.opportunity.tests.helpers import validate_saved_fields
 from commcare_connect.opportunity.utils.completed_work import update_work_payment_date
+from commcare_connect.opportunity.utils.visit_counters import rebuild_visit_counters
 from commcare_connect.opportunity.visit_import import (
     REVIEW_STATUS_COL,
     VISIT_ID_COL,
@@ -98,6 +101,39 @@ class TestBulkUpdateVisitStatus:
         visit.refresh_from_db()
         assert visit.status == VisitValidationStatus.approved.value
 
+    def test_visit_counters_rebuilt(self, opportunity, mobile_user):
+        access = OpportunityAccess.objects.get(user=mobile_user, opportunity=opportunity)
+        deliver_unit = DeliverUnitFactory(app=opportunity.deliver_app)
+        over_limit, pending = UserVisitFactory.create_batch(
+            2,
+            opportunity=opportunity,
+            user=mobile_user,
+            opportunity_access=access,
+            deliver_unit=deliver_unit,
+            status=VisitValidationStatus.over_limit,
+        )
+        UserVisit.objects.filter(id=pending.id).update(status=VisitValidationStatus.pending)
+        rebuild_visit_counters(access)
+        total = UserVisitCounter.objects.filter(
+            opportunity_access=access, deliver_unit=deliver_unit, counter_type=VisitCounterType.TOTAL
+        )
+        assert total.get().count == 1
+
+        dataset = Dataset(headers=["visit id", "status", "rejected reason"])
+        dataset.extend(
+            [
+                [over_limit.xform_id, VisitValidationStatus.approved.value, ""],
+                [pending.xform_id, VisitValidationStatus.over_limit.value, ""],
+            ]
+        )
+        bulk_update_visit_status(opportunity.pk, dataset.headers, list(dataset))
+        assert total.get().count == 1
+
+        dataset = Dataset(headers=["visit id", "status", "rejected reason"])
+        dataset.extend([[pending.xform_id, VisitValidationStatus.rejected.value, "duplicate"]])
+        bulk_update_visit_status(opportunity.pk, dataset.headers, list(dataset))
+        assert total.get().count == 2
+
 
 @pytest.mark.django_db
 def test_bulk_update_completed_work_status(opportunity: Opportunity, mobile_user: User):
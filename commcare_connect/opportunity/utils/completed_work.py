@@ -1,18 +1,39 @@
 from collections import defaultdict
 
-from django.db.models import F, Sum
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
 from django.db.models.functions import TruncMonth
+from django.utils import timezone
 
+from commcare_connect.opportunity.exchange_rates import exchange_rate_memo
 from commcare_connect.opportunity.models import (
     CompletedWork,
     CompletedWorkStatus,
     DeliverUnit,
+    Opportunity,
     OpportunityAccess,
     Payment,
+    PaymentAccruedLedger,
+    PaymentInvoice,
     PaymentUnit,
+    UserVisit,
     VisitReviewStatus,
     VisitValidationStatus,
 )
+from commcare_connect.opportunity.utils.payment_ledger import (
+    get_ledger_invoice_rows,
+    get_ledger_payment_accrued,
+    ledger_payment_accrued_subquery,
+    refresh_payment_ledger,
+)
+from commcare_connect.opportunity.utils.payment_unit_hierarchy import (
+    APPROVED,
+    COMPLETED,
+    PaymentUnitHierarchy,
+    payment_unit_hierarchy_memo,
+)
 
 
 class CompletedWorkUpdater:
@@ -23,6 +44,18 @@ class CompletedWorkUpdater:
     rules, and caches payment amounts (local currency + USD).
     """
 
+    SAVED_FIELDS = [
+        "reason",
+        "status",
+        "status_modified_date",
+        "saved_completed_count",
+        "saved_approved_count",
+        "saved_payment_accrued",
+        "saved_payment_accrued_usd",
+        "saved_org_payment_accrued",
+        "saved_org_payment_accrued_usd",
+    ]
+
     def __init__(self, opportunity_access: OpportunityAccess, completed_works, compute_payment=True):
         self.opportunity_access = opportunity_access
         self.opportunity = opportunity_access.opportunity
@@ -204,6 +237,9 @@ class CompletedWorkUpdater:
             updated = True
         return updated
 
+    def _get_saved_values(self, completed_work):
+        return tuple(getattr(completed_work, field) for field in self.SAVED_FIELDS)
+
     def update_status_and_set_saved_fields(self):
         self._get_completed_work_counts()
 
@@ -215,31 +251,171 @@ class CompletedWorkUpdater:
             if not has_visits:
                 continue
 
+            saved_values = self._get_saved_values(completed_work)
             status_updated = self._update_status(completed_work)
 
             payment_updated = False
             if completed_count >= 1:
                 payment_updated = self._update_payment(completed_work)
 
-            if status_updated or payment_updated:
+            # works whose saved fields are unchanged are not written, so their ledger rows stay valid
+            if (status_updated or payment_updated) and self._get_saved_values(completed_work) != saved_values:
                 to_update.append(completed_work)
 
-        CompletedWork.objects.bulk_update(
-            to_update,
-            fields=[
-                "reason",
-                "status",
-                "status_modified_date",
-                "saved_completed_count",
-                "saved_approved_count",
-                "saved_payment_accrued",
-                "saved_payment_accrued_usd",
-                "saved_org_payment_accrued",
-                "saved_org_payment_accrued_usd",
-            ],
-        )
+        if not to_update:
+            return
+
+        with transaction.atomic():
+            CompletedWork.objects.bulk_update(to_update, fields=self.SAVED_FIELDS)
+            refresh_payment_ledger(
+                [self.opportunity_access.id], {completed_work.payment_unit_id for completed_work in to_update}
+            )
+
+
+class OpportunityCompletedWorkUpdater(PaymentUnitHierarchy):
+    """Recalculates status and payment for the CompletedWork records of an opportunity.
+
+    Produces the same results as running CompletedWorkUpdater for each user, but reads the visit
+    counts of all works from a single grouped query over the visits instead of loading the visits
+    and child works of each work, and writes the results back in bulk.
+    """
 
+    SAVED_FIELDS = CompletedWorkUpdater.SAVED_FIELDS
+
+    def __init__(self, opportunity: Opportunity, completed_works=None):
+        super().__init__()
+        self.opportunity = opportunity
+        if completed_works is None:
+            completed_works = CompletedWork.objects.filter(opportunity_access__opportunity=opportunity)
+        self.completed_works = completed_works.filter(opportunity_access__opportunity=opportunity)
+        self.access_ids = self.completed_works.values("opportunity_access_id")
+        self.batch_payment_units = defaultdict(set)
+        self.exchange_rates = {}
+
+    def _load(self):
+        works = list(self.completed_works.select_related("payment_unit"))
+        for work in works:
+            self.batch_work_ids.add(work.id)
+            self.batch_payment_units[work.opportunity_access_id].add(work.payment_unit_id)
+        self.load(self.access_ids, opportunity_ids=[self.opportunity.id])
+        return works
+
+    def _get_child_payment_units(self, access_id, payment_unit_id, in_batch):
+        child_payment_units = self.child_payment_units[payment_unit_id]
+        if in_batch:
+            # CompletedWorkUpdater only knows of the child payment units with work in the batch of the user
+            child_payment_units = [pu for pu in child_payment_units if pu in self.batch_payment_units[access_id]]
+        return child_payment_units
+
+    def _is_completed_work_approved(self, completed_work):
+        unit_counts = self.visit_counts[completed_work.id]
+        required, optional = self.deliver_units[completed_work.payment_unit_id]
+
+        def is_delivery_approved(deliver_id):
+            counts = unit_counts.get(deliver_id, {})
+            return counts.get("approved", 0) > 0 and counts.get("agree", 0) > 0
+
+        all_required_approved = all(is_delivery_approved(deliver_id) for deliver_id in required)
+        if not optional:
+            return all_required_approved
+        return all_required_approved and any(is_delivery_approved(deliver_id) for deliver_id in optional)
+
+    def _get_rejection_reasons(self, works):
+        rejected_work_ids = [
+            work.id
+            for work in works
+            if any(counts["rejected"] for counts in self.visit_counts.get(work.id, {}).values())
+        ]
+        reasons = defaultdict(list)
+        if rejected_work_ids:
+            visits = UserVisit.objects.filter(completed_work_id__in=rejected_work_ids).order_by("id")
+            for work_id, reason in visits.values_list("completed_work_id", "reason"):
+                if reason:
+                    reasons[work_id].append(reason)
+        return {work_id: "\n".join(reasons[work_id]) for work_id in rejected_work_ids}
+
+    def _get_exchange_rate(self, rate_date):
+        from commcare_connect.opportunity.visit_import import get_exchange_rate
+
+        # rates are stored by date, so works approved on the same day share a lookup. Works approved before
+        # the status date was recorded have none and use the latest rate, like CompletedWorkUpdater
+        if rate_date is not None:
+            if settings.USE_TZ and timezone.is_aware(rate_date):
+                rate_date = timezone.make_naive(rate_date, timezone.get_default_timezone())
+            rate_date = rate_date.date()
+        if rate_date not in self.exchange_rates:
+            self.exchange_rates[rate_date] = get_exchange_rate(self.opportunity.currency_code, rate_date)
+        return self.exchange_rates[rate_date]
+
+    def _update_payment(self, completed_work, completed_count, approved_count):
+        amount_accrued = amount_accrued_usd = org_amount_accrued = org_amount_accrued_usd = 0
+        if approved_count > 0 and completed_work.status == CompletedWorkStatus.approved:
+            amount_accrued = approved_count * completed_work.payment_unit.amount
+            exchange_rate = self._get_exchange_rate(completed_work.status_modified_date)
+            amount_accrued_usd = amount_accrued / exchange_rate
+            org_amount_accrued = approved_count * completed_work.payment_unit.org_amount
+            org_amount_accrued_usd = org_amount_accrued / exchange_rate
+
+        completed_work.saved_completed_count = completed_count
+        completed_work.saved_approved_count = approved_count
+        completed_work.saved_payment_accrued = amount_accrued
+        completed_work.saved_payment_accrued_usd = amount_accrued_usd
+        completed_work.saved_org_payment_accrued = org_amount_accrued
+        completed_work.saved_org_payment_accrued_usd = org_amount_accrued_usd
+
+    def _get_saved_values(self, completed_work):
+        return tuple(getattr(completed_work, field) for field in self.SAVED_FIELDS)
+
+    def update_status_and_set_saved_fields(self, compute_payment=True):
+        works = [work for work in self._load() if self.visit_counts.get(work.id)]
+        auto_approve = self.opportunity.auto_approve_payments
+        rejection_reasons = self._get_rejection_reasons(works) if auto_approve else {}
+
+        to_update = []
+        for completed_work in works:
+            saved_values = self._get_saved_values(completed_work)
+            if auto_approve:
+                if completed_work.id in rejection_reasons:
+                    completed_work.status = CompletedWorkStatus.rejected
+                    completed_work.reason = rejection_reasons[completed_work.id]
+                elif self._is_completed_work_approved(completed_work):
+                    completed_work.status = CompletedWorkStatus.approved
+                elif completed_work.status == CompletedWorkStatus.incomplete:
+                    completed_work.status = CompletedWorkStatus.pending
+
+            completed_count = self._get_count(completed_work.id, COMPLETED, in_batch=True)
+            if compute_payment and completed_count >= 1:
+                approved_count = self._get_count(completed_work.id, APPROVED, in_batch=True)
+                self._update_payment(completed_work, completed_count, approved_count)
+
+            # as in CompletedWorkUpdater, works whose saved fields are unchanged are not written
+            if self._get_saved_values(completed_work) != saved_values:
+                to_update.append(completed_work)
+
+        with transaction.atomic():
+            if to_update:
+                CompletedWork.objects.bulk_update(to_update, fields=self.SAVED_FIELDS, batch_size=1000)
+                refresh_payment_ledger(
+                    {completed_work.opportunity_access_id for completed_work in to_update},
+                    {completed_work.payment_unit_id for completed_work in to_update},
+                )
 
+            if compute_payment:
+                OpportunityAccess.objects.filter(id__in=self.access_ids).update(
+                    payment_accrued=ledger_payment_accrued_subquery()
+                )
+        return len(to_update)
+
+
+@exchange_rate_memo()
+def update_opportunity_status(opportunity: Opportunity, completed_works=None, compute_payment=True):
+    """Set based version of update_status for the completed works of many users of an opportunity."""
+    return OpportunityCompletedWorkUpdater(opportunity, completed_works).update_status_and_set_saved_fields(
+        compute_payment
+    )
+
+
+@exchange_rate_memo()
 def update_status(completed_works, opportunity_access, compute_payment=True):
     """
     Updates the status of completed works and optionally calculates & update total payment_accrued.
@@ -249,13 +425,8 @@ def update_status(completed_works, opportunity_access, compute_payment=True):
     """
     CompletedWorkUpdater(opportunity_access, completed_works).update_status_and_set_saved_fields()
     if compute_payment:
-        opportunity_access.payment_accrued = (
-            CompletedWork.objects.filter(opportunity_access=opportunity_access)
-            .aggregate(payment_accrued=Sum("saved_payment_accrued"))
-            .get("payment_accrued", 0)
-            or 0
-        )
-        opportunity_access.save()
+        opportunity_access.payment_accrued = get_ledger_payment_accrued(opportunity_access)
+        opportunity_access.save(update_fields=["payment_accrued"])
 
 
 def update_work_payment_date(access: OpportunityAccess):
@@ -271,23 +442,24 @@ def update_work_payment_date(access: OpportunityAccess):
 
     remaining_amount = 0
 
-    for payment in payments:
-        remaining_amount += payment.amount
+    with payment_unit_hierarchy_memo([access.id]):
+        for payment in payments:
+            remaining_amount += payment.amount
 
-        while remaining_amount >= current_work.payment_accrued:
-            current_work.payment_date = payment.date_paid
-            works_to_update.append(current_work)
-            remaining_amount -= current_work.payment_accrued
+            while remaining_amount >= current_work.payment_accrued:
+                current_work.payment_date = payment.date_paid
+                works_to_update.append(current_work)
+                remaining_amount -= current_work.payment_accrued
 
-            try:
-                current_work = next(completed_works_iter)
-            except StopIteration:
-                break
-        else:
-            continue
+                try:
+                    current_work = next(completed_works_iter)
+                except StopIteration:
+                    break
+            else:
+                continue
 
-        # we've broken out of the inner while loop so all completed_works are processed.
-        break
+            # we've broken out of the inner while loop so all completed_works are processed.
+            break
 
     if works_to_update:
         CompletedWork.objects.bulk_update(works_to_update, ["payment_date"])
@@ -309,18 +481,19 @@ def get_uninvoiced_completed_works_qs(opportunity, start_date=None, end_date=Non
 
 
 def get_invoiced_visit_items(payment_invoice):
-    completed_works_qs = CompletedWork.objects.filter(invoice=payment_invoice)
-    return get_invoice_items(completed_works_qs)
+    return get_invoice_items_from_records(get_ledger_invoice_rows(invoice=payment_invoice))
 
 
 def get_uninvoiced_visit_items(opportunity, start_date=None, end_date=None):
+    # the ledger has monthly totals, so only ranges of whole months can be read from it
+    monthly_pu_records = get_ledger_invoice_rows(opportunity, start_date=start_date, end_date=end_date)
+    if monthly_pu_records is not None:
+        return get_invoice_items_from_records(monthly_pu_records)
     completed_works_qs = get_uninvoiced_completed_works_qs(opportunity, start_date, end_date)
     return get_invoice_items(completed_works_qs)
 
 
 def get_invoice_items(completed_works_qs):
-    from commcare_connect.opportunity.visit_import import get_exchange_rate
-
     monthly_pu_records = (
         completed_works_qs.annotate(
             month_approved=TruncMonth("status_modified_date"),
@@ -337,6 +510,12 @@ def get_invoice_items(completed_works_qs):
         )
         .order_by("month_approved")
     )
+    return get_invoice_items_from_records(monthly_pu_records)
+
+
+@exchange_rate_memo()
+def get_invoice_items_from_records(monthly_pu_records):
+    from commcare_connect.opportunity.visit_import import get_exchange_rate
 
     exchange_rates_by_month = {}
     invoice_items = []
@@ -373,6 +552,50 @@ def get_invoice_items(completed_works_qs):
     return invoice_items
 
 
+def link_service_delivery_invoices(invoices, end_date):
+    """Link each invoice to the approved uninvoiced works of its opportunity up to ``end_date``, with one
+    UPDATE of the works and one of the ledger for all the invoices. Each opportunity may have one invoice."""
+    invoice_ids = [invoice.id for invoice in invoices]
+    opportunity_ids = [invoice.opportunity_id for invoice in invoices]
+    invoices = PaymentInvoice.objects.filter(id__in=invoice_ids)
+    with transaction.atomic():
+        CompletedWork.objects.filter(
+            opportunity_access__opportunity_id__in=opportunity_ids,
+            status=CompletedWorkStatus.approved,
+            invoice__isnull=True,
+            status_modified_date__date__lte=end_date,
+        ).update(
+            invoice=Subquery(
+                invoices.filter(opportunity__opportunityaccess=OuterRef("opportunity_access_id")).values("id")[:1]
+            )
+        )
+        PaymentAccruedLedger.objects.filter(
+            opportunity_id__in=opportunity_ids,
+            status=CompletedWorkStatus.approved,
+            invoice__isnull=True,
+            month__lte=end_date,
+        ).update(invoice=Subquery(invoices.filter(opportunity_id=OuterRef("opportunity_id")).values("id")[:1]))
+
+
 def link_invoice_to_completed_works(invoice, start_date=None, end_date=None):
     completed_works_qs = get_uninvoiced_completed_works_qs(invoice.opportunity, start_date, end_date)
-    completed_works_qs.update(invoice=invoice)
+    with transaction.atomic():
+        access_ids = set(completed_works_qs.values_list("opportunity_access_id", flat=True))
+        completed_works_qs.update(invoice=invoice)
+        refresh_payment_ledger(access_ids)
+
+
+def update_payment_accrued_for_user(opportunity_access, incremental):
+    filter_kwargs = {}
+    exclude_status = []
+    if incremental:
+        exclude_status.append(CompletedWorkStatus.approved)
+        filter_kwargs["saved_approved_count"] = 0
+
+    with cache.lock(f"update_payment_accrued_lock_{opportunity_access.id}", timeout=900):
+        completed_works = (
+            opportunity_access.completedwork_set.filter(**filter_kwargs)
+            .exclude(status__in=exclude_status)
+            .select_related("payment_unit")
+        )
+        update_status(completed_works, opportunity_access, compute_payment=True)
@@ -0,0 +1,49 @@
+from collections.abc import Iterable
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from commcare_connect.opportunity.models import CompletedModule, LearnModule, Opportunity, OpportunityAccess
+
+
+def record_completed_modules(access: OpportunityAccess, module_ids: Iterable[int]):
+    """Count the modules a user completes for the first time. Must be called with the access
+    row locked, before the completed modules are created."""
+    module_ids = set(module_ids)
+    completed = CompletedModule.objects.filter(opportunity_access=access, module_id__in=module_ids)
+    new_module_count = len(module_ids - set(completed.values_list("module_id", flat=True)))
+    if new_module_count:
+        OpportunityAccess.objects.filter(pk=access.pk).update(
+            learn_modules_completed=F("learn_modules_completed") + new_module_count
+        )
+        access.learn_modules_completed += new_module_count
+
+
+def update_learn_modules_total(app_id: int):
+    """Update the number of learn modules for the users of opportunities using the learn app."""
+    total = LearnModule.objects.filter(app_id=app_id).count()
+    OpportunityAccess.objects.filter(opportunity__learn_app_id=app_id).exclude(learn_modules_total=total).update(
+        learn_modules_total=total
+    )
+
+
+def refresh_learn_modules_completed(access_id: int):
+    OpportunityAccess.objects.filter(pk=access_id).update(learn_modules_completed=_modules_completed_subquery())
+
+
+def rebuild_learn_progress(opportunity: Opportunity) -> int:
+    """Recalculate the learn module counts of all users of an opportunity from their completed modules."""
+    total = LearnModule.objects.filter(app_id=opportunity.learn_app_id).count()
+    return OpportunityAccess.objects.filter(opportunity=opportunity).update(
+        learn_modules_total=total, learn_modules_completed=_modules_completed_subquery()
+    )
+
+
+def _modules_completed_subquery():
+    modules_completed = (
+        CompletedModule.objects.filter(opportunity_access_id=OuterRef("pk"))
+        .values("opportunity_access_id")
+        .annotate(count=Count("module_id", distinct=True))
+        .values("count")
+    )
+    return Coalesce(Subquery(modules_completed), Value(0))
@@ -0,0 +1,148 @@
+import datetime
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from commcare_connect.opportunity.models import (
+    CompletedWork,
+    CompletedWorkStatus,
+    Opportunity,
+    OpportunityAccess,
+    PaymentAccruedLedger,
+)
+
+LEDGER_KEY_FIELDS = ("opportunity_access_id", "payment_unit_id", "status", "invoice_id")
+
+
+def refresh_payment_ledger(access_ids: Iterable[int] | QuerySet, payment_unit_ids: Iterable[int] | None = None):
+    """Rebuild the ledger rows of the users with the given access ids from their CompletedWork.
+    ``access_ids`` may be a queryset of ids, which is used as a subquery. With ``payment_unit_ids``
+    only the rows of those payment units are rebuilt, which covers any change to works of the units
+    as the payment unit of a work never changes."""
+    with transaction.atomic(savepoint=False):
+        # lock the users so concurrent refreshes of a user do not interleave
+        locked_ids = list(
+            OpportunityAccess.objects.select_for_update()
+            .filter(id__in=access_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not locked_ids:
+            return
+        ledger_rows = PaymentAccruedLedger.objects.filter(opportunity_access_id__in=locked_ids)
+        completed_works = CompletedWork.objects.filter(opportunity_access_id__in=locked_ids)
+        if payment_unit_ids is not None:
+            payment_unit_ids = set(payment_unit_ids)
+            ledger_rows = ledger_rows.filter(payment_unit_id__in=payment_unit_ids)
+            completed_works = completed_works.filter(payment_unit_id__in=payment_unit_ids)
+        ledger_rows.delete()
+
+        totals = (
+            completed_works.annotate(
+                month=TruncMonth("status_modified_date", output_field=DateField()),
+                opportunity_id=F("opportunity_access__opportunity_id"),
+                currency_id=F("opportunity_access__opportunity__currency_id"),
+            )
+            .values(*LEDGER_KEY_FIELDS, "month", "opportunity_id", "currency_id")
+            .annotate(
+                works=Count("id"),
+                approved_count=Sum("saved_approved_count"),
+                payment_accrued=Sum("saved_payment_accrued"),
+                payment_accrued_usd=Sum("saved_payment_accrued_usd"),
+                org_payment_accrued=Sum("saved_org_payment_accrued"),
+                org_payment_accrued_usd=Sum("saved_org_payment_accrued_usd"),
+            )
+            .order_by()
+        )
+        PaymentAccruedLedger.objects.bulk_create([PaymentAccruedLedger(**row) for row in totals], batch_size=1000)
+
+
+def get_ledger_payment_accrued(access: OpportunityAccess) -> int:
+    total = PaymentAccruedLedger.objects.filter(opportunity_access=access).aggregate(total=Sum("payment_accrued"))
+    return total["total"] or 0
+
+
+def ledger_payment_accrued_subquery():
+    """Total payment accrued of the OpportunityAccess in the outer query."""
+    payment_accrued = (
+        PaymentAccruedLedger.objects.filter(opportunity_access_id=OuterRef("pk"))
+        .values("opportunity_access_id")
+        .annotate(total=Sum("payment_accrued"))
+        .values("total")
+    )
+    return Coalesce(Subquery(payment_accrued), Value(0))
+
+
+def get_ledger_invoice_rows(
+    opportunity: Opportunity | None = None,
+    invoice=None,
+    start_date: datetime.date | None = None,
+    end_date: datetime.date | None = None,
+):
+    """Invoice line item totals by payment unit and month from the ledger, either of the works linked to
+    ``invoice`` or of the approved uninvoiced works of ``opportunity`` in whole months from ``start_date``
+    to ``end_date``. Returns None if the dates do not cover whole months, which the ledger cannot answer."""
+    if invoice is not None:
+        rows = PaymentAccruedLedger.objects.filter(invoice=invoice)
+    else:
+        if start_date and start_date.day != 1:
+            return None
+        if end_date and (end_date + datetime.timedelta(days=1)).day != 1:
+            return None
+        rows = PaymentAccruedLedger.objects.filter(
+            opportunity=opportunity, status=CompletedWorkStatus.approved, invoice__isnull=True
+        )
+        if start_date:
+            rows = rows.filter(month__gte=start_date)
+        if end_date:
+            rows = rows.filter(month__lte=end_date)
+
+    return _group_invoice_rows(rows)
+
+
+def get_ledger_uninvoiced_rows_by_opportunity(opportunities: QuerySet, end_date: datetime.date) -> dict[int, list]:
+    """Invoice line item totals by payment unit and month of the approved uninvoiced works of each of the
+    opportunities, up to the month of ``end_date``, read with one grouped query."""
+    rows = PaymentAccruedLedger.objects.filter(
+        opportunity__in=opportunities,
+        status=CompletedWorkStatus.approved,
+        invoice__isnull=True,
+        month__lte=end_date,
+    )
+    rows_by_opportunity = defaultdict(list)
+    for row in _group_invoice_rows(rows, "opportunity_id"):
+        rows_by_opportunity[row["opportunity_id"]].append(row)
+    return rows_by_opportunity
+
+
+def _group_invoice_rows(rows, *group_by):
+    rows = (
+        rows.values(*group_by, "payment_unit", "month")
+        .annotate(
+            payment_unit_name=F("payment_unit__name"),
+            record_count=Sum("approved_count"),
+            currency_code=F("currency_id"),
+            flw_amount_local=Sum("payment_accrued"),
+            org_amount_local=Sum("org_payment_accrued"),
+            flw_amount_usd=Sum("payment_accrued_usd"),
+            org_amount_usd=Sum("org_payment_accrued_usd"),
+        )
+        .order_by("month")
+    )
+    # months are returned as the start of the month in the current timezone, like TruncMonth
+    return [
+        {
+            **row,
+            "currency": row["currency_code"],
+            "month_approved": (
+                timezone.make_aware(datetime.datetime.combine(row["month"], datetime.time.min))
+                if row["month"]
+                else None
+            ),
+        }
+        for row in rows
+    ]
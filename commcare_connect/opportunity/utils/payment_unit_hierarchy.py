@@ -0,0 +1,159 @@
+"""In memory evaluation of completed and approved counts across the payment unit hierarchy.
+
+The completed and approved counts of a CompletedWork are capped by the counts of the works of its
+child payment units, which the model properties load with queries for every work at every level of
+the hierarchy. PaymentUnitHierarchy loads the payment units and deliver units of the opportunities
+and the visit counts of the works of a set of users once, and evaluates all counts in memory.
+
+Inside ``payment_unit_hierarchy_memo`` the CompletedWork count properties read from a shared
+evaluator, which loads the works of a user the first time one of them is read. Only use the memo
+where the visits are not changed while it is active, such as tables and exports.
+"""
+
+import contextlib
+import contextvars
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.db.models import Count, Q, QuerySet
+
+from commcare_connect.opportunity.models import (
+    CompletedWork,
+    DeliverUnit,
+    OpportunityAccess,
+    PaymentUnit,
+    UserVisit,
+    VisitReviewStatus,
+    VisitValidationStatus,
+)
+
+COMPLETED = "total"
+APPROVED = "agree"
+
+_current_hierarchy = contextvars.ContextVar("payment_unit_hierarchy", default=None)
+
+
+class PaymentUnitHierarchy:
+    def __init__(self):
+        # deliver unit id -> {"total", "approved", "agree", "rejected"} visit counts, by work
+        self.visit_counts = defaultdict(dict)
+        self.work_keys = {}
+        self.works_by_key = defaultdict(list)
+        self.child_payment_units = defaultdict(list)
+        self.deliver_units = defaultdict(lambda: ([], []))
+        self.loaded_opportunity_ids = set()
+        self.batch_work_ids = set()
+        self._counts = {}
+
+    def load(self, access_ids: Iterable[int] | QuerySet, opportunity_ids: Iterable[int] | None = None):
+        """Load the works and visit counts of the users with the given access ids. ``access_ids`` may be
+        a queryset of ids, which is used as a subquery."""
+        if opportunity_ids is None:
+            opportunity_ids = (
+                OpportunityAccess.objects.filter(id__in=access_ids).values_list("opportunity_id", flat=True).distinct()
+            )
+        self._load_payment_units(set(opportunity_ids))
+
+        user_works = CompletedWork.objects.filter(opportunity_access_id__in=access_ids)
+        for work_id, access_id, entity_id, payment_unit_id in user_works.values_list(
+            "id", "opportunity_access_id", "entity_id", "payment_unit_id"
+        ):
+            if work_id not in self.work_keys:
+                self.work_keys[work_id] = (access_id, entity_id, payment_unit_id)
+                self.works_by_key[(access_id, entity_id, payment_unit_id)].append(work_id)
+            self.visit_counts.pop(work_id, None)
+
+        approved = Q(status=VisitValidationStatus.approved)
+        visit_counts = (
+            UserVisit.objects.filter(completed_work__opportunity_access_id__in=access_ids)
+            .values("completed_work_id", "deliver_unit_id")
+            .annotate(
+                total=Count("id"),
+                approved=Count("id", filter=approved),
+                agree=Count("id", filter=approved & Q(review_status=VisitReviewStatus.agree)),
+                rejected=Count("id", filter=Q(status=VisitValidationStatus.rejected)),
+            )
+        )
+        for row in visit_counts:
+            self.visit_counts[row["completed_work_id"]][row["deliver_unit_id"]] = row
+        self._counts.clear()
+
+    def _load_payment_units(self, opportunity_ids: set[int]):
+        opportunity_ids = opportunity_ids - self.loaded_opportunity_ids
+        if not opportunity_ids:
+            return
+        payment_units = PaymentUnit.objects.filter(
+            opportunity_id__in=opportunity_ids, parent_payment_unit__isnull=False
+        )
+        for payment_unit_id, parent_id in payment_units.values_list("id", "parent_payment_unit_id"):
+            self.child_payment_units[parent_id].append(payment_unit_id)
+
+        deliver_units = DeliverUnit.objects.filter(payment_unit__opportunity_id__in=opportunity_ids)
+        for deliver_id, payment_unit_id, is_optional in deliver_units.values_list("id", "payment_unit_id", "optional"):
+            required, optional = self.deliver_units[payment_unit_id]
+            (optional if is_optional else required).append(deliver_id)
+        self.loaded_opportunity_ids |= opportunity_ids
+
+    def completed_count(self, completed_work: CompletedWork) -> int:
+        self._ensure_loaded(completed_work)
+        return self._get_count(completed_work.id, COMPLETED)
+
+    def approved_count(self, completed_work: CompletedWork) -> int:
+        self._ensure_loaded(completed_work)
+        return self._get_count(completed_work.id, APPROVED)
+
+    def _ensure_loaded(self, completed_work: CompletedWork):
+        if completed_work.id not in self.work_keys:
+            self.load([completed_work.opportunity_access_id])
+
+    def _get_child_payment_units(self, access_id, payment_unit_id, in_batch):
+        return self.child_payment_units[payment_unit_id]
+
+    def _get_count(self, work_id, key, in_batch=False):
+        """Count of the visits of a work, where ``key`` is COMPLETED or APPROVED, taking the minimum
+        across required deliver units, capped by the optional deliver units and by the counts of the
+        works of the child payment units for the same entity."""
+        cache_key = (work_id, key, in_batch)
+        if cache_key in self._counts:
+            return self._counts[cache_key]
+
+        access_id, entity_id, payment_unit_id = self.work_keys[work_id]
+        unit_counts = self.visit_counts.get(work_id, {})
+        required, optional = self.deliver_units[payment_unit_id]
+        count = min([unit_counts.get(deliver_id, {}).get(key, 0) for deliver_id in required], default=0)
+        if optional:
+            count = min(count, sum(unit_counts.get(deliver_id, {}).get(key, 0) for deliver_id in optional))
+
+        child_payment_units = self._get_child_payment_units(access_id, payment_unit_id, in_batch)
+        if child_payment_units:
+            child_count = sum(
+                self._get_count(child_id, key, child_id in self.batch_work_ids)
+                for child_payment_unit_id in child_payment_units
+                for child_id in self.works_by_key[(access_id, entity_id, child_payment_unit_id)]
+            )
+            count = min(count, child_count)
+
+        self._counts[cache_key] = count
+        return count
+
+
+def get_payment_unit_hierarchy() -> PaymentUnitHierarchy | None:
+    return _current_hierarchy.get()
+
+
+@contextlib.contextmanager
+def payment_unit_hierarchy_memo(access_ids: Iterable[int] | QuerySet | None = None):
+    """Evaluate CompletedWork counts with a shared PaymentUnitHierarchy for the duration of the block,
+    optionally loading the works of the given users up front. Nested blocks share the outer memo."""
+    hierarchy = _current_hierarchy.get()
+    token = None
+    if hierarchy is None:
+        hierarchy = PaymentUnitHierarchy()
+        token = _current_hierarchy.set(hierarchy)
+    try:
+        if access_ids is not None:
+            hierarchy.load(access_ids)
+        yield hierarchy
+    finally:
+        if token is not None:
+            _current_hierarchy.reset(token)
@@ -0,0 +1,125 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localtime
+
+from commcare_connect.opportunity.models import (
+    DeliverUnit,
+    OpportunityAccess,
+    OpportunityClaimLimit,
+    UserVisit,
+    UserVisitCounter,
+    VisitCounterType,
+    VisitValidationStatus,
+)
+
+UNCOUNTED_VISIT_STATUSES = [VisitValidationStatus.over_limit, VisitValidationStatus.trial]
+
+
+def get_visit_day(visit_date: datetime.datetime) -> datetime.date:
+    return localtime(visit_date).date()
+
+
+def _counter_keys(visit_date: datetime.datetime, entity_id: str | None) -> dict[str, str]:
+    return {
+        VisitCounterType.TOTAL: "",
+        VisitCounterType.DAILY: get_visit_day(visit_date).isoformat(),
+        VisitCounterType.ENTITY: entity_id or "",
+    }
+
+
+def _counters_filter(keys: dict[str, str]) -> Q:
+    query = Q()
+    for counter_type, key in keys.items():
+        query |= Q(counter_type=counter_type, key=key)
+    return query
+
+
+def get_visit_counts(
+    access: OpportunityAccess, deliver_unit: DeliverUnit, visit_date: datetime.datetime, entity_id: str | None
+) -> dict[str, int]:
+    """Return the total, daily and entity visit counts used for the visit limit checks."""
+    keys = _counter_keys(visit_date, entity_id)
+    counts = dict.fromkeys(keys, 0)
+    counters = UserVisitCounter.objects.filter(opportunity_access=access, deliver_unit=deliver_unit).filter(
+        _counters_filter(keys)
+    )
+    for counter_type, count in counters.values_list("counter_type", "count"):
+        counts[counter_type] = count
+    return counts
+
+
+def increment_visit_counters(
+    access: OpportunityAccess, deliver_unit: DeliverUnit, visit_date: datetime.datetime, entity_id: str | None
+):
+    """Count a new visit. Must be called in the transaction that creates the visit while the
+    claim limit row for the payment unit is locked."""
+    keys = _counter_keys(visit_date, entity_id)
+    counters = UserVisitCounter.objects.filter(opportunity_access=access, deliver_unit=deliver_unit).filter(
+        _counters_filter(keys)
+    )
+    if counters.update(count=F("count") + 1) == len(keys):
+        return
+    existing = set(counters.values_list("counter_type", flat=True))
+    UserVisitCounter.objects.bulk_create(
+        [
+            UserVisitCounter(
+                opportunity_access=access, deliver_unit=deliver_unit, counter_type=counter_type, key=key, count=1
+            )
+            for counter_type, key in keys.items()
+            if counter_type not in existing
+        ]
+    )
+
+
+def decrement_visit_counters(visit: UserVisit):
+    """Remove a deleted visit from the counts."""
+    if visit.status in UNCOUNTED_VISIT_STATUSES or visit.opportunity_access_id is None:
+        return
+    keys = _counter_keys(visit.visit_date, visit.entity_id)
+    UserVisitCounter.objects.filter(
+        opportunity_access_id=visit.opportunity_access_id, deliver_unit_id=visit.deliver_unit_id, count__gt=0
+    ).filter(_counters_filter(keys)).update(count=F("count") - 1)
+
+
+def rebuild_visit_counters(access: OpportunityAccess):
+    """Recalculate the visit counters of a user from their visits."""
+    with transaction.atomic():
+        # block form processing for the user while the counters are rebuilt
+        list(OpportunityClaimLimit.objects.select_for_update().filter(opportunity_claim__opportunity_access=access))
+        visits = UserVisit.objects.filter(opportunity_access=access).exclude(status__in=UNCOUNTED_VISIT_STATUSES)
+        counters = []
+        for row in visits.values("deliver_unit_id").annotate(count=Count("*")):
+            counters.append(_counter(access, row["deliver_unit_id"], VisitCounterType.TOTAL, "", row["count"]))
+        daily_counts = visits.annotate(day=TruncDate("visit_date")).values("deliver_unit_id", "day")
+        for row in daily_counts.annotate(count=Count("*")):
+            counters.append(
+                _counter(access, row["deliver_unit_id"], VisitCounterType.DAILY, row["day"].isoformat(), row["count"])
+            )
+        for row in visits.values("deliver_unit_id", "entity_id").annotate(count=Count("*")):
+            counters.append(
+                _counter(access, row["deliver_unit_id"], VisitCounterType.ENTITY, row["entity_id"] or "", row["count"])
+            )
+
+        UserVisitCounter.objects.filter(opportunity_access=access).delete()
+        # entity ids of None and "" share a counter
+        UserVisitCounter.objects.bulk_create(_merge_counters(counters))
+
+
+def _counter(access, deliver_unit_id, counter_type, key, count):
+    return UserVisitCounter(
+        opportunity_access=access, deliver_unit_id=deliver_unit_id, counter_type=counter_type, key=key, count=count
+    )
+
+
+def _merge_counters(counters):
+    merged = {}
+    for counter in counters:
+        counter_key = (counter.deliver_unit_id, counter.counter_type, counter.key)
+        if counter_key in merged:
+            merged[counter_key].count += counter.count
+        else:
+            merged[counter_key] = counter
+    return list(merged.values())
@@ -0,0 +1,163 @@
+"""Compiled verification rules used when validating form submissions.
+
+The rules for an opportunity (verification flags, deliver unit flag rules and form JSON
+validation rules) are loaded once and cached per opportunity. The raw rule data is stored in
+Redis and the compiled rules, including the parsed jsonpath expressions, are kept in a
+process-local LRU cache. Both are keyed by a version stamp stored in Redis, which is replaced
+whenever one of the rule models is saved or deleted.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.forms.models import model_to_dict
+from jsonpath_ng.ext import parse
+
+from commcare_connect.opportunity.models import (
+    DeliverUnitFlagRules,
+    FormJsonValidationRules,
+    OpportunityVerificationFlags,
+)
+
+RULES_CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_MAX_SIZE = 256
+
+_local_cache = OrderedDict()
+_local_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DeliverUnitRule:
+    check_attachments: bool
+    duration: int
+
+
+@dataclass(frozen=True)
+class FormJsonRule:
+    name: str
+    question_value: str
+    json_path: object
+
+    def matches(self, form_json: dict) -> bool:
+        return any(match.value == self.question_value for match in self.json_path.find(form_json))
+
+
+@dataclass(frozen=True)
+class VerificationRules:
+    version: str
+    flags: OpportunityVerificationFlags
+    deliver_unit_rules: dict[int, DeliverUnitRule] = field(default_factory=dict)
+    form_json_rules: dict[int, list[FormJsonRule]] = field(default_factory=dict)
+
+    def get_deliver_unit_rule(self, deliver_unit_id: int) -> DeliverUnitRule | None:
+        return self.deliver_unit_rules.get(deliver_unit_id)
+
+    def get_form_json_rules(self, deliver_unit_id: int) -> list[FormJsonRule]:
+        return self.form_json_rules.get(deliver_unit_id, [])
+
+
+def _version_key(opportunity_id):
+    return f"verification_rules_version:{opportunity_id}"
+
+
+def _rules_key(opportunity_id, version):
+    return f"verification_rules:{opportunity_id}:{version}"
+
+
+def get_verification_rules(opportunity_id: int) -> VerificationRules:
+    version = _get_version(opportunity_id)
+    with _local_cache_lock:
+        rules = _local_cache.get(opportunity_id)
+        if rules is not None and rules.version == version:
+            _local_cache.move_to_end(opportunity_id)
+            return rules
+
+    rules_data = cache.get(_rules_key(opportunity_id, version))
+    if rules_data is None:
+        rules_data = _load_rules_data(opportunity_id)
+        cache.set(_rules_key(opportunity_id, version), rules_data, RULES_CACHE_TIMEOUT)
+    rules = _compile_rules(version, rules_data)
+
+    with _local_cache_lock:
+        _local_cache[opportunity_id] = rules
+        _local_cache.move_to_end(opportunity_id)
+        while len(_local_cache) > LOCAL_CACHE_MAX_SIZE:
+            _local_cache.popitem(last=False)
+    return rules
+
+
+def invalidate_verification_rules(opportunity_id: int):
+    """Replace the version stamp so that all processes reload the rules.
+
+    The stamp is replaced again once the transaction commits so that rules loaded
+    by another process before the change was committed are not reused."""
+    _bump_version(opportunity_id)
+    transaction.on_commit(partial(_bump_version, opportunity_id))
+
+
+def _bump_version(opportunity_id):
+    cache.set(_version_key(opportunity_id), uuid4().hex, timeout=None)
+
+
+def _get_version(opportunity_id):
+    version = cache.get(_version_key(opportunity_id))
+    if version is None:
+        cache.add(_version_key(opportunity_id), uuid4().hex, timeout=None)
+        # when the cache is unavailable this is None and the rules are always reloaded
+        version = cache.get(_version_key(opportunity_id)) or uuid4().hex
+    return version
+
+
+def _load_rules_data(opportunity_id):
+    flags = OpportunityVerificationFlags.objects.filter(opportunity_id=opportunity_id).first()
+    if flags is None:
+        flags = OpportunityVerificationFlags(opportunity_id=opportunity_id)
+    deliver_unit_rules = DeliverUnitFlagRules.objects.filter(opportunity_id=opportunity_id).values(
+        "deliver_unit_id", "check_attachments", "duration"
+    )
+    form_json_rules = FormJsonValidationRules.objects.filter(opportunity_id=opportunity_id).prefetch_related(
+        "deliver_unit"
+    )
+    return {
+        "flags": model_to_dict(flags, exclude=["id", "opportunity"]),
+        "deliver_unit_rules": list(deliver_unit_rules),
+        "form_json_rules": [
+            {
+                "name": rule.name,
+                "question_path": rule.question_path,
+                "question_value": rule.question_value,
+                "deliver_unit_ids": [deliver_unit.id for deliver_unit in rule.deliver_unit.all()],
+            }
+            for rule in form_json_rules
+        ],
+    }
+
+
+def _compile_rules(version, rules_data):
+    deliver_unit_rules = {
+        rule["deliver_unit_id"]: DeliverUnitRule(
+            check_attachments=rule["check_attachments"],
+            duration=rule["duration"],
+        )
+        for rule in rules_data["deliver_unit_rules"]
+    }
+    form_json_rules = {}
+    for rule in rules_data["form_json_rules"]:
+        compiled_rule = FormJsonRule(
+            name=rule["name"],
+            question_value=rule["question_value"],
+            json_path=parse(f"$.{rule['question_path']}"),
+        )
+        for deliver_unit_id in rule["deliver_unit_ids"]:
+            form_json_rules.setdefault(deliver_unit_id, []).append(compiled_rule)
+    return VerificationRules(
+        version=version,
+        flags=OpportunityVerificationFlags(**rules_data["flags"]),
+        deliver_unit_rules=deliver_unit_rules,
+        form_json_rules=form_json_rules,
+    )
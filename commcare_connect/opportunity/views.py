@@ -189,6 +189,8 @@ from commcare_connect.opportunity.utils.completed_work import (
     get_uninvoiced_visit_items,
 )
 from commcare_connect.opportunity.utils.invoice import InvoiceWorkflow
+from commcare_connect.opportunity.utils.payment_unit_hierarchy import payment_unit_hierarchy_memo
+from commcare_connect.opportunity.utils.visit_counters import UNCOUNTED_VISIT_STATUSES, rebuild_visit_counters
 from commcare_connect.opportunity.visit_import import (
     ImportException,
     bulk_update_catchments,
@@ -566,14 +568,23 @@ def review_visit_export(request, org_slug, opp_id):
     return redirect(f"{redirect_url}?export_task_id={result.id}")
 
 
+def _get_export_opportunity_id(args, kwargs):
+    """Opportunity of an export task, from the arguments stored with its state. Export tasks take the
+    opportunity id as their first argument, or as a keyword where the first argument is fixed, like the
+    task joining the parts of a visit export."""
+    if kwargs and "opportunity_id" in kwargs:
+        return kwargs["opportunity_id"]
+    if not args:
+        raise Http404("Export not found.")
+    return args[0]
+
+
 @org_member_required
 @require_GET
 def export_status(request, org_slug, task_id):
     def ownership_check(request, task_meta):
-        args = task_meta.get("args") or []
-        if not args:
-            raise Http404("Export not found.")
-        get_opportunity_or_404(org_slug=org_slug, pk=args[0])
+        opportunity_id = _get_export_opportunity_id(task_meta.get("args"), task_meta.get("kwargs"))
+        get_opportunity_or_404(org_slug=org_slug, pk=opportunity_id)
 
     return render_export_status(
         request,
@@ -587,10 +598,9 @@ def export_status(request, org_slug, task_id):
 @org_member_required
 @require_GET
 def download_export(request, org_slug, task_id):
-    args = AsyncResult(task_id).args or []
-    if not args:
-        raise Http404("Export not found.")
-    opportunity = get_opportunity_or_404(org_slug=org_slug, pk=args[0])
+    task = AsyncResult(task_id)
+    opportunity_id = _get_export_opportunity_id(task.args, task.kwargs)
+    opportunity = get_opportunity_or_404(org_slug=org_slug, pk=opportunity_id)
     op_slug = slugify(opportunity.name)
     return download_export_file(
         task_id=task_id,
@@ -1057,7 +1067,15 @@ def approve_visits(request, org_slug, opp_id):
         .filter(~Q(status=VisitValidationStatus.approved) | Q(review_status=VisitReviewStatus.disagree))
         .prefetch_related("opportunity")
         .select_related("work_area", "work_area__opportunity_access")
-        .only("status", "review_status", "flagged", "justification", "review_created_on", "work_area")
+        .only(
+            "status",
+            "review_status",
+            "flagged",
+            "justification",
+            "review_created_on",
+            "work_area",
+            "opportunity_access",
+        )
     )
 
     if len(visits) > max(PAGE_SIZE_OPTIONS):
@@ -1067,8 +1085,11 @@ def approve_visits(request, org_slug, opp_id):
         )
 
     work_areas_to_update = []
+    recount_access_ids = set()
     today = now()
     for visit in visits:
+        if visit.status in UNCOUNTED_VISIT_STATUSES:
+            recount_access_ids.add(visit.opportunity_access_id)
         visit.status = VisitValidationStatus.approved
         visit.review_created_on = today
         if visit.review_status == VisitReviewStatus.disagree:
@@ -1086,9 +1107,13 @@ def approve_visits(request, org_slug, opp_id):
             work_areas_to_update.append(visit.work_area)
 
     user_ids = list(visits.values_list("user_id", flat=True).distinct())
-    approved_count = UserVisit.objects.bulk_update(
-        visits, ["status", "review_created_on", "review_status", "justification"]
-    )
+    with transaction.atomic():
+        approved_count = UserVisit.objects.bulk_update(
+            visits, ["status", "review_created_on", "review_status", "justification"]
+        )
+        # approved over limit and trial visits now count towards the visit limits
+        for access in OpportunityAccess.objects.filter(id__in=recount_access_ids):
+            rebuild_visit_counters(access)
     if user_ids:
         update_payment_accrued(opportunity=request.opportunity, users=user_ids, incremental=True)
     send_event_to_ga(request, Event("bulk_approve_confirm", {"updated": approved_count, "total": len(visit_ids)}))
@@ -1114,9 +1139,15 @@ def reject_visits(request, org_slug=None, opp_id=None):
             headers={"HX-Trigger": "form_error"},
         )
 
-    updated_count = visits.exclude(
-        Q(status=VisitValidationStatus.rejected) | Q(review_status=VisitReviewStatus.agree)
-    ).update(status=VisitValidationStatus.rejected, reason=reason)
+    to_reject = visits.exclude(Q(status=VisitValidationStatus.rejected) | Q(review_status=VisitReviewStatus.agree))
+    with transaction.atomic():
+        recount_access_ids = set(
+            to_reject.filter(status__in=UNCOUNTED_VISIT_STATUSES).values_list("opportunity_access_id", flat=True)
+        )
+        updated_count = to_reject.update(status=VisitValidationStatus.rejected, reason=reason)
+        # rejected over limit and trial visits now count towards the visit limits
+        for access in OpportunityAccess.objects.filter(id__in=recount_access_ids):
+            rebuild_visit_counters(access)
     if visits.exists():
         user_ids = visits.values_list("user_id", flat=True).distinct()
         update_payment_accrued(opportunity=request.opportunity, users=user_ids)
@@ -1322,9 +1353,10 @@ class OpportunityCompletedWorkTable(OrganizationUserMixin, OpportunityObjectMixi
 
     def get_queryset(self):
         access_objects = OpportunityAccess.objects.filter(opportunity=self.get_opportunity())
-        return list(
-            filter(lambda cw: cw.completed, CompletedWork.objects.filter(opportunity_access__in=access_objects))
-        )
+        with payment_unit_hierarchy_memo(access_objects.values("id")):
+            return list(
+                filter(lambda cw: cw.completed, CompletedWork.objects.filter(opportunity_access__in=access_objects))
+            )
 
 
 @org_member_required
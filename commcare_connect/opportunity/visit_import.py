@@ -4,7 +4,9 @@ import textwrap
 from collections import defaultdict
 from dataclasses import astuple, dataclass
 from decimal import Decimal, InvalidOperation
+from functools import partial
 
+from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
@@ -12,11 +14,11 @@ from django.utils.html import escape, format_html, format_html_join
 from django.utils.timezone import now
 from tablib import Dataset
 
+from commcare_connect.opportunity.exchange_rates import exchange_rate_memo, get_exchange_rate_record
 from commcare_connect.opportunity.models import (
     CatchmentArea,
     CompletedWork,
     CompletedWorkStatus,
-    ExchangeRate,
     Opportunity,
     OpportunityAccess,
     Payment,
@@ -24,8 +26,18 @@ from commcare_connect.opportunity.models import (
     VisitReviewStatus,
     VisitValidationStatus,
 )
-from commcare_connect.opportunity.tasks import bulk_update_payment_accrued, send_payment_notification
-from commcare_connect.opportunity.utils.completed_work import update_status, update_work_payment_date
+from commcare_connect.opportunity.tasks import (
+    bulk_update_payment_accrued,
+    get_payment_accrual_schedule_key,
+    send_payment_notification,
+    update_pending_payment_accrued,
+)
+from commcare_connect.opportunity.utils.completed_work import (
+    update_payment_accrued_for_user,
+    update_work_payment_date,
+)
+from commcare_connect.opportunity.utils.payment_ledger import refresh_payment_ledger
+from commcare_connect.opportunity.utils.visit_counters import UNCOUNTED_VISIT_STATUSES, rebuild_visit_counters
 from commcare_connect.utils.file import get_file_extension
 from commcare_connect.utils.itertools import batched
 
@@ -173,6 +185,7 @@ def bulk_update_visit_status(opportunity_id: int, headers: list[str], rows: list
     locked_visits = set()
     seen_visits = set()
     user_ids = set()
+    recount_access_ids = set()
     approved_count = 0
     rejected_count = 0
     with transaction.atomic():
@@ -189,6 +202,8 @@ def bulk_update_visit_status(opportunity_id: int, headers: list[str], rows: list
                     locked_visits.add(visit.xform_id)
                     continue
                 if visit.status != status:
+                    if (visit.status in UNCOUNTED_VISIT_STATUSES) != (status in UNCOUNTED_VISIT_STATUSES):
+                        recount_access_ids.add(visit.opportunity_access_id)
                     visit.status = status
                     if status == VisitValidationStatus.approved:
                         visit.review_created_on = now()
@@ -216,6 +231,10 @@ def bulk_update_visit_status(opportunity_id: int, headers: list[str], rows: list
                 to_update, fields=["status", "reason", "review_created_on", "justification", "status_modified_date"]
             )
             missing_visits |= set(visit_batch) - seen_visits
+
+        # visits moved into or out of the over limit and trial statuses change the visit limit counts
+        for access in OpportunityAccess.objects.filter(id__in=recount_access_ids):
+            rebuild_visit_counters(access)
     bulk_update_payment_accrued.delay(opportunity.id, list(user_ids))
     return VisitImportStatus(seen_visits, missing_visits, locked_visits, approved_count, rejected_count)
 
@@ -225,6 +244,7 @@ def get_missing_justification_message(visits_ids):
     return f"Justification is required for flagged visits: {id_list}"
 
 
+@exchange_rate_memo()
 def update_payment_accrued(opportunity: Opportunity, users: list, incremental=False):
     """Updates payment accrued for completed and approved CompletedWork instances.
     Skips already processed completed works when incremental is true."""
@@ -235,20 +255,21 @@ def update_payment_accrued(opportunity: Opportunity, users: list, incremental=Fa
         update_payment_accrued_for_user(access, incremental)
 
 
-def update_payment_accrued_for_user(opportunity_access, incremental):
-    filter_kwargs = {}
-    exclude_status = []
-    if incremental:
-        exclude_status.append(CompletedWorkStatus.approved)
-        filter_kwargs["saved_approved_count"] = 0
-
-    with cache.lock(f"update_payment_accrued_lock_{opportunity_access.id}", timeout=900):
-        completed_works = (
-            opportunity_access.completedwork_set.filter(**filter_kwargs)
-            .exclude(status__in=exclude_status)
-            .select_related("payment_unit")
+def schedule_payment_accrued_update(opportunity_access: OpportunityAccess):
+    """Mark the payment accrued of a user as pending and schedule a single recalculation
+    for all forms received within the PAYMENT_ACCRUAL_DELAY window."""
+    OpportunityAccess.objects.filter(pk=opportunity_access.pk, payment_accrual_pending_since__isnull=True).update(
+        payment_accrual_pending_since=now()
+    )
+    schedule_key = get_payment_accrual_schedule_key(opportunity_access.pk)
+    if cache.add(schedule_key, True, timeout=settings.PAYMENT_ACCRUAL_DELAY):
+        transaction.on_commit(
+            partial(
+                update_pending_payment_accrued.apply_async,
+                args=(opportunity_access.pk,),
+                countdown=settings.PAYMENT_ACCRUAL_DELAY,
+            )
         )
-        update_status(completed_works, opportunity_access, compute_payment=True)
 
 
 def get_data_by_visit_id(headers, rows) -> dict[int, VisitData]:
@@ -299,6 +320,7 @@ def _get_header_index(headers: list[str], col_name: str, required=True) -> int:
         raise ImportException(f"Missing required column(s): '{col_name}'")
 
 
+@exchange_rate_memo()
 def bulk_update_payments(opportunity_id: int, headers: list[str], rows: list[list]):
     opportunity = Opportunity.objects.get(id=opportunity_id)
     headers = [header.lower() for header in headers]
@@ -431,14 +453,11 @@ def get_exchange_rate(currency_code, date=None):
     if currency_code == "USD":
         return 1
 
-    rate_date = date or now().date()
-    rate = None
-
-    rate = ExchangeRate.latest_exchange_rate(currency_code=currency_code, date=rate_date).rate
-    if not rate:
+    exchange_rate = get_exchange_rate_record(currency_code, date)
+    if not exchange_rate or not exchange_rate.rate:
         raise ImportException("Rate not found for opportunity currency")
 
-    return rate
+    return exchange_rate.rate
 
 
 def bulk_update_completed_work_status(opportunity: Opportunity, file: UploadedFile) -> CompletedWorkImportStatus:
@@ -455,6 +474,7 @@ def _bulk_update_completed_work_status(opportunity: Opportunity, dataset: Datase
     missing_completed_works = set()
     seen_completed_works = set()
     user_ids = set()
+    access_ids = set()
     with transaction.atomic():
         for work_batch in batched(work_ids, 100):
             to_update = []
@@ -476,10 +496,12 @@ def _bulk_update_completed_work_status(opportunity: Opportunity, dataset: Datase
 
                 if changed:
                     to_update.append(completed_work)
+                    access_ids.add(completed_work.opportunity_access_id)
                 user_ids.add(completed_work.opportunity_access.user_id)
             CompletedWork.objects.bulk_update(to_update, fields=["status", "reason", "status_modified_date"])
             missing_completed_works |= set(work_batch) - seen_completed_works
 
+        refresh_payment_ledger(access_ids)
         bulk_update_payment_accrued.delay(opportunity.id, list(user_ids))
     return CompletedWorkImportStatus(seen_completed_works, missing_completed_works)
 
@@ -605,21 +627,21 @@ def create_or_update_catchment(row_data: RowData, opportunity: Opportunity, user
         catchment.name = row_data.area_name
         catchment.active = row_data.active
         catchment.opportunity_access = username_to_oa_map.get(row_data.username, None)
+        catchment.update_point()
         return catchment, False
     except CatchmentArea.DoesNotExist:
-        return (
-            CatchmentArea(
-                latitude=row_data.latitude,
-                longitude=row_data.longitude,
-                radius=row_data.radius,
-                opportunity=opportunity,
-                name=row_data.area_name,
-                active=row_data.active,
-                site_code=row_data.site_code,
-                opportunity_access=username_to_oa_map.get(row_data.username, None),
-            ),
-            True,
+        catchment = CatchmentArea(
+            latitude=row_data.latitude,
+            longitude=row_data.longitude,
+            radius=row_data.radius,
+            opportunity=opportunity,
+            name=row_data.area_name,
+            active=row_data.active,
+            site_code=row_data.site_code,
+            opportunity_access=username_to_oa_map.get(row_data.username, None),
         )
+        catchment.update_point()
+        return catchment, True
 
 
 def _bulk_update_catchments(opportunity: Opportunity, dataset: Dataset):
@@ -673,6 +695,7 @@ def _bulk_update_catchments(opportunity: Opportunity, dataset: Dataset):
                 [
                     "latitude",
                     "longitude",
+                    "point",
                     "radius",
                     "active",
                     "name",
@@ -9,8 +9,14 @@ CELERY_TASK_PENDING = "PENDING"
 CELERY_TASK_FAILURE = "FAILURE"
 
 
-def set_task_progress(task, message, is_complete=False):
-    task.update_state(state=CELERY_TASK_SUCCESS if is_complete else CELERY_TASK_IN_PROGRESS, meta={"message": message})
+def set_task_progress(task, message, is_complete=False, task_id=None):
+    """Set the progress message of ``task``, or of the task with ``task_id`` when a task reports the progress
+    of another task it is part of."""
+    task.update_state(
+        task_id=task_id,
+        state=CELERY_TASK_SUCCESS if is_complete else CELERY_TASK_IN_PROGRESS,
+        meta={"message": message},
+    )
 
 
 def get_task_progress_message(task):
@@ -1,5 +1,6 @@
 import uuid
 
+import pgtrigger
 import waffle
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -21,6 +22,18 @@ class BaseModel(models.Model):
         abstract = True
 
 
+def set_modified_trigger(field_name: str) -> pgtrigger.Trigger:
+    """Trigger that sets ``field_name`` to the current time when a row changes. Unlike ``auto_now`` it
+    also covers ``bulk_update`` and ``QuerySet.update``, so the field can be relied on for syncing changes."""
+    return pgtrigger.Trigger(
+        name=f"set_{field_name}",
+        when=pgtrigger.Before,
+        operation=pgtrigger.Update,
+        condition=pgtrigger.Condition("OLD.* IS DISTINCT FROM NEW.*"),
+        func=f'NEW."{field_name}" = clock_timestamp(); RETURN NEW;',
+    )
+
+
 def slugify_uniquely(value, model, slugfield="slug"):
     """Returns a slug on a name which is unique within a model's table
     Taken from https://code.djangoproject.com/wiki/SlugifyUniquely
@@ -0,0 +1,189 @@
+"""Writing exports as Parquet files.
+
+Rows are converted to typed Arrow columns and written one row group at a time, so exports
+of any size are written with memory bounded by the row group size.
+"""
+
+import datetime
+import decimal
+import json
+from collections.abc import Iterable, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from rest_framework import serializers
+
+from commcare_connect.utils.itertools import batched
+
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+# low cardinality text such as statuses, stored once per row group and read as categories by pandas
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+class _StreamSink:
+    """A write-only file that keeps what was written until it is taken by the caller."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dict | list):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return str(value)
+
+
+def _to_timestamp(value):
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value) if value else None
+    return value
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value) if value else None
+    return value
+
+
+def _to_decimal(value):
+    if isinstance(value, str):
+        return decimal.Decimal(value) if value else None
+    return value
+
+
+def _get_converter(arrow_type: pa.DataType):
+    if pa.types.is_string(arrow_type) or arrow_type == CATEGORY:
+        return _to_string
+    if pa.types.is_timestamp(arrow_type):
+        return _to_timestamp
+    if pa.types.is_date(arrow_type):
+        return _to_date
+    if pa.types.is_decimal(arrow_type):
+        return _to_decimal
+    return None
+
+
+def _to_record_batch(rows: Sequence[Sequence], schema: pa.Schema, converters) -> pa.RecordBatch:
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field, converter in zip(columns, schema, converters):
+        if converter is not None:
+            values = [converter(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(rows: Iterable[Sequence], schema: pa.Schema, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """Yield the bytes of a Parquet file of the rows, one row group at a time. Each row holds the
+    values of the columns of ``schema`` in order. Values are converted to the column types, so the
+    text representations of dates, datetimes and decimals are accepted."""
+    converters = [_get_converter(field.type) for field in schema]
+    sink = _StreamSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in batched(rows, row_group_size):
+            writer.write_batch(_to_record_batch(chunk, schema, converters))
+            yield sink.take()
+    yield sink.take()
+
+
+def write_parquet(export_file, rows: Iterable[Sequence], schema: pa.Schema):
+    """Write the rows to the binary file ``export_file`` as Parquet."""
+    for data in iter_parquet(rows, schema):
+        export_file.write(data)
+
+
+def concat_parquet(export_file, part_files):
+    """Write the Parquet files ``part_files``, which have the same schema, to the binary file ``export_file``
+    as a single Parquet file. The row groups are copied in order, one at a time."""
+    part_files = [pq.ParquetFile(part_file) for part_file in part_files]
+    with pq.ParquetWriter(export_file, part_files[0].schema_arrow) as writer:
+        for part_file in part_files:
+            for index in range(part_file.num_row_groups):
+                writer.write_table(part_file.read_row_group(index))
+
+
+def dataset_to_parquet(dataset) -> bytes:
+    """Parquet file of a tablib Dataset. Column types are inferred from the values, falling back
+    to text for columns of mixed types."""
+    arrays = []
+    headers = dataset.headers or []
+    for column in zip(*dataset) if dataset.height else [[] for _ in headers]:
+        try:
+            array = pa.array(column)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = pa.array([_to_string(value) for value in column], type=pa.string())
+        if pa.types.is_null(array.type):
+            array = array.cast(pa.string())
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=[str(header) for header in headers])
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return sink.getvalue().to_pybytes()
+
+
+def _get_method_field_type(field: serializers.SerializerMethodField) -> pa.DataType:
+    method = getattr(field.parent, field.method_name, None)
+    return_type = getattr(method, "__annotations__", {}).get("return")
+    return {int: pa.int64(), float: pa.float64(), bool: pa.bool_()}.get(return_type, pa.string())
+
+
+def _is_integer_related_field(field) -> bool:
+    if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.queryset is None:
+        return False
+    return isinstance(field.queryset.model._meta.pk, models.IntegerField)
+
+
+def get_serializer_parquet_schema(serializer: serializers.Serializer, category_fields=()) -> pa.Schema:
+    """Parquet schema of the fields of a serializer. Choice fields and the fields named in
+    ``category_fields`` are dictionary encoded; nested and JSON data are stored as JSON text."""
+    fields = []
+    for name, field in serializer.fields.items():
+        if name in category_fields or isinstance(field, serializers.ChoiceField):
+            arrow_type = CATEGORY
+        elif isinstance(field, serializers.BooleanField):
+            arrow_type = pa.bool_()
+        elif isinstance(field, serializers.IntegerField) or _is_integer_related_field(field):
+            arrow_type = pa.int64()
+        elif isinstance(field, serializers.FloatField):
+            arrow_type = pa.float64()
+        elif isinstance(field, serializers.DecimalField):
+            arrow_type = pa.decimal128(field.max_digits or 38, field.decimal_places or 0)
+        elif isinstance(field, serializers.DateTimeField):
+            arrow_type = TIMESTAMP
+        elif isinstance(field, serializers.DateField):
+            arrow_type = pa.date32()
+        elif isinstance(field, serializers.SerializerMethodField):
+            arrow_type = _get_method_field_type(field)
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
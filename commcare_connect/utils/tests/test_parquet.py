@@ -0,0 +1,63 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tablib import Dataset
+
+from commcare_connect.utils.parquet import CATEGORY, TIMESTAMP, concat_parquet, dataset_to_parquet, iter_parquet
+
+
+def test_iter_parquet_writes_row_groups():
+    schema = pa.schema(
+        [("status", CATEGORY), ("date", TIMESTAMP), ("amount", pa.decimal128(10, 2)), ("data", pa.string())]
+    )
+    rows = [["approved", "2025-01-01T10:00:00Z", "1.50", {"a": [1]}], ["pending", None, None, None]] * 3
+
+    chunks = list(iter_parquet(iter(rows), schema, row_group_size=2))
+
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.num_row_groups == 3
+    table = parquet_file.read()
+    assert table.schema == schema
+    assert table.num_rows == 6
+    first = table.to_pylist()[0]
+    assert first["status"] == "approved"
+    assert first["date"].isoformat() == "2025-01-01T10:00:00+00:00"
+    assert str(first["amount"]) == "1.50"
+    assert first["data"] == '{"a": [1]}'
+
+
+def test_iter_parquet_no_rows():
+    schema = pa.schema([("status", CATEGORY)])
+    table = pq.read_table(io.BytesIO(b"".join(iter_parquet(iter([]), schema))))
+    assert table.num_rows == 0
+    assert table.schema == schema
+
+
+def test_concat_parquet_keeps_row_groups_in_order():
+    schema = pa.schema([("status", CATEGORY), ("id", pa.int64())])
+    parts = [
+        io.BytesIO(b"".join(iter_parquet(iter([["approved", 1], ["pending", 2]]), schema, row_group_size=1))),
+        io.BytesIO(b"".join(iter_parquet(iter([]), schema))),
+        io.BytesIO(b"".join(iter_parquet(iter([["rejected", 3]]), schema))),
+    ]
+    export_file = io.BytesIO()
+
+    concat_parquet(export_file, parts)
+
+    parquet_file = pq.ParquetFile(io.BytesIO(export_file.getvalue()))
+    assert parquet_file.num_row_groups == 3
+    table = parquet_file.read()
+    assert table.schema == schema
+    assert table.column("id").to_pylist() == [1, 2, 3]
+
+
+def test_dataset_to_parquet_infers_types():
+    dataset = Dataset(["a", 1, None], ["b", "x", None], headers=["text", "mixed", "empty"])
+
+    table = pq.read_table(io.BytesIO(dataset_to_parquet(dataset)))
+
+    assert table.to_pylist() == [
+        {"text": "a", "mixed": "1", "empty": None},
+        {"text": "b", "mixed": "x", "empty": None},
+    ]
@@ -2,7 +2,7 @@ from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
-from commcare_connect.form_receiver.views import FormReceiver
+from commcare_connect.form_receiver.views import FormBatchReceiver, FormReceiver, form_ingestion_metrics
 from commcare_connect.opportunity.api.views.automation import (
     InviteUsersView,
     OpportunityActivateView,
@@ -38,6 +38,8 @@ app_name = "api"
 urlpatterns = [
     path("", include(router.urls)),
     path("receiver/", FormReceiver.as_view(), name="receiver"),
+    path("receiver/batch/", FormBatchReceiver.as_view(), name="receiver_batch"),
+    path("metrics/form_ingestion/", form_ingestion_metrics, name="form_ingestion_metrics"),
     path("opportunity/<slug:pk>/learn_progress", UserLearnProgressView.as_view(), name="learn_progress"),
     path("opportunity/<slug:pk>/claim", ClaimOpportunityView.as_view()),
     path("opportunity/<slug:pk>/delivery_progress", DeliveryProgressView.as_view(), name="deliver_progress"),
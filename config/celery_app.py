@@ -2,7 +2,7 @@ import os
 
 import sentry_sdk
 from celery import Celery
-from celery.signals import task_retry
+from celery.signals import task_retry, worker_process_init
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
@@ -28,3 +28,14 @@ def sentry_log_retry(request=None, reason=None, einfo=None, **kwargs):
         if reason:
             scope.set_extra("reason", str(reason))
         sentry_sdk.capture_message("Celery task retrying", level="warning")
+
+
+@worker_process_init.connect
+def preload_form_routing(**kwargs):
+    from commcare_connect.form_receiver.routing import preload_routing_table
+
+    try:
+        preload_routing_table()
+    except Exception:
+        # the table is loaded lazily by the first form instead
+        sentry_sdk.capture_exception()
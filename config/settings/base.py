@@ -405,6 +405,40 @@ MAPBOX_TOKEN = env("MAPBOX_TOKEN", default=None)
 
 OPEN_EXCHANGE_RATES_API_ID = env("OPEN_EXCHANGE_RATES_API_ID", default=None)
 
+# Form ingestion inbox (used when the async_form_ingestion switch is enabled)
+# Number of inbox slots that can be drained in parallel. Forms from the same user always map to the same slot.
+FORM_INBOX_CONCURRENCY = env.int("FORM_INBOX_CONCURRENCY", default=4)
+# Number of processing attempts before an inbox entry is moved to the dead letter state
+FORM_INBOX_MAX_ATTEMPTS = env.int("FORM_INBOX_MAX_ATTEMPTS", default=5)
+# Days to keep processed inbox entries, including their form payloads, before they are deleted
+FORM_INBOX_RETENTION_DAYS = env.int("FORM_INBOX_RETENTION_DAYS", default=14)
+# Seconds to wait before recalculating payment accrued when the deferred_payment_accrual switch is enabled.
+# Forms received for the same user within this window are covered by a single recalculation.
+PAYMENT_ACCRUAL_DELAY = env.int("PAYMENT_ACCRUAL_DELAY", default=60)
+
+# Users per task in the nightly bulk approval, and seconds after which unstarted chunks are skipped
+BULK_APPROVAL_CHUNK_SIZE = env.int("BULK_APPROVAL_CHUNK_SIZE", default=500)
+BULK_APPROVAL_DEADLINE = env.int("BULK_APPROVAL_DEADLINE", default=60 * 60 * 6)
+
+# Seconds by which incremental data exports trail the current time, so rows written by transactions
+# that are still open are picked up by the next sync instead of being skipped
+DATA_EXPORT_SYNC_LAG = env.int("DATA_EXPORT_SYNC_LAG", default=60 * 15)
+
+# Visits per part of a CSV or Parquet visit export; larger exports are generated in parts by separate workers
+VISIT_EXPORT_PARTITION_SIZE = env.int("VISIT_EXPORT_PARTITION_SIZE", default=100_000)
+
+# Days to keep the IDs of processed forms used to reject repeated submissions (xform_idempotency switch)
+PROCESSED_XFORM_RETENTION_DAYS = env.int("PROCESSED_XFORM_RETENTION_DAYS", default=90)
+
+# Per stage timing of form processing, exposed on the form ingestion metrics endpoint
+FORM_INGESTION_METRICS = env.bool("FORM_INGESTION_METRICS", default=True)
+# Also log the stage timings of every processed form
+FORM_INGESTION_METRICS_LOG = env.bool("FORM_INGESTION_METRICS_LOG", default=False)
+# Seconds between flushes of the timings buffered by each process to Redis
+FORM_INGESTION_METRICS_FLUSH_INTERVAL = env.int("FORM_INGESTION_METRICS_FLUSH_INTERVAL", default=10)
+# Bearer token required to scrape the metrics endpoint. The endpoint is disabled when unset.
+METRICS_API_TOKEN = env("METRICS_API_TOKEN", default=None)
+
 # Waffle Settings
 WAFFLE_FLAG_MODEL = "flags.Flag"
 WAFFLE_CREATE_MISSING_FLAGS = True